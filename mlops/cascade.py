@@ -0,0 +1,132 @@
+"""
+Early-exit cascade construction (src/cascade.py).
+
+After each training run a logistic / multinomial first stage is fitted on the
+same (reduced, weighted) training rows as the SVC. The holdout split is then
+halved, as in mlops/calibrate.py:
+
+1. tune half: the defer threshold is the lowest confidence at which the
+   first stage overrides the SVC's decision on at most `tolerance` of the
+   readings, an upper bound on the accuracy the cascade can lose
+2. eval half: short-circuit fraction, accuracy and per-reading latency of the
+   cascade vs the full model are measured with that threshold
+
+The gate is saved next to the exact model (`<name>_cascade.pkl`) when it
+short-circuits anything, so it is versioned and promoted together with it.
+"""
+import os
+import json
+from typing import Dict, Optional, Tuple
+
+import joblib
+import numpy as np
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import accuracy_score
+
+from mlops.compact import per_reading_latency
+from src.cascade import CascadeClassifier, LinearGate
+
+TOLERANCE = 0.005      # max share of readings where the first stage overrides the SVC
+MIN_THRESHOLD = 0.5
+
+
+def fit_gate(X_train, y_train, sample_weight=None) -> LinearGate:
+    """Linear first stage on the scaled training rows (threshold set later)."""
+    clf = LogisticRegression(max_iter=1000)
+    clf.fit(X_train, y_train, sample_weight=sample_weight)
+    return LinearGate(clf.coef_, clf.intercept_, clf.classes_, threshold=1.0)
+
+
+def tune_threshold(gate: LinearGate, full_pred, X_val,
+                   tolerance: float = TOLERANCE) -> Tuple[float, float]:
+    """Lowest threshold at which the first stage overrides the full model on ≤ tolerance of rows.
+
+    Cascade accuracy can only drop where the first stage answers and disagrees
+    with the full model, so that share bounds the loss without needing labels.
+    Returns (threshold, short-circuit fraction).
+    """
+    p = gate.proba(X_val)
+    labels, conf = gate.classes_[p.argmax(axis=1)], p.max(axis=1)
+
+    # Readings in order of falling confidence: a threshold admits a prefix
+    order = np.argsort(-conf, kind="stable")
+    overrides = np.cumsum(labels[order] != np.asarray(full_pred)[order])
+    budget = tolerance * len(order)
+
+    best_k = 0
+    for k in range(len(order), 0, -1):
+        threshold = conf[order[k - 1]]
+        # Ties: a threshold admits every row at that confidence
+        if threshold < MIN_THRESHOLD or (k < len(order) and conf[order[k]] == threshold):
+            continue
+        if overrides[k - 1] <= budget:
+            best_k = k
+            break
+    if best_k == 0:
+        return 1.0 + 1e-9, 0.0
+    return float(conf[order[best_k - 1]]), best_k / len(order)
+
+
+def build_cascade(model, X_train, y_train, X_val, y_val, sample_weight=None,
+                  tolerance: float = TOLERANCE, random_state: int = 42) -> Tuple[Optional[LinearGate], Dict]:
+    """Fit + tune the first stage; report short-circuit rate and latency on held-out rows."""
+    X_val, y_val = np.asarray(X_val), np.asarray(y_val)
+    rng = np.random.default_rng(random_state)
+    perm = rng.permutation(len(X_val))
+    tune_idx, eval_idx = perm[: len(perm) // 2], perm[len(perm) // 2:]
+
+    gate = fit_gate(X_train, y_train, sample_weight)
+    gate.threshold, tuned_rate = tune_threshold(gate, model.predict(X_val[tune_idx]),
+                                                X_val[tune_idx], tolerance)
+    report = {"tolerance": tolerance, "threshold": gate.threshold,
+              "tune_rows": int(len(tune_idx)), "eval_rows": int(len(eval_idx)),
+              "tune_short_circuit": tuned_rate}
+    if tuned_rate == 0.0:
+        print(f"⚠ Cascade: no threshold with ≤ {tolerance:.1%} overrides; full model only.")
+        report["cascade"] = None
+        return None, report
+
+    cascade = CascadeClassifier(gate, model)
+    X_eval, y_eval = X_val[eval_idx], y_val[eval_idx]
+    full_acc = accuracy_score(y_eval, model.predict(X_eval))
+    cascade_acc = accuracy_score(y_eval, cascade.predict(X_eval))
+    full_lat = per_reading_latency(model.predict, X_eval)
+    cascade_lat = per_reading_latency(cascade.predict, X_eval)
+
+    report["cascade"] = {
+        "short_circuit": cascade.short_circuit_rate,
+        "full_acc": float(full_acc),
+        "acc": float(cascade_acc),
+        "acc_loss": float(full_acc - cascade_acc),
+        "full_latency_ms": full_lat * 1e3,
+        "cascade_latency_ms": cascade_lat * 1e3,
+        "latency_saving": 1.0 - cascade_lat / full_lat if full_lat > 0 else None,
+    }
+    c = report["cascade"]
+    print(f"⏩ Cascade: {c['short_circuit']:.0%} of readings answered by the first stage "
+          f"(threshold {gate.threshold:.3f}), acc {full_acc:.4f} → {cascade_acc:.4f}, "
+          f"{c['full_latency_ms']:.3f} ms → {c['cascade_latency_ms']:.3f} ms per reading")
+    return gate, report
+
+
+def cascade_and_save(trained, model_dir: str, cascade_name: str,
+                     tolerance: float = TOLERANCE) -> Dict:
+    """Build the first stage for a freshly trained model object and save it beside the exact one."""
+    X_train, X_test, y_train, y_test = trained.split
+    gate, report = build_cascade(trained.model, X_train, y_train, X_test, y_test,
+                                 getattr(trained, "sample_weight", None), tolerance)
+
+    path = os.path.join(model_dir, cascade_name)
+    if gate is not None:
+        joblib.dump(gate.to_dict(), path)
+    elif os.path.exists(path):
+        # Do not let a stale gate from an older run get versioned
+        os.remove(path)
+    return report
+
+
+def save_cascade_report(version_dir: str, report: Dict) -> str:
+    path = os.path.join(version_dir, "cascade_report.json")
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+    return path
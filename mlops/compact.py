@@ -0,0 +1,188 @@
+"""
+Post-training support-vector reduction.
+
+RBF-SVM inference cost is linear in the number of support vectors, and that
+number grows with the training data. After each training run we build a
+reduced-set approximation (src/compact_svm.py):
+
+1. Cluster each class's support vectors with k-means → m centers.
+2. Re-fit the kernel expansion coefficients on those centers by least squares
+   so the compact decision functions match the exact SVC on training data.
+3. Try increasing m until holdout accuracy is within `max_acc_loss` of the
+   exact model.
+
+The compact model is saved next to the exact one (`<name>_compact.pkl`),
+so it is versioned and promoted together with it.
+"""
+import io
+import os
+import copy
+import json
+import time
+from typing import Dict, Optional, Sequence, Tuple
+
+import joblib
+import numpy as np
+from sklearn.cluster import KMeans
+from sklearn.metrics import accuracy_score
+
+from src.compact_svm import CompactSVC
+
+MAX_ACC_LOSS = 0.005
+CENTER_FRACTIONS = (0.02, 0.05, 0.1, 0.2, 0.35, 0.5)
+MAX_FIT_ROWS = 5000
+RIDGE = 1e-6
+
+
+# =========================================
+# REDUCED-SET CONSTRUCTION
+# =========================================
+def exact_decision(model, X) -> np.ndarray:
+    """One-vs-one decision values of a fitted sklearn SVC, shape (n, n_pairs)."""
+    ovo = copy.copy(model)
+    ovo.decision_function_shape = "ovo"
+    D = ovo.decision_function(X)
+    return D.reshape(len(X), -1)
+
+
+def _allocate_centers(n_support: np.ndarray, m: int) -> np.ndarray:
+    """Split m centers across classes proportionally to their support vectors."""
+    share = np.maximum(1, np.round(m * n_support / n_support.sum()).astype(int))
+    return np.minimum(share, n_support)
+
+
+def reduce_svc(model, X_fit, n_centers: int, random_state: int = 42) -> CompactSVC:
+    """Build a CompactSVC with about n_centers centers approximating `model`."""
+    sv = model.support_vectors_
+    bounds = np.concatenate(([0], np.cumsum(model.n_support_)))
+    per_class = _allocate_centers(model.n_support_, n_centers)
+
+    centers = []
+    for c, k in enumerate(per_class):
+        class_sv = sv[bounds[c]:bounds[c + 1]]
+        if k >= len(class_sv):
+            centers.append(class_sv)
+            continue
+        km = KMeans(n_clusters=int(k), n_init=3, random_state=random_state).fit(class_sv)
+        centers.append(km.cluster_centers_)
+    centers = np.vstack(centers)
+
+    compact = CompactSVC(centers, np.zeros((len(centers), 1)), np.zeros(1),
+                         model._gamma, model.classes_)
+
+    # Least-squares fit of [K(X, centers), 1] @ beta ≈ exact decision values
+    target = exact_decision(model, X_fit)
+    A = np.hstack([compact.kernel(X_fit), np.ones((len(X_fit), 1))])
+    gram = A.T @ A + RIDGE * np.eye(A.shape[1])
+    beta = np.linalg.solve(gram, A.T @ target)
+
+    compact.coef = beta[:-1]
+    compact.intercept = beta[-1]
+    return compact
+
+
+# =========================================
+# MEASUREMENTS
+# =========================================
+def pickled_size(obj) -> int:
+    buf = io.BytesIO()
+    joblib.dump(obj, buf)
+    return buf.tell()
+
+
+def per_reading_latency(predict, X, repeats: int = 200) -> float:
+    """Mean seconds for a single-row predict(), as on the edge."""
+    rows = [X[i % len(X)].reshape(1, -1) for i in range(repeats)]
+    start = time.perf_counter()
+    for row in rows:
+        predict(row)
+    return (time.perf_counter() - start) / repeats
+
+
+# =========================================
+# SEARCH + SAVE
+# =========================================
+def compact_model(model, X_train, X_val, y_val,
+                  max_acc_loss: float = MAX_ACC_LOSS,
+                  fractions: Sequence[float] = CENTER_FRACTIONS,
+                  random_state: int = 42) -> Tuple[Optional[CompactSVC], Dict]:
+    """Smallest reduced-set model within max_acc_loss of the exact model."""
+    X_train = np.asarray(X_train)
+    X_val = np.asarray(X_val)
+    if len(X_train) > MAX_FIT_ROWS:
+        rng = np.random.default_rng(random_state)
+        X_train = X_train[rng.choice(len(X_train), MAX_FIT_ROWS, replace=False)]
+
+    n_sv = int(model.support_vectors_.shape[0])
+    exact_acc = accuracy_score(y_val, model.predict(X_val))
+    report = {
+        "n_support_vectors": n_sv,
+        "exact_acc": float(exact_acc),
+        "max_acc_loss": max_acc_loss,
+        "tried": [],
+    }
+
+    chosen = None
+    for frac in fractions:
+        m = max(2 * len(model.classes_), int(round(frac * n_sv)))
+        if m >= n_sv:
+            break
+        candidate = reduce_svc(model, X_train, m, random_state)
+        acc = accuracy_score(y_val, candidate.predict(X_val))
+        report["tried"].append({"centers": candidate.n_centers, "acc": float(acc)})
+        if exact_acc - acc <= max_acc_loss:
+            chosen = candidate
+            break
+
+    if chosen is None:
+        print(f"⚠ No compact model within {max_acc_loss} accuracy loss; keeping exact only.")
+        report["compact"] = None
+        return None, report
+
+    exact_lat = per_reading_latency(model.predict, X_val)
+    compact_lat = per_reading_latency(chosen.predict, X_val)
+    exact_size = pickled_size(model)
+    compact_size = pickled_size(chosen.to_dict())
+
+    report["compact"] = {
+        "centers": chosen.n_centers,
+        "acc": report["tried"][-1]["acc"],
+        "acc_loss": float(exact_acc - report["tried"][-1]["acc"]),
+        "exact_bytes": exact_size,
+        "compact_bytes": compact_size,
+        "exact_latency_ms": exact_lat * 1e3,
+        "compact_latency_ms": compact_lat * 1e3,
+        "speedup": exact_lat / compact_lat if compact_lat > 0 else None,
+    }
+    c = report["compact"]
+    print(f"🗜 Compact SVM: {n_sv} SVs → {c['centers']} centers, "
+          f"acc {exact_acc:.4f} → {c['acc']:.4f}, "
+          f"{exact_size / 1024:.0f} KB → {compact_size / 1024:.0f} KB, "
+          f"{c['exact_latency_ms']:.3f} ms → {c['compact_latency_ms']:.3f} ms per reading")
+    return chosen, report
+
+
+def compact_and_save(trained, model_dir: str, compact_name: str,
+                     max_acc_loss: float = MAX_ACC_LOSS) -> Dict:
+    """Compact a freshly trained model object and save it beside the exact one.
+
+    `trained` is an IrrigationModel / PlantHealthModel after train(); its
+    `split` holds the train/holdout arrays.
+    """
+    X_train, X_test, y_train, y_test = trained.split
+    compact, report = compact_model(trained.model, X_train, X_test, y_test, max_acc_loss)
+
+    path = os.path.join(model_dir, compact_name)
+    if compact is not None:
+        joblib.dump(compact.to_dict(), path)
+    elif os.path.exists(path):
+        # Do not let a stale compact model from an older run get versioned
+        os.remove(path)
+    return report
+
+
+def save_compact_report(version_dir: str, report: Dict) -> str:
+    path = os.path.join(version_dir, "compact_report.json")
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+    return path
@@ -20,6 +20,35 @@ MODELS_PATH = os.path.join(PROJECT_ROOT, "models")
 IRRIGATION_MODEL_DIR = os.path.join(MODELS_PATH, "irrigation")
 PLANT_MODEL_DIR = os.path.join(MODELS_PATH, "plant_health")
 
+# Train SVCs without libsvm's built-in 5-fold Platt scaling; probabilities
+# come from a separate calibrator fitted on held-out data (mlops/calibrate.py)
+SVC_PROBABILITY = False
+
+# Training-set reduction (src/coreset.py): collapse near-duplicate rows on a
+# feature grid; a row budget per task adds a class-balanced coreset on top
+TRAIN_DEDUPE = True
+CORESET_SIZE = {"irrigation": None, "plant_health": None}
+
+# Rolling EWMA / slope / min / max features per signal (src/rolling_features.py).
+# Trained on the time-stamped field rows only (data/live/<task>.csv, merged from
+# the Pi's uploads; the bundled CSVs have no timestamps and are left out) —
+# training stops with a ValueError while that store is empty. The irrigation
+# LUT is skipped for a model trained with them
+ROLLING_FEATURES = {"irrigation": False, "plant_health": False}
+
+# Out-of-core training (src/out_of_core.py): stream the CSV in blocks into a
+# float32 memory map instead of loading it whole; the working set (block size,
+# float64 training + holdout rows) stays within MEMORY_CAP_MB
+OUT_OF_CORE = {"irrigation": False, "plant_health": False}
+MEMORY_CAP_MB = 512
+
+# Shadow replay gate (mlops/shadow.py): before promotion the candidate replays
+# the recorded field readings next to current/. Labelled logs: field accuracy
+# may drop at most SHADOW_MAX_ACC_DROP; unlabelled: agreement ≥ SHADOW_MIN_AGREEMENT
+SHADOW_GATE = True
+SHADOW_MIN_AGREEMENT = 0.90
+SHADOW_MAX_ACC_DROP = 0.02
+
 # GitHub (used mainly by CI)
 GITHUB_USERNAME = "Harshavardhan200"
 GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
@@ -0,0 +1,108 @@
+"""
+Accuracy impact of training-set reduction (src/coreset.py).
+
+The labelled rows are split once into train / raw holdout (the same split as
+the model classes' train()). The SVC is then fitted on the full training
+rows, on the grid-deduplicated rows and on class-balanced coresets of the
+requested sizes, and every variant is scored on the same raw holdout rows —
+so the numbers compare like with like and the holdout is never reduced.
+
+Usage:
+    python3 -m mlops.coreset --task irrigation --sizes 1000 2000 4000
+    python3 -m mlops.coreset --task plant_health
+"""
+import os
+import json
+import time
+import argparse
+from typing import Dict, Sequence
+
+from sklearn.metrics import accuracy_score
+from sklearn.model_selection import train_test_split
+
+from mlops.config import PROJECT_ROOT
+from src.Irrigation_Model import IrrigationModel
+from src.plant_health import PlantHealthModel
+
+REPORT_DIR = os.path.join(PROJECT_ROOT, "reports")
+
+TASK_MODELS = {
+    "irrigation": IrrigationModel,
+    "plant_health": PlantHealthModel,
+}
+
+
+def evaluate_reduction(task: str, sizes: Sequence[int] = (), test_size: float = 0.2,
+                       random_state: int = 42) -> Dict:
+    """Fit full / deduplicated / coreset variants; accuracy on one raw holdout."""
+    cls = TASK_MODELS[task]
+    loader = cls()
+    df = loader.load_dataset()
+    labeled = getattr(loader, "labeled", None)
+    if labeled is not None:
+        df = labeled(df)
+    train_df, test_df = train_test_split(df, test_size=test_size, random_state=random_state)
+
+    variants = [("full", False, None), ("dedupe", True, None)]
+    variants += [(f"coreset_{n}", True, n) for n in sorted(sizes)]
+
+    rows = []
+    for name, dedupe, size in variants:
+        # Same steps as the model classes' train(): encoders/scaler on all rows
+        model = cls(probability=False, dedupe=dedupe, coreset_size=size)
+        model.preprocess(df)
+        reduced, weights = model.reduce(train_df)
+        X_train, y_train = model.transform(reduced)
+        X_test, y_test = model.transform(test_df)
+
+        clf = model.build_model()
+        start = time.perf_counter()
+        clf.fit(X_train, y_train, sample_weight=weights)
+        fit_seconds = time.perf_counter() - start
+
+        rows.append({
+            "variant": name,
+            "train_rows": int(len(reduced)),
+            "fit_seconds": round(fit_seconds, 4),
+            "n_support_vectors": int(clf.support_vectors_.shape[0]),
+            "holdout_acc": float(accuracy_score(y_test, clf.predict(X_test))),
+        })
+
+    full = rows[0]
+    for row in rows:
+        row["acc_delta"] = round(row["holdout_acc"] - full["holdout_acc"], 4)
+        row["fit_speedup"] = round(full["fit_seconds"] / row["fit_seconds"], 2) if row["fit_seconds"] else None
+
+    return {"task": task, "raw_train_rows": int(len(train_df)),
+            "holdout_rows": int(len(test_df)), "variants": rows}
+
+
+def print_report(report: Dict) -> None:
+    print(f"📉 Training-set reduction — {report['task']} "
+          f"({report['raw_train_rows']} train rows, {report['holdout_rows']} raw holdout rows)")
+    print(f"{'variant':<16}{'rows':>8}{'fit s':>9}{'speedup':>9}{'SVs':>7}{'acc':>9}{'Δacc':>9}")
+    for r in report["variants"]:
+        print(f"{r['variant']:<16}{r['train_rows']:>8}{r['fit_seconds']:>9.3f}"
+              f"{(r['fit_speedup'] or 0):>8.1f}x{r['n_support_vectors']:>7}"
+              f"{r['holdout_acc']:>9.4f}{r['acc_delta']:>+9.4f}")
+
+
+def save_report(report: Dict, report_dir: str = REPORT_DIR) -> str:
+    os.makedirs(report_dir, exist_ok=True)
+    path = os.path.join(report_dir, f"coreset_{report['task']}.json")
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Accuracy impact of training-set reduction.")
+    parser.add_argument("--task", choices=sorted(TASK_MODELS), default="irrigation")
+    parser.add_argument("--sizes", type=int, nargs="*", default=[], help="coreset row budgets")
+    parser.add_argument("--no-save", action="store_true", help="print only, do not write reports/")
+    args = parser.parse_args()
+
+    report = evaluate_reduction(args.task, args.sizes)
+    print_report(report)
+    if not args.no_save:
+        print(f"📝 Report written → {save_report(report)}")
@@ -0,0 +1,355 @@
+"""
+Streaming feature-drift detection.
+
+At training time each model version stores `reference_stats.json`: per-feature
+quantile bin edges and the training distribution over those bins (numeric
+features) or category frequencies (categoricals). The reference covers the
+field rows the version was trained on (time-stamped rows merged from the Pi),
+so live readings are compared with what the model last saw, not with the
+bundled CSVs.
+
+A DriftMonitor keeps fixed-size incremental histograms of live readings over
+the same bins — O(bins) memory per feature no matter how many rows stream in —
+and compares them against the reference with PSI and a binned KS statistic.
+A retrain is triggered only when a feature drifts past the thresholds.
+
+CLI (used by CI before retraining):
+    python3 -m mlops.drift            # exit 0 = retrain, exit 3 = no drift
+"""
+import os
+import sys
+import json
+import argparse
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from mlops.config import DATA_PATH, PROJECT_ROOT, IRRIGATION_MODEL_DIR, PLANT_MODEL_DIR, timestamp
+from mlops.manifest import Manifest, StreamFingerprint, data_fingerprint
+from src.out_of_core import RowSample, block_rows, source_columns
+
+REFERENCE_FILE = "reference_stats.json"
+# Out-of-core models: reference stats come from a uniform sample of this many rows
+REFERENCE_SAMPLE_ROWS = 200_000
+
+IRRIGATION_FEATURES = ["MOI", "temp", "humidity"]
+IRRIGATION_CATEGORICAL = ["soil_type", "Seedling Stage"]
+
+PLANT_FEATURES = [
+    "Soil_Moisture", "Ambient_Temperature", "Humidity", "Light_Intensity",
+    "Nitrogen_Level", "Phosphorus_Level", "Potassium_Level",
+]
+
+# PSI > 0.25 is the usual "significant shift" rule of thumb
+PSI_THRESHOLD = 0.25
+KS_THRESHOLD = 0.2
+MIN_SAMPLES = 200
+
+NO_DRIFT_EXIT_CODE = 3
+EPS = 1e-6
+
+
+# =========================================
+# REFERENCE DISTRIBUTIONS
+# =========================================
+def build_reference(df: pd.DataFrame, features: List[str],
+                    categorical: Optional[List[str]] = None, n_bins: int = 10) -> Dict:
+    """Quantile bins + bin probabilities for each feature of a training frame."""
+    ref = {"rows": int(len(df)), "numeric": {}, "categorical": {}}
+
+    for col in features:
+        values = df[col].to_numpy(dtype=float)
+        values = values[np.isfinite(values)]
+        inner = np.unique(np.quantile(values, np.linspace(0, 1, n_bins + 1)[1:-1]))
+        counts = _histogram(values, inner)
+        ref["numeric"][col] = {
+            "edges": inner.tolist(),
+            "probs": (counts / max(counts.sum(), 1)).tolist(),
+            "min": float(values.min()),
+            "max": float(values.max()),
+        }
+
+    for col in categorical or []:
+        freqs = df[col].astype(str).value_counts(normalize=True)
+        ref["categorical"][col] = {str(k): float(v) for k, v in freqs.items()}
+
+    return ref
+
+
+def reference_rows(df: pd.DataFrame, time_col: str = "timestamp",
+                   min_rows: int = MIN_SAMPLES) -> pd.DataFrame:
+    """Rows of a training frame the live check compares against.
+
+    The field (time-stamped) rows when there are at least min_rows of them,
+    else the whole frame — the bundled CSVs alone sit far from the Pi's
+    readings and would flag every night's data as drift.
+    """
+    if time_col in df.columns:
+        field = df[df[time_col].notna()]
+        if len(field) >= min_rows:
+            return field
+    return df
+
+
+def save_reference(version_dir: str, df: pd.DataFrame, features: List[str],
+                   categorical: Optional[List[str]] = None) -> str:
+    """Store reference stats (of the trained field rows, see reference_rows) next to a model version."""
+    path = os.path.join(version_dir, REFERENCE_FILE)
+    with open(path, "w") as f:
+        json.dump(build_reference(reference_rows(df), features, categorical), f, indent=2)
+    return path
+
+
+def reference_frame(model, sample_rows: int = REFERENCE_SAMPLE_ROWS):
+    """(training rows for save_reference, data fingerprint) of a model's dataset.
+
+    Out-of-core models stream their blocks once into a uniform row sample and
+    a fingerprint identical to data_fingerprint() of the whole frame.
+    """
+    if not getattr(model, "memory_cap_mb", None):
+        df = model.load_dataset()
+        return df, data_fingerprint(df)
+    sample, fp = RowSample(sample_rows), StreamFingerprint()
+    for chunk in model.iter_chunks(block_rows(len(source_columns(model.sources())), model.memory_cap_mb)):
+        sample.add(chunk)
+        fp.update(chunk)
+    return sample.frame, fp.hexdigest()
+
+
+def load_reference(model_dir: str) -> Optional[Dict]:
+    """Reference stats of the newest trained version, else of current/.
+
+    A retrain that already saw the live rows but was not promoted must not
+    fire again on the same data, so the newest version wins over current/.
+    """
+    folders = [os.path.join(model_dir, "current")]
+    latest = Manifest(model_dir).latest()
+    if latest is not None:
+        folders.insert(0, os.path.join(model_dir, "versions", latest["version"]))
+    for folder in folders:
+        path = os.path.join(folder, REFERENCE_FILE)
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                return json.load(f)
+    return None
+
+
+def _histogram(values: np.ndarray, inner_edges: np.ndarray) -> np.ndarray:
+    """Counts over (-inf, e0], (e0, e1], ..., (e_last, inf)."""
+    idx = np.searchsorted(inner_edges, values, side="left")
+    return np.bincount(idx, minlength=len(inner_edges) + 1).astype(float)
+
+
+# =========================================
+# DRIFT STATISTICS
+# =========================================
+def psi(ref_probs: np.ndarray, cur_probs: np.ndarray) -> float:
+    """Population Stability Index."""
+    r = np.clip(ref_probs, EPS, None)
+    c = np.clip(cur_probs, EPS, None)
+    return float(np.sum((c - r) * np.log(c / r)))
+
+
+def binned_ks(ref_probs: np.ndarray, cur_probs: np.ndarray) -> float:
+    """Kolmogorov–Smirnov distance evaluated at the bin edges."""
+    return float(np.max(np.abs(np.cumsum(ref_probs) - np.cumsum(cur_probs))))
+
+
+# =========================================
+# STREAMING MONITOR
+# =========================================
+class DriftMonitor:
+    """Incremental histograms of live features against a stored reference."""
+
+    def __init__(self, reference: Dict, psi_threshold: float = PSI_THRESHOLD,
+                 ks_threshold: float = KS_THRESHOLD, min_samples: int = MIN_SAMPLES):
+        self.reference = reference
+        self.psi_threshold = psi_threshold
+        self.ks_threshold = ks_threshold
+        self.min_samples = min_samples
+
+        self._edges = {c: np.asarray(r["edges"]) for c, r in reference["numeric"].items()}
+        self.counts = {c: np.zeros(len(e) + 1) for c, e in self._edges.items()}
+        self.cat_counts: Dict[str, Dict[str, float]] = {c: {} for c in reference["categorical"]}
+        self.n = 0
+
+    # -----------------------------------------
+    def update(self, rows) -> None:
+        """Add a batch of readings (DataFrame, dict of columns, or one dict row)."""
+        if isinstance(rows, dict) and not any(isinstance(v, (list, np.ndarray, pd.Series)) for v in rows.values()):
+            rows = {k: [v] for k, v in rows.items()}
+        df = rows if isinstance(rows, pd.DataFrame) else pd.DataFrame(rows)
+
+        for col, edges in self._edges.items():
+            if col not in df:
+                continue
+            values = pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=float)
+            values = values[np.isfinite(values)]
+            self.counts[col] += _histogram(values, edges)
+
+        for col, counts in self.cat_counts.items():
+            if col not in df:
+                continue
+            for key, cnt in df[col].astype(str).value_counts().items():
+                counts[key] = counts.get(key, 0) + int(cnt)
+
+        self.n += len(df)
+
+    # -----------------------------------------
+    def report(self) -> Dict[str, Dict]:
+        """Per-feature PSI / KS and whether it crossed a threshold."""
+        out = {}
+        for col, counts in self.counts.items():
+            total = counts.sum()
+            if total == 0:
+                continue
+            ref = np.asarray(self.reference["numeric"][col]["probs"])
+            cur = counts / total
+            p, k = psi(ref, cur), binned_ks(ref, cur)
+            out[col] = {"psi": p, "ks": k, "n": int(total),
+                        "drift": p > self.psi_threshold or k > self.ks_threshold}
+
+        for col, counts in self.cat_counts.items():
+            total = sum(counts.values())
+            if total == 0:
+                continue
+            ref_map = self.reference["categorical"][col]
+            keys = sorted(set(ref_map) | set(counts))
+            ref = np.array([ref_map.get(k, 0.0) for k in keys])
+            cur = np.array([counts.get(k, 0) / total for k in keys])
+            p = psi(ref, cur)
+            out[col] = {"psi": p, "ks": None, "n": int(total), "drift": p > self.psi_threshold}
+        return out
+
+    def drifted_features(self) -> List[str]:
+        return [c for c, r in self.report().items() if r["drift"]]
+
+    def should_retrain(self) -> bool:
+        """True once enough samples are seen and at least one feature drifted."""
+        return self.n >= self.min_samples and bool(self.drifted_features())
+
+    # -----------------------------------------
+    def state_dict(self) -> Dict:
+        """Serialisable sketch state (to persist on the edge or ship to CI)."""
+        return {
+            "n": self.n,
+            "counts": {c: v.tolist() for c, v in self.counts.items()},
+            "cat_counts": self.cat_counts,
+        }
+
+    def load_state_dict(self, state: Dict) -> None:
+        self.n = int(state["n"])
+        for c, v in state["counts"].items():
+            if c in self.counts:
+                self.counts[c] = np.asarray(v, dtype=float)
+        for c, v in state["cat_counts"].items():
+            if c in self.cat_counts:
+                self.cat_counts[c] = dict(v)
+
+    def merge(self, other: "DriftMonitor") -> None:
+        """Combine sketches from several devices that share a reference."""
+        self.n += other.n
+        for c in self.counts:
+            self.counts[c] += other.counts[c]
+        for c, counts in other.cat_counts.items():
+            for k, v in counts.items():
+                self.cat_counts[c][k] = self.cat_counts[c].get(k, 0) + v
+
+
+# =========================================
+# CLI: CHECK LIVE DATA AGAINST CURRENT MODELS
+# =========================================
+# dataset -> live readings, first existing wins: the store merged from uploaded
+# batches (mlops/merge_batches.py), else the CSV the Pi commits (as mlops/shadow.py)
+LIVE_SOURCES = {
+    "irrigation": [os.path.join(DATA_PATH, "live", "irrigation.csv"),
+                   os.path.join(DATA_PATH, "new_irrigation.csv")],
+    "plant_health": [os.path.join(DATA_PATH, "live", "plant_health.csv"),
+                     os.path.join(DATA_PATH, "new_plant_health.csv")],
+}
+
+
+def live_source(dataset: str) -> str:
+    """Live readings to check for a dataset (the last candidate if none exists yet)."""
+    for path in LIVE_SOURCES[dataset]:
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            return path
+    return LIVE_SOURCES[dataset][-1]
+
+
+def _iter_chunks(path: str, chunksize: int = 50_000) -> Iterable[pd.DataFrame]:
+    if not os.path.exists(path):
+        return []
+    return pd.read_csv(path, chunksize=chunksize)
+
+
+def check_model(name: str, model_dir: str, train_csv: str, live_csv: str,
+                features: List[str], categorical: Optional[List[str]] = None) -> Dict:
+    """Stream live_csv through a DriftMonitor for one model."""
+    reference = load_reference(model_dir)
+    if reference is None:
+        # Versions trained before reference stats existed: rebuild from the training CSV
+        reference = build_reference(pd.read_csv(train_csv), features, categorical)
+
+    monitor = DriftMonitor(reference)
+    for chunk in _iter_chunks(live_csv):
+        monitor.update(chunk)
+
+    return {
+        "model": name,
+        "samples": monitor.n,
+        "report": monitor.report(),
+        "retrain": monitor.should_retrain(),
+    }
+
+
+def write_drift_report(results: List[Dict]) -> str:
+    report_dir = os.path.join(PROJECT_ROOT, "reports")
+    os.makedirs(report_dir, exist_ok=True)
+    path = os.path.join(report_dir, "drift_report.md")
+
+    with open(path, "w") as f:
+        f.write(f"# 📈 Drift Report – {timestamp()}\n\n")
+        for res in results:
+            f.write(f"## {res['model']}\n")
+            f.write(f"- Live samples: {res['samples']}\n")
+            f.write(f"- Retrain triggered? {'✅ Yes' if res['retrain'] else '❌ No'}\n\n")
+            f.write("| Feature | PSI | KS | Drift |\n|---|---|---|---|\n")
+            for col, r in res["report"].items():
+                ks = "-" if r["ks"] is None else f"{r['ks']:.3f}"
+                f.write(f"| {col} | {r['psi']:.3f} | {ks} | {'⚠' if r['drift'] else ''} |\n")
+            f.write("\n")
+
+    print(f"📝 Drift report written → {path}")
+    return path
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Check live data for feature drift.")
+    parser.add_argument("--irrigation-live", help="default: data/live/irrigation.csv, else data/new_irrigation.csv")
+    parser.add_argument("--plant-live", help="default: data/live/plant_health.csv, else data/new_plant_health.csv")
+    args = parser.parse_args(argv)
+    irrigation_live = args.irrigation_live or live_source("irrigation")
+    plant_live = args.plant_live or live_source("plant_health")
+    print(f"📥 Live readings: {irrigation_live}, {plant_live}")
+
+    results = [
+        check_model("Irrigation Model", IRRIGATION_MODEL_DIR,
+                    os.path.join(DATA_PATH, "irrigation.csv"), irrigation_live,
+                    IRRIGATION_FEATURES, IRRIGATION_CATEGORICAL),
+        check_model("Plant Health Model", PLANT_MODEL_DIR,
+                    os.path.join(DATA_PATH, "plant_health_data.csv"), plant_live,
+                    PLANT_FEATURES),
+    ]
+    write_drift_report(results)
+
+    if any(r["retrain"] for r in results):
+        print("⚠ Drift detected → retrain.")
+        return 0
+    print("✔ No significant drift → skipping retrain.")
+    return NO_DRIFT_EXIT_CODE
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,160 @@
+"""
+Training-time compiler for the irrigation decision lookup table.
+
+Evaluates the trained irrigation SVC on a regular (MOI, temp, humidity) grid
+for every (soil type, seedling stage) pair and packs the result into an
+IrrigationLUT (src/irrigation_lut.py). The table is then checked against the
+exact model on the holdout split before it is saved next to the model.
+
+Only promoted versions get a table (`compile_for_version`, called from
+promotion in mlops/pipeline.py), so nights without a promotion skip the grid
+evaluation and add no table to the committed version folders.
+"""
+import os
+import json
+import time
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.metrics import accuracy_score
+
+from src.irrigation_lut import IrrigationLUT, AXES
+from src.Irrigation_Model import IrrigationModel
+
+LUT_FILE = "irrigation_lut.npz"
+
+# (low, high, step) per continuous axis, in raw units. With int8 interpolation
+# this grid still agrees with the exact model on 100 % of the current holdout
+# and compiles ~8x faster than 2 % / 2 °C / 4 % steps (21 s vs 174 s)
+DEFAULT_GRID = {
+    "MOI": (0.0, 100.0, 4.0),         # %
+    "temp": (-10.0, 50.0, 4.0),       # °C
+    "humidity": (0.0, 100.0, 10.0),   # %
+}
+
+# int8 + interpolation tracks the boundary between grid points; "bits"
+# (nearest cell) stays below MIN_AGREEMENT even on the finer grid
+DEFAULT_MODE = "int8"
+MIN_AGREEMENT = 0.99
+EVAL_CHUNK = 200_000
+
+
+def _axes(grid: Dict[str, Tuple[float, float, float]]):
+    lo, step, shape, points = [], [], [], []
+    for name in AXES:
+        a, b, s = grid[name]
+        n = int(round((b - a) / s)) + 1
+        lo.append(a)
+        step.append(s)
+        shape.append(n)
+        points.append(a + s * np.arange(n))
+    return lo, step, shape, points
+
+
+def _evaluate_soil(model, mean, scale, soil: int, n_stages: int, mesh: np.ndarray) -> np.ndarray:
+    """Decision values for one soil type, all stages, all grid cells."""
+    cells = len(mesh)
+    out = np.empty(n_stages * cells, dtype=np.float64)
+    for g in range(n_stages):
+        X = np.column_stack([np.full(cells, soil), np.full(cells, g), mesh])
+        X_scaled = (X - mean) / scale
+        for i in range(0, cells, EVAL_CHUNK):
+            chunk = X_scaled[i:i + EVAL_CHUNK]
+            out[g * cells + i: g * cells + i + len(chunk)] = model.decision_function(chunk)
+    return out
+
+
+def compile_lut(model, scaler, encoders, grid: Optional[Dict] = None, mode: str = DEFAULT_MODE,
+                n_jobs: int = -1) -> IrrigationLUT:
+    """Evaluate `model` over the grid for every (soil, stage) and build the table."""
+    grid = grid or DEFAULT_GRID
+    soil_types = list(encoders["soil_type"].classes_)
+    stages = list(encoders["Seedling Stage"].classes_)
+    lo, step, shape, points = _axes(grid)
+    mesh = np.stack(np.meshgrid(*points, indexing="ij"), axis=-1).reshape(-1, 3)
+
+    # One soil type per worker; libsvm's decision_function is single-threaded
+    start = time.perf_counter()
+    parts = Parallel(n_jobs=n_jobs)(
+        delayed(_evaluate_soil)(model, scaler.mean_, scaler.scale_, s, len(stages), mesh)
+        for s in range(len(soil_types))
+    )
+    decisions = np.concatenate(parts)
+    elapsed = time.perf_counter() - start
+
+    if mode == "bits":
+        table = np.packbits(decisions > 0)
+        scale = 1.0
+    else:
+        scale = float(np.max(np.abs(decisions))) / 127.0 or 1.0
+        table = np.clip(np.rint(decisions / scale), -127, 127).astype(np.int8)
+
+    print(f"🧮 Irrigation LUT ({mode}): {len(soil_types)}×{len(stages)}×{'×'.join(map(str, shape))} "
+          f"cells in {elapsed:.1f}s, {table.nbytes / 1024:.0f} KB")
+    return IrrigationLUT(table, mode, soil_types, stages, lo, step, shape, scale)
+
+
+def check_lut(lut: IrrigationLUT, model, scaler, X_test_scaled, y_test) -> Dict:
+    """Compare the table with the exact model on held-out (scaled) rows."""
+    raw = np.asarray(X_test_scaled) * scaler.scale_ + scaler.mean_
+    soil_idx = np.rint(raw[:, 0]).astype(np.int64)
+    stage_idx = np.rint(raw[:, 1]).astype(np.int64)
+
+    exact = np.asarray(model.predict(X_test_scaled))
+
+    start = time.perf_counter()
+    table = lut.predict_batch(soil_idx, stage_idx, raw[:, 2], raw[:, 3], raw[:, 4])
+    lut_seconds = time.perf_counter() - start
+
+    return {
+        "mode": lut.mode,
+        "bytes": lut.nbytes,
+        "agreement": float(np.mean(table == exact)),
+        "exact_acc": float(accuracy_score(y_test, exact)),
+        "lut_acc": float(accuracy_score(y_test, table)),
+        "lut_us_per_row": lut_seconds / max(len(raw), 1) * 1e6,
+    }
+
+
+def compile_and_save(trained, model_dir: str, grid: Optional[Dict] = None, mode: str = DEFAULT_MODE,
+                     min_agreement: float = MIN_AGREEMENT) -> Dict:
+    """Build, verify and save the LUT for a freshly trained IrrigationModel."""
+    path = os.path.join(model_dir, LUT_FILE)
+    if getattr(trained, "rolling", False):
+        # The grid covers the instantaneous inputs only
+        print("⚠ Model uses rolling features; LUT not built.")
+        if os.path.exists(path):
+            os.remove(path)
+        return {"saved": False, "reason": "rolling features"}
+
+    lut = compile_lut(trained.model, trained.scaler, trained.encoders, grid, mode)
+    _, X_test, _, y_test = trained.split
+    report = check_lut(lut, trained.model, trained.scaler, X_test, y_test)
+
+    report["saved"] = report["agreement"] >= min_agreement
+    if report["saved"]:
+        lut.save(path)
+        print(f"✔ LUT agrees with exact model on {report['agreement']:.2%} of holdout → {path}")
+    else:
+        print(f"⚠ LUT agreement {report['agreement']:.2%} < {min_agreement:.0%}; not saved.")
+        if os.path.exists(path):
+            os.remove(path)
+    return report
+
+
+def compile_for_version(version_dir: str, X_test, y_test, grid: Optional[Dict] = None,
+                        mode: str = DEFAULT_MODE) -> Dict:
+    """Build the LUT for a saved (promoted) version; table + lut_report.json go into version_dir."""
+    trained = IrrigationModel.load_dir(version_dir)
+    trained.split = (None, X_test, None, y_test)
+    report = compile_and_save(trained, version_dir, grid, mode)
+    save_lut_report(version_dir, report)
+    return report
+
+
+def save_lut_report(version_dir: str, report: Dict) -> str:
+    path = os.path.join(version_dir, "lut_report.json")
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+    return path
@@ -0,0 +1,281 @@
+"""
+Per-model version manifest.
+
+Each model folder keeps `manifest.jsonl`, an append-only log of version
+records. One line is one update to one version; replaying the file gives the
+current state of every version without listing or parsing folder names:
+
+    {"version": "2026-01-31_04-13-43_acc_0.9559", "timestamp": "...",
+     "acc": 0.9559, "status": "ready", "bytes": 236151,
+     "fingerprint": "9c1e…", "metrics": {"latency_ms": 0.85, ...}}
+
+Status lifecycle: building → ready → current → ready (after a newer promotion)
+→ deleted. Appends take an exclusive file lock and are flushed + fsynced, so a
+crash leaves at most one partial trailing line, which is ignored on load.
+The log is compacted (re-read and rewritten atomically, under the same lock)
+once it grows well past the number of versions.
+
+Folders created before the manifest existed are imported from their
+`<timestamp>_acc_<acc>` names; they are written out with the first update, so
+opening a manifest only to read it never creates the file.
+"""
+import os
+import json
+import hashlib
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows; appends are then unlocked
+    fcntl = None
+
+MANIFEST_FILE = "manifest.jsonl"
+COMPACT_FACTOR = 4
+
+BUILDING, READY, CURRENT, DELETED = "building", "ready", "current", "deleted"
+
+
+class StreamFingerprint:
+    """data_fingerprint() built up block by block over a streamed dataset."""
+
+    def __init__(self):
+        self._hash = None
+
+    def update(self, df) -> None:
+        import pandas as pd
+
+        if self._hash is None:
+            self._hash = hashlib.sha256(",".join(map(str, df.columns)).encode())
+        self._hash.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+
+    def hexdigest(self) -> str:
+        return (self._hash or hashlib.sha256()).hexdigest()[:16]
+
+
+def data_fingerprint(df) -> str:
+    """Order-sensitive content hash of a training DataFrame."""
+    fp = StreamFingerprint()
+    fp.update(df)
+    return fp.hexdigest()
+
+
+def dir_bytes(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, f)) for f in files)
+    return total
+
+
+def _parse_folder(name: str) -> Optional[Dict]:
+    """Legacy '<YYYY-mm-dd_HH-MM-SS>_acc_<acc>' folder name → record."""
+    stamp, sep, acc = name.partition("_acc_")
+    if not sep:
+        return None
+    try:
+        ts = datetime.strptime(stamp, "%Y-%m-%d_%H-%M-%S")
+        return {"version": name, "timestamp": ts.isoformat(), "acc": float(acc)}
+    except ValueError:
+        return None
+
+
+class Manifest:
+    """Replayed view of one model folder's manifest.jsonl."""
+
+    def __init__(self, model_dir: str):
+        self.model_dir = model_dir
+        self.path = os.path.join(model_dir, MANIFEST_FILE)
+        self.records: Dict[str, Dict] = {}
+        self._lines = 0
+        self._unsaved: List[Dict] = []     # imported folders, written with the first update
+        self._load()
+
+    # -----------------------------------------
+    def _load(self) -> None:
+        if not os.path.exists(self.path):
+            self._import_folders()
+            return
+        self._read()
+
+    def _read(self) -> None:
+        with open(self.path, "r") as f:
+            for line in f:
+                try:
+                    update = json.loads(line)
+                except ValueError:
+                    continue   # torn trailing write
+                self._apply(update)
+                self._lines += 1
+
+    def _apply(self, update: Dict) -> None:
+        rec = self.records.setdefault(update["version"], {"version": update["version"]})
+        metrics = update.get("metrics")
+        rec.update({k: v for k, v in update.items() if k != "metrics"})
+        if metrics:
+            rec.setdefault("metrics", {}).update(metrics)
+
+    def _import_folders(self) -> None:
+        versions_root = os.path.join(self.model_dir, "versions")
+        if not os.path.isdir(versions_root):
+            return
+        updates = []
+        for name in sorted(os.listdir(versions_root)):
+            path = os.path.join(versions_root, name)
+            rec = _parse_folder(name) if os.path.isdir(path) else None
+            if rec is not None:
+                updates.append({**rec, "status": READY, "bytes": dir_bytes(path)})
+        for u in updates:
+            self._apply(u)
+        self._unsaved = updates
+
+    @contextmanager
+    def _locked(self):
+        """The log opened for appending, under an exclusive lock.
+
+        compact() swaps in a new file by rename, so a writer that was waiting
+        on the old file reopens until it holds the lock on the file at `path`.
+        """
+        os.makedirs(self.model_dir, exist_ok=True)
+        while True:
+            f = open(self.path, "a")
+            if fcntl is None:
+                break
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                if os.fstat(f.fileno()).st_ino == os.stat(self.path).st_ino:
+                    break
+            except FileNotFoundError:
+                pass
+            f.close()
+        try:
+            yield f
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            f.close()
+
+    def _append(self, updates: List[Dict]) -> None:
+        with self._locked() as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                updates = self._unsaved + updates
+            self._unsaved = []
+            f.write("".join(json.dumps(u, sort_keys=True, default=str) + "\n" for u in updates))
+            f.flush()
+            os.fsync(f.fileno())
+        for u in updates:
+            self._apply(u)
+        self._lines += len(updates)
+        if self._lines > COMPACT_FACTOR * max(len(self.records), 8):
+            self.compact()
+
+    # -----------------------------------------
+    def put(self, version: str, **fields) -> Dict:
+        """Add or update one version (fields are merged; `metrics` is merged too)."""
+        self._append([{"version": version, **fields}])
+        return self.records[version]
+
+    def set_current(self, version: str) -> None:
+        """Mark `version` current and demote the previous current in one write."""
+        now = datetime.now().isoformat(timespec="seconds")
+        updates = [{"version": v, "status": READY} for v in self.current_versions() if v != version]
+        updates.append({"version": version, "status": CURRENT, "promoted_at": now})
+        self._append(updates)
+
+    def mark_deleted(self, versions: List[str]) -> None:
+        if versions:
+            self._append([{"version": v, "status": DELETED} for v in versions])
+
+    def compact(self) -> None:
+        """Rewrite the log as one line per version (atomic rename, under the lock)."""
+        with self._locked():
+            # Replay the file itself: other writers may have appended since we loaded
+            self.records, self._lines = {}, 0
+            self._read()
+            tmp = self.path + ".tmp"
+            with open(tmp, "w") as f:
+                for rec in self.records.values():
+                    f.write(json.dumps(rec, sort_keys=True, default=str) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+        self._lines = len(self.records)
+
+    # -----------------------------------------
+    # QUERIES
+    # -----------------------------------------
+    def versions(self, statuses=(READY, CURRENT)) -> List[Dict]:
+        """Records with the given statuses, oldest first."""
+        rows = [r for r in self.records.values() if r.get("status") in statuses]
+        return sorted(rows, key=lambda r: (r.get("timestamp") or "", r["version"]))
+
+    def latest(self) -> Optional[Dict]:
+        rows = self.versions()
+        return rows[-1] if rows else None
+
+    def current_versions(self) -> List[str]:
+        return [r["version"] for r in self.records.values() if r.get("status") == CURRENT]
+
+    def previous_current(self) -> Optional[Dict]:
+        """Most recently promoted version before the current one (rollback target)."""
+        promoted = [r for r in self.versions() if r.get("promoted_at") and r.get("status") == READY]
+        return max(promoted, key=lambda r: r["promoted_at"]) if promoted else None
+
+    def best(self, metric: str = "acc", max_latency_ms: Optional[float] = None,
+             latency_key: str = "latency_ms", max_bytes: Optional[int] = None) -> Optional[Dict]:
+        """Highest `metric` among live versions within the latency / size budgets.
+
+        Versions with no recorded latency are excluded when a budget is given.
+        """
+        def value(r, key):
+            return r.get(key, r.get("metrics", {}).get(key))
+
+        rows = []
+        for r in self.versions():
+            if value(r, metric) is None:
+                continue
+            if max_latency_ms is not None:
+                lat = value(r, latency_key)
+                if lat is None or lat > max_latency_ms:
+                    continue
+            if max_bytes is not None and (r.get("bytes") or 0) > max_bytes:
+                continue
+            rows.append(r)
+        return max(rows, key=lambda r: (value(r, metric), r.get("timestamp") or "")) if rows else None
+
+    def retention(self, keep_last: int = 30, keep_best: int = 0, metric: str = "acc") -> List[str]:
+        """Versions a retention policy would delete: all but the newest `keep_last`,
+        the top `keep_best` by `metric`, and anything current."""
+        rows = self.versions()
+        keep = {r["version"] for r in rows[-keep_last:]} if keep_last > 0 else set()
+        if keep_best > 0:
+            scored = [r for r in rows if r.get(metric) is not None]
+            keep |= {r["version"] for r in sorted(scored, key=lambda r: r[metric])[-keep_best:]}
+        keep |= set(self.current_versions())
+        return [r["version"] for r in rows if r["version"] not in keep]
+
+
+# =========================================
+# CLI
+# =========================================
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Query a model folder's version manifest.")
+    parser.add_argument("model_dir", help="e.g. models/irrigation")
+    parser.add_argument("--best", action="store_true", help="print the best version by accuracy")
+    parser.add_argument("--max-latency-ms", type=float, default=None)
+    parser.add_argument("--compact", action="store_true", help="rewrite the log, one line per version")
+    args = parser.parse_args()
+
+    manifest = Manifest(args.model_dir)
+    if args.compact:
+        manifest.compact()
+    if args.best:
+        print(json.dumps(manifest.best(max_latency_ms=args.max_latency_ms), indent=2))
+    else:
+        for r in manifest.versions(statuses=(BUILDING, READY, CURRENT)):
+            lat = r.get("metrics", {}).get("latency_ms")
+            lat = f"{lat:.3f} ms" if lat is not None else "-"
+            print(f"{r['version']:<34} {r.get('status', '-'):<9} acc={r.get('acc', 0):.4f} "
+                  f"latency={lat:<10} {(r.get('bytes') or 0) / 1024:.0f} KB")
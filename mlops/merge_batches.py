@@ -0,0 +1,142 @@
+"""
+Fold uploaded row batches into the live-data store, idempotently.
+
+Batches come from the Pi's uploader (src/batch_upload.py) as
+`data/batches/<dataset>-<hash>.npz`. Each dataset has an append-only store
+
+    data/live/<dataset>.csv          rows + a row_hash column
+    data/live/<dataset>.index.npz    row hashes already in the CSV + CSV size
+    data/live/merged.json            batch ids already folded in
+
+A batch is merged at most once (ledger), and inside a batch only rows whose
+hash is not in the index are appended, so replays, resent batches and
+overlapping sources never duplicate rows. The CSV is only appended to; cost is
+proportional to the batch, plus one vectorised membership test against the
+8-byte-per-row hash index.
+
+Usage:
+    python3 -m mlops.merge_batches
+    python3 -m mlops.merge_batches --keep-batches
+"""
+import os
+import json
+import argparse
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+from mlops.config import DATA_PATH
+from src.batch_upload import read_batch
+
+BATCH_DIR = os.path.join(DATA_PATH, "batches")
+LIVE_DIR = os.path.join(DATA_PATH, "live")
+LEDGER_FILE = "merged.json"
+HASH_COL = "row_hash"
+
+
+class LiveStore:
+    """Append-only CSV + hash index for one dataset."""
+
+    def __init__(self, live_dir: str, dataset: str):
+        self.csv = os.path.join(live_dir, f"{dataset}.csv")
+        self.index_file = os.path.join(live_dir, f"{dataset}.index.npz")
+        self.columns = None
+        if os.path.exists(self.csv):
+            self.columns = list(pd.read_csv(self.csv, nrows=0).columns)
+        self.hashes = self._load_index()
+
+    def _load_index(self) -> np.ndarray:
+        if not os.path.exists(self.csv):
+            return np.empty(0, dtype=np.uint64)
+        if os.path.exists(self.index_file):
+            with np.load(self.index_file) as data:
+                # Index matches the CSV it was saved with; otherwise a crash
+                # hit between the CSV append and the index save → rebuild
+                if int(data["csv_bytes"]) == os.path.getsize(self.csv):
+                    return data["hashes"]
+        column = pd.read_csv(self.csv, usecols=[HASH_COL], dtype={HASH_COL: np.uint64})
+        index = column[HASH_COL].to_numpy(dtype=np.uint64)
+        self._save_index(index)
+        return index
+
+    def _save_index(self, index: np.ndarray) -> None:
+        tmp = f"{self.index_file}.tmp.npz"
+        np.savez(tmp, hashes=index, csv_bytes=os.path.getsize(self.csv))
+        os.replace(tmp, self.index_file)
+
+    def append(self, df: pd.DataFrame, hashes: np.ndarray) -> int:
+        """Append rows not already stored; returns rows written."""
+        new = ~np.isin(hashes, self.hashes)
+        if not new.any():
+            return 0
+        df = df[new].copy()
+        df[HASH_COL] = hashes[new]
+
+        if self.columns is None:
+            self.columns = list(df.columns)
+            df.to_csv(self.csv, index=False)
+        else:
+            # Store schema wins; columns the batch lacks are left empty
+            df.reindex(columns=self.columns).to_csv(self.csv, mode="a", header=False, index=False)
+
+        self.hashes = np.concatenate([self.hashes, hashes[new]])
+        self._save_index(self.hashes)
+        return int(new.sum())
+
+
+def _load_ledger(path: str) -> Dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def _save_ledger(path: str, ledger: Dict) -> None:
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(ledger, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def merge_batches(batch_dir: str = BATCH_DIR, live_dir: str = LIVE_DIR,
+                  keep_batches: bool = False) -> Dict:
+    """Merge every pending batch; returns counts."""
+    os.makedirs(live_dir, exist_ok=True)
+    ledger_path = os.path.join(live_dir, LEDGER_FILE)
+    ledger = _load_ledger(ledger_path)
+    stores: Dict[str, LiveStore] = {}
+    stats = {"batches": 0, "skipped_batches": 0, "rows": 0, "duplicate_rows": 0}
+
+    names = sorted(n for n in os.listdir(batch_dir) if n.endswith(".npz")) if os.path.isdir(batch_dir) else []
+    for name in names:
+        path = os.path.join(batch_dir, name)
+        batch = name[:-len(".npz")]
+        if batch in ledger:
+            stats["skipped_batches"] += 1
+        else:
+            dataset, df, hashes = read_batch(path)
+            store = stores.setdefault(dataset, LiveStore(live_dir, dataset))
+            written = store.append(df, hashes)
+
+            ledger[batch] = {"dataset": dataset, "rows": len(df), "new_rows": written}
+            _save_ledger(ledger_path, ledger)
+            stats["batches"] += 1
+            stats["rows"] += written
+            stats["duplicate_rows"] += len(df) - written
+
+        if not keep_batches:
+            os.remove(path)
+
+    print(f"🧺 Merged {stats['batches']} batches: {stats['rows']} new rows, "
+          f"{stats['duplicate_rows']} duplicates, {stats['skipped_batches']} batches already merged")
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Merge uploaded row batches into data/live/.")
+    parser.add_argument("--batch-dir", default=BATCH_DIR)
+    parser.add_argument("--live-dir", default=LIVE_DIR)
+    parser.add_argument("--keep-batches", action="store_true", help="do not delete merged batch files")
+    args = parser.parse_args()
+    merge_batches(args.batch_dir, args.live_dir, args.keep_batches)
@@ -0,0 +1,759 @@
+"""
+Cached, resumable retraining pipeline.
+
+The nightly retrain is a graph of stages per task (irrigation, plant_health):
+
+    clean_<task>    CSVs → quality-checked dataset             dataset.pkl
+                    (bundled CSV + data/live/<task>.csv field rows)
+                    (out-of-core: dataset.csv + sample.pkl)
+    encode_<task>   dataset → scaled features + labels         X.npy, y.npy, preprocess.pkl
+                    (out-of-core: float32 X.npy written block by block)
+    split_<task>    row count → train/holdout indices          train_idx.npy, test_idx.npy
+    reduce_<task>   training rows → near-duplicates collapsed  X_train.npy, y_train.npy, weights.npy
+                    (+ optional coreset); holdout stays raw
+    fit_<task>      arrays + split → fitted SVC + accuracy     model.pkl
+    calibrate_<task> holdout decision values → calibrator       calibration.pkl
+    publish_<task>  compact model, LUT, version folder, drift reference
+    promote         compare with last_metrics.json, update current/, report
+
+Every cached stage is keyed by a SHA-256 over its name, code version, params,
+the contents of its input files and source modules, and the content hashes of
+its dependencies' outputs. Outputs live under
+
+    .pipeline_cache/<stage>/<key>/      (+ _stage.json marker, written last)
+
+so a rerun with unchanged inputs reuses them, and a run that failed half-way
+resumes from the last stage that finished. Stages whose dependencies are done
+run concurrently (the two tasks are independent until `promote`).
+
+With OUT_OF_CORE set for a task (mlops/config.py) its stages stream the data
+in blocks (src/out_of_core.py) and read X.npy memory-mapped, keeping the
+working set within MEMORY_CAP_MB; the holdout is capped at the same row budget.
+
+CLI:
+    python3 -m mlops.pipeline                      # whole graph
+    python3 -m mlops.pipeline --stage fit_irrigation
+    python3 -m mlops.pipeline --stage publish_irrigation --force
+    python3 -m mlops.pipeline --list
+"""
+import os
+import sys
+import json
+import shutil
+import hashlib
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Callable, Dict, List, Optional, Sequence
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.metrics import accuracy_score
+
+from mlops.config import (
+    PROJECT_ROOT, IRRIGATION_MODEL_DIR, PLANT_MODEL_DIR, SVC_PROBABILITY, TRAIN_DEDUPE, CORESET_SIZE,
+    ROLLING_FEATURES, SHADOW_GATE, OUT_OF_CORE, MEMORY_CAP_MB,
+)
+from mlops import profiling, shadow
+from mlops.metrics import load_last_metrics, save_metrics
+from mlops.calibrate import calibrate
+from mlops.lookup_table import compile_for_version
+from mlops.manifest import StreamFingerprint
+from mlops.drift import REFERENCE_SAMPLE_ROWS
+from mlops.utils import (
+    set_current_from_version_dir, cleanup_old_versions, write_nightly_report, fit_time_summary,
+)
+from mlops.train_irrigation import publish_irrigation
+from mlops.train_plant_health import publish_plant_health
+from src.Irrigation_Model import IrrigationModel
+from src.plant_health import PlantHealthModel
+from src.calibration import Calibrator
+from src.out_of_core import (RowSample, block_rows, csv_columns, preprocess_to_map, read_csv_chunks,
+                             reduce_from_map, row_budget, source_columns, split_rows)
+
+CACHE_DIR = os.path.join(PROJECT_ROOT, ".pipeline_cache")
+MARKER = "_stage.json"
+KEEP_ENTRIES = 3          # cached keys kept per stage (most recent first)
+
+TEST_SIZE = 0.2
+RANDOM_STATE = 42
+
+
+# =========================================
+# HASHING
+# =========================================
+def file_sha256(path: str, chunk: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _project_path(rel: str) -> str:
+    return rel if os.path.isabs(rel) else os.path.join(PROJECT_ROOT, rel)
+
+
+# =========================================
+# STAGES
+# =========================================
+class Stage:
+    """One node of the pipeline graph.
+
+    `fn(inputs, out_dir)` receives the finished outputs of `deps` by stage
+    name, writes its files into `out_dir` and returns a JSON-serialisable
+    result dict. `files` are hashed into the cache key (data, source code).
+    """
+
+    def __init__(self, name: str, fn: Callable, deps: Sequence[str] = (),
+                 files: Sequence[str] = (), params: Optional[Dict] = None,
+                 version: int = 1, cache: bool = True,
+                 valid: Optional[Callable[[Dict], bool]] = None):
+        self.name = name
+        self.fn = fn
+        self.deps = list(deps)
+        self.files = list(files)
+        self.params = params or {}
+        self.version = version
+        self.cache = cache
+        self.valid = valid
+
+
+class StageOutput:
+    """Finished stage: its cache folder, result dict and output content hash."""
+
+    def __init__(self, name: str, out_dir: Optional[str], result: Dict, digest: str, cached: bool):
+        self.name = name
+        self.dir = out_dir
+        self.result = result
+        self.digest = digest
+        self.cached = cached
+
+    def path(self, filename: str) -> str:
+        return os.path.join(self.dir, filename)
+
+
+def output_digest(out_dir: str, result: Dict) -> str:
+    """Content hash of a stage's files + result — what downstream keys depend on."""
+    h = hashlib.sha256(json.dumps(result, sort_keys=True, default=str).encode())
+    for name in sorted(os.listdir(out_dir)):
+        if name == MARKER:
+            continue
+        h.update(name.encode())
+        h.update(file_sha256(os.path.join(out_dir, name)).encode())
+    return h.hexdigest()
+
+
+# =========================================
+# PIPELINE
+# =========================================
+class Pipeline:
+    """Dependency-ordered, cached, concurrent execution of Stages."""
+
+    def __init__(self, stages: Sequence[Stage], cache_dir: str = CACHE_DIR, workers: int = 2):
+        self.stages = {s.name: s for s in stages}
+        self.cache_dir = cache_dir
+        self.workers = max(1, workers)
+        self._lock = threading.Lock()
+        for s in stages:
+            for d in s.deps:
+                if d not in self.stages:
+                    raise KeyError(f"Stage {s.name} depends on unknown stage {d}")
+
+    # -----------------------------------------
+    def upstream(self, targets: Sequence[str]) -> List[str]:
+        """Targets plus everything they depend on, in topological order."""
+        order, seen = [], set()
+
+        def visit(name, path=()):
+            if name in path:
+                raise ValueError(f"Cycle in pipeline: {' → '.join(path + (name,))}")
+            if name in seen:
+                return
+            for d in self.stages[name].deps:
+                visit(d, path + (name,))
+            seen.add(name)
+            order.append(name)
+
+        for t in targets:
+            if t not in self.stages:
+                raise KeyError(f"Unknown stage: {t}")
+            visit(t)
+        return order
+
+    def key(self, stage: Stage, inputs: Dict[str, StageOutput]) -> str:
+        h = hashlib.sha256()
+        h.update(json.dumps({"name": stage.name, "version": stage.version,
+                             "params": stage.params}, sort_keys=True, default=str).encode())
+        for rel in stage.files:
+            path = _project_path(rel)
+            h.update(rel.encode())
+            h.update(file_sha256(path).encode() if os.path.exists(path) else b"missing")
+        for d in stage.deps:
+            h.update(inputs[d].digest.encode())
+        return h.hexdigest()[:16]
+
+    # -----------------------------------------
+    def _load_cached(self, stage: Stage, out_dir: str) -> Optional[StageOutput]:
+        marker = os.path.join(out_dir, MARKER)
+        if not os.path.exists(marker):
+            return None
+        with open(marker, "r") as f:
+            meta = json.load(f)
+        if stage.valid is not None and not stage.valid(meta["result"]):
+            return None
+        os.utime(out_dir)   # keep recently used entries when pruning
+        return StageOutput(stage.name, out_dir, meta["result"], meta["digest"], cached=True)
+
+    def run_stage(self, stage: Stage, inputs: Dict[str, StageOutput], force: bool = False) -> StageOutput:
+        start = time.perf_counter()
+        output = self._run_stage(stage, inputs, force)
+        profiling.current().stage(stage.name, time.perf_counter() - start, output.cached)
+        return output
+
+    def _run_stage(self, stage: Stage, inputs: Dict[str, StageOutput], force: bool) -> StageOutput:
+        if not stage.cache:
+            result = stage.fn(inputs, None) or {}
+            digest = hashlib.sha256(json.dumps(result, sort_keys=True, default=str).encode()).hexdigest()
+            return StageOutput(stage.name, None, result, digest, cached=False)
+
+        key = self.key(stage, inputs)
+        stage_root = os.path.join(self.cache_dir, stage.name)
+        out_dir = os.path.join(stage_root, key)
+
+        if not force:
+            hit = self._load_cached(stage, out_dir)
+            if hit is not None:
+                print(f"♻ {stage.name}: cached ({key})")
+                return hit
+
+        # Build in a scratch folder and rename into place, so a crash never
+        # leaves a half-written entry that looks finished
+        tmp_dir = f"{out_dir}.tmp-{os.getpid()}-{threading.get_ident()}"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        try:
+            print(f"▶ {stage.name}: running ({key})")
+            result = stage.fn(inputs, tmp_dir) or {}
+            digest = output_digest(tmp_dir, result)
+            with open(os.path.join(tmp_dir, MARKER), "w") as f:
+                json.dump({"stage": stage.name, "key": key, "digest": digest, "result": result},
+                          f, indent=2, default=str)
+            with self._lock:
+                shutil.rmtree(out_dir, ignore_errors=True)
+                os.replace(tmp_dir, out_dir)
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        self._prune(stage_root)
+        return StageOutput(stage.name, out_dir, result, digest, cached=False)
+
+    def _prune(self, stage_root: str, keep: int = KEEP_ENTRIES) -> None:
+        entries = [os.path.join(stage_root, d) for d in os.listdir(stage_root)
+                   if os.path.exists(os.path.join(stage_root, d, MARKER))]
+        entries.sort(key=os.path.getmtime, reverse=True)
+        for path in entries[keep:]:
+            shutil.rmtree(path, ignore_errors=True)
+
+    # -----------------------------------------
+    def run(self, targets: Optional[Sequence[str]] = None, force: Sequence[str] = ()) -> Dict[str, StageOutput]:
+        """Run targets (default: all stages) and their dependencies.
+
+        Stages named in `force` ignore their cache; anything downstream of
+        them is re-keyed by the new output hash and reruns only if it changed.
+        Raises RuntimeError after the running stages settle if any stage failed;
+        finished stages stay cached for the next attempt.
+        """
+        order = self.upstream(targets or list(self.stages))
+        force = set(force)
+        done: Dict[str, StageOutput] = {}
+        failed: Dict[str, BaseException] = {}
+        pending = list(order)
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            while pending or running:
+                # `order` is topological, so one pass skips whole failed chains
+                for name in list(pending):
+                    stage = self.stages[name]
+                    if any(d in failed for d in stage.deps):
+                        pending.remove(name)
+                        failed[name] = RuntimeError("skipped: upstream failure")
+                    elif all(d in done for d in stage.deps):
+                        pending.remove(name)
+                        inputs = {d: done[d] for d in stage.deps}
+                        running[pool.submit(self.run_stage, stage, inputs, name in force)] = name
+
+                if not running:
+                    break
+                finished, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    name = running.pop(fut)
+                    try:
+                        done[name] = fut.result()
+                    except Exception as exc:
+                        failed[name] = exc
+                        print(f"❌ {name} failed: {exc!r}")
+
+        if failed:
+            raise RuntimeError(f"Pipeline failed at: {', '.join(failed)} "
+                               f"(completed stages are cached; rerun to resume)")
+        return done
+
+    # -----------------------------------------
+    def status(self) -> List[Dict]:
+        """Per stage: deps and whether a cache entry exists for today's inputs."""
+        rows, outputs = [], {}
+        for name in self.upstream(list(self.stages)):
+            stage = self.stages[name]
+            row = {"stage": name, "deps": stage.deps, "cached": None}
+            if stage.cache and all(d in outputs for d in stage.deps):
+                out_dir = os.path.join(self.cache_dir, name, self.key(stage, outputs))
+                hit = self._load_cached(stage, out_dir)
+                row["cached"] = hit is not None
+                if hit is not None:
+                    outputs[name] = hit
+            rows.append(row)
+        return rows
+
+
+# =========================================
+# RETRAINING STAGES
+# =========================================
+# task -> model class, model folder, attribute holding the fitted encoder(s),
+#         bundled + field (merged from the Pi's batches) training CSVs,
+#         post-training publisher, source files that shape each stage
+TASKS = {
+    "irrigation": {
+        "model": IrrigationModel,
+        "model_dir": IRRIGATION_MODEL_DIR,
+        "encoder_attr": "encoders",
+        "dataset": "data/irrigation.csv",
+        "live_dataset": "data/live/irrigation.csv",
+        "publish": publish_irrigation,
+        "model_src": ["src/Irrigation_Model.py"],
+        "publish_src": ["mlops/train_irrigation.py", "mlops/compact.py", "mlops/drift.py",
+                        "mlops/cascade.py", "src/compact_svm.py", "src/cascade.py"],
+    },
+    "plant_health": {
+        "model": PlantHealthModel,
+        "model_dir": PLANT_MODEL_DIR,
+        "encoder_attr": "label_encoder",
+        "dataset": "data/plant_health_data.csv",
+        "live_dataset": "data/live/plant_health.csv",
+        "publish": publish_plant_health,
+        "model_src": ["src/plant_health.py"],
+        "publish_src": ["mlops/train_plant_health.py", "mlops/compact.py", "mlops/drift.py",
+                        "mlops/cascade.py", "src/compact_svm.py", "src/cascade.py"],
+    },
+}
+
+
+def _cap(task) -> Optional[float]:
+    """Working-set cap in MB for an out-of-core task, else None."""
+    return MEMORY_CAP_MB if OUT_OF_CORE[task] else None
+
+
+def _block(path: str, task) -> int:
+    return block_rows(len(csv_columns(path)), _cap(task))
+
+
+def _clean(task):
+    def fn(inputs, out):
+        model = TASKS[task]["model"](rolling=ROLLING_FEATURES[task], memory_cap_mb=_cap(task))
+        if model.memory_cap_mb:
+            return _clean_chunked(model, task, out)
+        with profiling.phase("load", task) as p:
+            df = model.add_rolling(model.load_dataset())
+            p["rows"] = len(df)
+        df.to_pickle(os.path.join(out, "dataset.pkl"))
+        return {"rows": len(df), "quality": model.quality_report}
+    return fn
+
+
+def _clean_chunked(model, task, out):
+    """Cleaned blocks appended to dataset.csv; drift-reference sample + fingerprint on the way."""
+    path = os.path.join(out, "dataset.csv")
+    sample, fp, rows = RowSample(REFERENCE_SAMPLE_ROWS, RANDOM_STATE), StreamFingerprint(), 0
+    with profiling.phase("load", task) as p:
+        block = block_rows(len(source_columns(model.sources())), _cap(task))
+        for i, chunk in enumerate(model.iter_chunks(block)):
+            chunk.to_csv(path, mode="w" if i == 0 else "a", header=i == 0, index=False)
+            sample.add(chunk)
+            fp.update(chunk)
+            rows += len(chunk)
+        p["rows"] = rows
+    sample.frame.to_pickle(os.path.join(out, "sample.pkl"))
+    return {"rows": rows, "quality": model.quality_report, "fingerprint": fp.hexdigest()}
+
+
+def _encode(task):
+    def fn(inputs, out):
+        spec = TASKS[task]
+        model = spec["model"](rolling=ROLLING_FEATURES[task])
+        if _cap(task):
+            return _encode_chunked(model, inputs, task, out)
+        df = pd.read_pickle(inputs[f"clean_{task}"].path("dataset.pkl"))
+        labeled = getattr(model, "labeled", None)
+        if labeled is not None:
+            df = labeled(df)
+        if df.empty:
+            raise ValueError(f"{task}: no labeled rows to train on")
+
+        with profiling.phase("preprocess", task) as p:
+            X, y = model.preprocess(df)
+            p["rows"], p["features"] = np.asarray(X).shape
+        np.save(os.path.join(out, "X.npy"), np.asarray(X, dtype=np.float64))
+        np.save(os.path.join(out, "y.npy"), np.asarray(y))
+        joblib.dump({"scaler": model.scaler, "encoders": getattr(model, spec["encoder_attr"])},
+                    os.path.join(out, "preprocess.pkl"))
+        return {"rows": int(len(X)), "features": int(np.asarray(X).shape[1])}
+    return fn
+
+
+def _encode_chunked(model, inputs, task, out):
+    """Encoders + scaler fitted over streamed blocks of dataset.csv; float32 X.npy memory map."""
+    spec = TASKS[task]
+    path = inputs[f"clean_{task}"].path("dataset.csv")
+    block = _block(path, task)
+    labeled = getattr(model, "labeled", None)
+
+    def chunks():
+        for chunk in read_csv_chunks(path, block, quality=False):
+            yield labeled(chunk) if labeled is not None else chunk
+
+    with profiling.phase("preprocess", task) as p:
+        X, y = preprocess_to_map(chunks, model.feature_columns(), model.LABEL, model.scaler, out,
+                                 categorical=getattr(model, "encoders", None),
+                                 label_encoder=getattr(model, "label_encoder", None), block=block)
+        if X is None:
+            raise ValueError(f"{task}: no labeled rows to train on")
+        p["rows"], p["features"] = X.shape
+    rows, features = X.shape
+    del X, y
+    joblib.dump({"scaler": model.scaler, "encoders": getattr(model, spec["encoder_attr"])},
+                os.path.join(out, "preprocess.pkl"))
+    return {"rows": int(rows), "features": int(features)}
+
+
+def _split(task):
+    def fn(inputs, out):
+        enc = inputs[f"encode_{task}"].result
+        # Same permutation as train_test_split(X, y, ...) in the model classes;
+        # out-of-core the holdout is capped like the training rows
+        holdout_cap = row_budget(enc["features"], _cap(task)) if _cap(task) else None
+        train_idx, test_idx = split_rows(enc["rows"], TEST_SIZE, RANDOM_STATE, holdout_cap)
+        np.save(os.path.join(out, "train_idx.npy"), train_idx)
+        np.save(os.path.join(out, "test_idx.npy"), test_idx)
+        return {"train": int(len(train_idx)), "test": int(len(test_idx))}
+    return fn
+
+
+def _with_preprocess(model, inputs, task):
+    """Attach the scaler / encoder(s) fitted by the encode stage."""
+    pre = joblib.load(inputs[f"encode_{task}"].path("preprocess.pkl"))
+    model.scaler = pre["scaler"]
+    setattr(model, TASKS[task]["encoder_attr"], pre["encoders"])
+    return model
+
+
+def _reduce(task):
+    def fn(inputs, out):
+        model = TASKS[task]["model"](dedupe=TRAIN_DEDUPE, coreset_size=CORESET_SIZE[task],
+                                     rolling=ROLLING_FEATURES[task])
+        if _cap(task):
+            return _reduce_chunked(model, inputs, task, out)
+        df = pd.read_pickle(inputs[f"clean_{task}"].path("dataset.pkl"))
+        labeled = getattr(model, "labeled", None)
+        if labeled is not None:
+            df = labeled(df)
+        train_df = df.iloc[np.load(inputs[f"split_{task}"].path("train_idx.npy"))]
+
+        with profiling.phase("reduce", task, rows_in=len(train_df)) as p:
+            train_df, weights = model.reduce(train_df)
+            X_train, y_train = _with_preprocess(model, inputs, task).transform(train_df)
+            p["rows"] = len(train_df)
+        np.save(os.path.join(out, "X_train.npy"), np.asarray(X_train, dtype=np.float64))
+        np.save(os.path.join(out, "y_train.npy"), np.asarray(y_train))
+        np.save(os.path.join(out, "weights.npy"), weights)
+        return model.coreset_report
+    return fn
+
+
+def _reduce_chunked(model, inputs, task, out):
+    """Grid collapse over the memory-mapped training rows, block by block."""
+    enc = inputs[f"encode_{task}"]
+    _with_preprocess(model, inputs, task)
+    X, y = np.load(enc.path("X.npy"), mmap_mode="r"), np.load(enc.path("y.npy"), mmap_mode="r")
+    train_idx = np.load(inputs[f"split_{task}"].path("train_idx.npy"))
+
+    with profiling.phase("reduce", task, rows_in=len(train_idx)) as p:
+        X_train, y_train, weights, report = reduce_from_map(
+            X, y, train_idx, model.feature_columns(), model.LABEL, model.scaler,
+            categorical=list(getattr(model, "encoders", None) or {}),
+            resolution=model.grid_resolution(), dedupe=model.dedupe, target_size=model.coreset_size,
+            memory_cap_mb=_cap(task), block=_block(inputs[f"clean_{task}"].path("dataset.csv"), task),
+            random_state=RANDOM_STATE
+        )
+        p["rows"] = len(X_train)
+    np.save(os.path.join(out, "X_train.npy"), X_train)
+    np.save(os.path.join(out, "y_train.npy"), y_train)
+    np.save(os.path.join(out, "weights.npy"), weights)
+    return report
+
+
+def _holdout(inputs, task):
+    """Raw holdout rows (X_test, y_test)."""
+    enc = inputs[f"encode_{task}"]
+    te = np.load(inputs[f"split_{task}"].path("test_idx.npy"))
+    # Memory-mapped: only the holdout rows are read (X.npy is float32 out-of-core)
+    X, y = np.load(enc.path("X.npy"), mmap_mode="r"), np.load(enc.path("y.npy"), mmap_mode="r")
+    return np.asarray(X[te], dtype=np.float64), np.asarray(y[te])
+
+
+def _arrays(inputs, task):
+    """(reduced training rows, raw holdout rows) as X_train, X_test, y_train, y_test."""
+    red = inputs[f"reduce_{task}"]
+    X_test, y_test = _holdout(inputs, task)
+    return np.load(red.path("X_train.npy")), X_test, np.load(red.path("y_train.npy")), y_test
+
+
+def _fit(task):
+    def fn(inputs, out):
+        X_train, X_test, y_train, y_test = _arrays(inputs, task)
+        weights = np.load(inputs[f"reduce_{task}"].path("weights.npy"))
+        clf = TASKS[task]["model"](probability=SVC_PROBABILITY).build_model()
+        with profiling.phase("fit", task, rows=len(X_train), features=X_train.shape[1]) as p:
+            clf.fit(X_train, y_train, sample_weight=weights)
+        fit_seconds = p["seconds"]
+        with profiling.phase("evaluate", task, rows=len(X_test)):
+            acc = float(accuracy_score(y_test, clf.predict(X_test)))
+        joblib.dump(clf, os.path.join(out, "model.pkl"))
+        print(f"✔ {task} accuracy: {acc:.4f} (fit {fit_seconds:.2f}s)")
+        return {"acc": acc, "n_support": int(clf.support_vectors_.shape[0]),
+                "fit_seconds": fit_seconds, "probability": SVC_PROBABILITY}
+    return fn
+
+
+def _calibrate(task):
+    def fn(inputs, out):
+        if inputs[f"fit_{task}"].result["probability"]:
+            return {"calibrated": False}   # built-in Platt scaling already fitted
+        _, X_test, _, y_test = _arrays(inputs, task)
+        clf = joblib.load(inputs[f"fit_{task}"].path("model.pkl"))
+        with profiling.phase("calibrate", task, rows=len(X_test)):
+            calibrator, report = calibrate(clf, X_test, y_test)
+        if calibrator is not None:
+            joblib.dump(calibrator.to_dict(), os.path.join(out, "calibration.pkl"))
+        return report
+    return fn
+
+
+def _publish(task):
+    def fn(inputs, out):
+        spec = TASKS[task]
+        fit = inputs[f"fit_{task}"]
+        model = spec["model"](probability=fit.result["probability"], rolling=ROLLING_FEATURES[task])
+        model.model = joblib.load(fit.path("model.pkl"))
+        model.fit_seconds = fit.result["fit_seconds"]
+        _with_preprocess(model, inputs, task)
+        model.split = _arrays(inputs, task)
+        model.sample_weight = np.load(inputs[f"reduce_{task}"].path("weights.npy"))
+        model.coreset_report = inputs[f"reduce_{task}"].result
+
+        cal = inputs[f"calibrate_{task}"]
+        calibration_report = None
+        if cal.result.get("calibrated"):
+            model.calibrator = Calibrator.from_dict(joblib.load(cal.path("calibration.pkl")))
+            calibration_report = cal.result
+
+        clean = inputs[f"clean_{task}"]
+        if _cap(task):
+            # Drift reference from the row sample; fingerprint of every row
+            df, fingerprint = pd.read_pickle(clean.path("sample.pkl")), clean.result["fingerprint"]
+        else:
+            df, fingerprint = pd.read_pickle(clean.path("dataset.pkl")), None
+        version_dir = spec["publish"](model, fit.result["acc"], df, calibration_report, fingerprint)
+        return {"acc": fit.result["acc"], "version_dir": os.path.relpath(version_dir, PROJECT_ROOT)}
+    return fn
+
+
+def _published(result: Dict) -> bool:
+    # Old versions get cleaned up; re-publish if the cached one is gone
+    return os.path.isdir(_project_path(result["version_dir"]))
+
+
+def _shadow_gate(task: str, version_dir: str, reports: Dict) -> bool:
+    """Replay field readings through current/ vs the candidate (mlops/shadow.py)."""
+    with profiling.phase("shadow", task):
+        passed, reports[task] = shadow.gate(task, version_dir)
+    shadow.print_report(reports[task])
+    if not passed:
+        print(f"⛔ {task} candidate held back by shadow replay: {reports[task]['gate']['reason']}")
+    return passed
+
+
+def promote_models(irr_acc, irr_version_dir, plant_acc, plant_version_dir, keep_last: int = 30,
+                   shadow_gate: bool = SHADOW_GATE, irrigation_holdout=None):
+    """Update current/ for models that beat last_metrics.json, clean up, write the report.
+
+    With `shadow_gate`, a candidate that beats the holdout accuracy must also
+    hold up on the recorded field readings before it replaces current/.
+    `irrigation_holdout` (X_test, y_test) lets a promoted irrigation version
+    get its decision lookup table, checked on those rows.
+    """
+    last = load_last_metrics()
+    prev_irr = last.get("irrigation_acc", 0.0)
+    prev_plant = last.get("plant_acc", 0.0)
+
+    print(f"📌 Previous Irrigation Acc: {prev_irr}")
+    print(f"📌 Previous Plant Acc: {prev_plant}")
+    print(f"\n🌱 New Irrigation Acc: {irr_acc}")
+    print(f"🌿 New Plant Acc: {plant_acc}")
+    print(f"📦 Irrigation version saved: {irr_version_dir}")
+    print(f"📦 Plant version saved: {plant_version_dir}")
+
+    # Update current/ only if improved (on the holdout and, if gated, in the field)
+    shadow_reports = {}
+    irr_updated = irr_acc > prev_irr
+    if irr_updated and shadow_gate:
+        irr_updated = _shadow_gate("irrigation", irr_version_dir, shadow_reports)
+    if irr_updated:
+        if irrigation_holdout is not None:
+            with profiling.phase("lut", "irrigation"):
+                compile_for_version(irr_version_dir, *irrigation_holdout)
+        set_current_from_version_dir(IRRIGATION_MODEL_DIR, irr_version_dir)
+        print("✅ Irrigation current model updated.")
+    else:
+        print("⚠ Irrigation not improved → current unchanged.")
+
+    plant_updated = plant_acc > prev_plant
+    if plant_updated and shadow_gate:
+        plant_updated = _shadow_gate("plant_health", plant_version_dir, shadow_reports)
+    if plant_updated:
+        set_current_from_version_dir(PLANT_MODEL_DIR, plant_version_dir)
+        print("✅ Plant current model updated.")
+    else:
+        print("⚠ Plant not improved → current unchanged.")
+
+    # Save improved metrics
+    if irr_updated or plant_updated:
+        save_metrics(
+            irr_acc if irr_updated else prev_irr,
+            plant_acc if plant_updated else prev_plant
+        )
+        print("✔ Metrics updated.")
+    else:
+        print("ℹ No accuracy improvement → metrics unchanged.")
+
+    # Auto-delete old versions
+    cleanup_old_versions(IRRIGATION_MODEL_DIR, keep_last=keep_last)
+    cleanup_old_versions(PLANT_MODEL_DIR, keep_last=keep_last)
+
+    # Run telemetry → mlops/metrics_history.jsonl (append-only)
+    profiling.finish_run(irrigation_acc=float(irr_acc), plant_acc=float(plant_acc),
+                         irrigation_updated=irr_updated, plant_updated=plant_updated)
+
+    write_nightly_report(
+        prev_irr, irr_acc, irr_version_dir, irr_updated,
+        prev_plant, plant_acc, plant_version_dir, plant_updated,
+        fit_times={
+            "irrigation": fit_time_summary(IRRIGATION_MODEL_DIR, irr_version_dir),
+            "plant_health": fit_time_summary(PLANT_MODEL_DIR, plant_version_dir),
+        },
+        history=profiling.load_history(last=profiling.TREND_RUNS),
+        shadow=shadow_reports,
+    )
+    return {"irrigation_updated": irr_updated, "plant_updated": plant_updated}
+
+
+def _promote(inputs, out):
+    irr = inputs["publish_irrigation"].result
+    plant = inputs["publish_plant_health"].result
+    return promote_models(irr["acc"], _project_path(irr["version_dir"]),
+                          plant["acc"], _project_path(plant["version_dir"]),
+                          irrigation_holdout=_holdout(inputs, "irrigation"))
+
+
+def build_stages() -> List[Stage]:
+    stages = []
+    for task, spec in TASKS.items():
+        stages += [
+            Stage(f"clean_{task}", _clean(task),
+                  files=[spec["dataset"], spec["live_dataset"], "src/data_quality.py", "src/rolling_features.py",
+                         "src/out_of_core.py"] + spec["model_src"],
+                  params={"rolling": ROLLING_FEATURES[task], "memory_cap_mb": _cap(task)}),
+            Stage(f"encode_{task}", _encode(task), deps=[f"clean_{task}"],
+                  files=["src/out_of_core.py"] + spec["model_src"],
+                  params={"memory_cap_mb": _cap(task)}),
+            Stage(f"split_{task}", _split(task), deps=[f"encode_{task}"],
+                  params={"test_size": TEST_SIZE, "random_state": RANDOM_STATE,
+                          "memory_cap_mb": _cap(task)}),
+            Stage(f"reduce_{task}", _reduce(task),
+                  deps=[f"clean_{task}", f"encode_{task}", f"split_{task}"],
+                  files=["src/coreset.py", "src/out_of_core.py"] + spec["model_src"],
+                  params={"dedupe": TRAIN_DEDUPE, "coreset_size": CORESET_SIZE[task],
+                          "memory_cap_mb": _cap(task)}),
+            Stage(f"fit_{task}", _fit(task),
+                  deps=[f"encode_{task}", f"split_{task}", f"reduce_{task}"],
+                  files=spec["model_src"], params={"probability": SVC_PROBABILITY}),
+            Stage(f"calibrate_{task}", _calibrate(task),
+                  deps=[f"encode_{task}", f"split_{task}", f"reduce_{task}", f"fit_{task}"],
+                  files=["mlops/calibrate.py", "src/calibration.py"]),
+            Stage(f"publish_{task}", _publish(task),
+                  deps=[f"clean_{task}", f"encode_{task}", f"split_{task}", f"reduce_{task}",
+                        f"fit_{task}", f"calibrate_{task}"],
+                  files=spec["publish_src"], valid=_published),
+        ]
+    # Promotion reads/writes shared state (metrics, current/), so it always runs
+    stages.append(Stage("promote", _promote,
+                        deps=["publish_irrigation", "publish_plant_health",
+                              "encode_irrigation", "split_irrigation"],
+                        cache=False))
+    return stages
+
+
+def run_pipeline(targets: Optional[Sequence[str]] = None, force: Sequence[str] = (),
+                 workers: int = 2, cache_dir: str = CACHE_DIR) -> Dict[str, StageOutput]:
+    profiling.start_run()
+    return Pipeline(build_stages(), cache_dir=cache_dir, workers=workers).run(targets, force)
+
+
+# =========================================
+# CLI
+# =========================================
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Run the cached retraining pipeline.")
+    parser.add_argument("--stage", action="append", help="stage to run (with its deps); repeatable")
+    parser.add_argument("--force", action="store_true", help="ignore the cache for the selected stage(s)")
+    parser.add_argument("--workers", type=int, default=2, help="stages run concurrently")
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--list", action="store_true", help="show stages and cache status")
+    args = parser.parse_args(argv)
+
+    pipeline = Pipeline(build_stages(), cache_dir=args.cache_dir, workers=args.workers)
+
+    if args.list:
+        for row in pipeline.status():
+            state = {True: "cached", False: "stale", None: "-"}[row["cached"]]
+            deps = ", ".join(row["deps"]) or "-"
+            print(f"{row['stage']:<22} {state:<7} ← {deps}")
+        return 0
+
+    targets = args.stage or list(pipeline.stages)
+    force = (args.stage or list(pipeline.stages)) if args.force else ()
+    try:
+        done = pipeline.run(targets, force)
+    except RuntimeError as exc:
+        print(f"❌ {exc}")
+        return 1
+
+    reused = sum(out.cached for out in done.values())
+    print(f"✔ Pipeline finished: {len(done)} stages ({reused} from cache)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,239 @@
+"""
+Training-run telemetry: where the nightly retrain spends its time and memory.
+
+A run collects
+- phases: wall time of load / preprocess / fit / evaluate / dump / copy /
+  cleanup (… per task), with the process RSS after the phase, its peak-RSS
+  high-water mark and the rows / features it processed
+- stages: wall time of each pipeline stage and whether it came from cache
+- artifacts: file sizes of every published version folder
+
+and is appended as one JSON line to `mlops/metrics_history.jsonl`, next to
+`last_metrics.json`. The nightly report renders the last runs from it, so
+training cost growth shows up before it hits the CI time limit.
+
+RSS is per process: with both tasks training concurrently a phase's peak
+may include the other task's allocations.
+
+Usage:
+    python3 -m mlops.profiling            # trend table of the last runs
+    python3 -m mlops.profiling --last 30
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from mlops.config import PROJECT_ROOT
+
+HISTORY_FILE = os.path.join(PROJECT_ROOT, "mlops", "metrics_history.jsonl")
+TREND_RUNS = 10
+
+# Wall-time budget of the nightly CI job (s); the report warns as runs approach it
+TRAIN_TIME_BUDGET = 30 * 60
+BUDGET_WARNING = 0.7
+
+
+# =========================================
+# MEMORY
+# =========================================
+def rss_mb() -> Optional[float]:
+    """Current resident set size of this process (Linux), MB."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            pages = int(f.read().split()[1])
+        return round(pages * os.sysconf("SC_PAGE_SIZE") / 2 ** 20, 1)
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak RSS high-water mark of this process so far, MB."""
+    try:
+        import resource
+    except ImportError:   # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KB on Linux, bytes on macOS
+    return round(peak / (2 ** 20 if sys.platform == "darwin" else 2 ** 10), 1)
+
+
+# =========================================
+# RUN PROFILE
+# =========================================
+class RunProfile:
+    """Phases, stages and artifact sizes of one training run (thread-safe)."""
+
+    def __init__(self):
+        self.started_at = datetime.now().isoformat(timespec="seconds")
+        self._start = time.perf_counter()
+        self.phases: List[Dict] = []
+        self.stages: List[Dict] = []
+        self.artifacts: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name: str, task: Optional[str] = None, **fields):
+        """Time a block; the yielded dict can be filled with rows/features."""
+        record = {"phase": name, "task": task, **fields}
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["seconds"] = round(time.perf_counter() - start, 4)
+            record["rss_mb"] = rss_mb()
+            record["peak_rss_mb"] = peak_rss_mb()
+            with self._lock:
+                self.phases.append(record)
+
+    def add_phases(self, task: Optional[str], timings: Dict[str, float], **fields) -> None:
+        """Phases timed elsewhere (e.g. the model classes' `timings`)."""
+        with self._lock:
+            for name, seconds in timings.items():
+                self.phases.append({"phase": name, "task": task, "seconds": round(seconds, 4),
+                                    "rss_mb": rss_mb(), "peak_rss_mb": peak_rss_mb(), **fields})
+
+    def stage(self, name: str, seconds: float, cached: bool) -> None:
+        with self._lock:
+            self.stages.append({"stage": name, "seconds": round(seconds, 4), "cached": cached})
+
+    def record_artifacts(self, task: str, directory: str) -> None:
+        sizes = {name: os.path.getsize(os.path.join(directory, name))
+                 for name in sorted(os.listdir(directory))
+                 if os.path.isfile(os.path.join(directory, name))}
+        with self._lock:
+            self.artifacts[task] = sizes
+
+    # -----------------------------------------
+    def totals(self) -> Dict[str, float]:
+        """Seconds per "<task>.<phase>" (summed over repeated phases)."""
+        out: Dict[str, float] = {}
+        for p in self.phases:
+            key = f"{p['task']}.{p['phase']}" if p["task"] else p["phase"]
+            out[key] = round(out.get(key, 0.0) + p["seconds"], 4)
+        return out
+
+    def to_record(self, **extra) -> Dict:
+        return {
+            "timestamp": self.started_at,
+            "total_seconds": round(time.perf_counter() - self._start, 3),
+            "peak_rss_mb": peak_rss_mb(),
+            "totals": self.totals(),
+            "phases": self.phases,
+            "stages": self.stages,
+            "artifacts": self.artifacts,
+            **extra,
+        }
+
+
+_current = RunProfile()
+
+
+def start_run() -> RunProfile:
+    """Begin a new run; module-level helpers record into it."""
+    global _current
+    _current = RunProfile()
+    return _current
+
+
+def current() -> RunProfile:
+    return _current
+
+
+def phase(name: str, task: Optional[str] = None, **fields):
+    return _current.phase(name, task, **fields)
+
+
+# =========================================
+# HISTORY
+# =========================================
+def append_history(record: Dict, path: str = HISTORY_FILE) -> None:
+    """Append one run as a JSON line (never rewrites earlier runs)."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a") as f:
+        f.write(json.dumps(record, sort_keys=True, default=str) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def load_history(path: str = HISTORY_FILE, last: Optional[int] = None) -> List[Dict]:
+    if not os.path.exists(path):
+        return []
+    runs = []
+    with open(path, "r") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                runs.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue   # torn last line from an interrupted run
+    return runs[-last:] if last else runs
+
+
+def finish_run(path: str = HISTORY_FILE, **extra) -> Dict:
+    """Close the current run and append it to the history."""
+    record = _current.to_record(**extra)
+    append_history(record, path)
+    print(f"⏱ Run telemetry: {record['total_seconds']:.1f}s, peak RSS {_fmt(record['peak_rss_mb'])} MB "
+          f"→ {path}")
+    return record
+
+
+# =========================================
+# TRENDS
+# =========================================
+def _artifact_mb(run: Dict) -> float:
+    return sum(sum(files.values()) for files in run.get("artifacts", {}).values()) / 2 ** 20
+
+
+def _fmt(value, spec: str = ".1f") -> str:
+    return "–" if value is None else format(value, spec)
+
+
+def trend_lines(history: List[Dict], budget: float = TRAIN_TIME_BUDGET) -> List[str]:
+    """Markdown table of recent runs + growth / budget notes."""
+    if not history:
+        return ["No training runs recorded yet.\n"]
+
+    lines = [
+        "| Run | Total (s) | Peak RSS (MB) | Irrigation fit (s) | Plant fit (s) "
+        "| Irrigation rows | Artifacts (MB) |\n",
+        "|---|---:|---:|---:|---:|---:|---:|\n",
+    ]
+    for run in history:
+        totals = run.get("totals", {})
+        rows = next((p.get("rows") for p in run.get("phases", [])
+                     if p.get("task") == "irrigation" and p.get("phase") == "fit"), None)
+        lines.append(
+            f"| {run['timestamp']} | {_fmt(run.get('total_seconds'))} | {_fmt(run.get('peak_rss_mb'))} "
+            f"| {_fmt(totals.get('irrigation.fit'), '.2f')} | {_fmt(totals.get('plant_health.fit'), '.2f')} "
+            f"| {_fmt(rows, 'd')} | {_artifact_mb(run):.2f} |\n"
+        )
+
+    first, last = history[0], history[-1]
+    if len(history) > 1 and first.get("total_seconds"):
+        growth = last["total_seconds"] / first["total_seconds"] - 1.0
+        lines.append(f"\n- Total time over the last {len(history)} runs: {growth:+.0%}\n")
+    share = last.get("total_seconds", 0.0) / budget
+    note = " ⚠ approaching the CI limit" if share >= BUDGET_WARNING else ""
+    lines.append(f"- Latest run used {share:.0%} of the {budget / 60:.0f}-minute budget{note}\n")
+
+    slowest = sorted(last.get("totals", {}).items(), key=lambda kv: kv[1], reverse=True)[:3]
+    if slowest:
+        lines.append("- Slowest phases: " + ", ".join(f"{k} {v:.1f}s" for k, v in slowest) + "\n")
+    return lines
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Training cost trend from metrics_history.jsonl.")
+    parser.add_argument("--last", type=int, default=TREND_RUNS, help="runs to show")
+    parser.add_argument("--history", default=HISTORY_FILE)
+    args = parser.parse_args()
+    print("".join(trend_lines(load_history(args.history, last=args.last))), end="")
@@ -0,0 +1,133 @@
+"""
+Publish promoted models as a content-addressed chunk store for edge sync.
+
+For each task, the files of `models/<task>/current/` are split into
+fixed-size chunks; each chunk is stored once under `blobs/` (zlib-compressed,
+named by the sha256 of its raw bytes) and a manifest lists the chunk hashes
+per file. Unchanged files — scalers, encoders, reference stats — and chunks
+shared with earlier releases are never uploaded again, and the Pi
+(src/model_sync.py) downloads only the chunks it is missing.
+
+The store is a plain directory. CI publishes it to `model_store/` after each
+retrain and commits it, so the Pi gets it with its hourly `git pull` (with
+`models/` left out of its sparse checkout); it can also be served by any
+static HTTP server. Chunks no manifest refers to any more are pruned, so the
+store holds one release per task.
+
+Usage:
+    python3 -m mlops.publish_models                    # → model_store/
+    python3 -m mlops.publish_models --store /srv/model_store
+"""
+import os
+import json
+import zlib
+import hashlib
+import argparse
+from datetime import datetime
+from typing import Dict
+
+from mlops.config import PROJECT_ROOT, MODELS_PATH
+from mlops.manifest import Manifest
+from src.model_sync import (
+    CHUNK_SIZE, FORMAT_VERSION, MANIFEST_NAME, RELEASE_MANIFEST, SYNC_TASKS,
+    blob_path, iter_chunks, release_version,
+)
+
+DEFAULT_STORE = os.path.join(PROJECT_ROOT, "model_store")
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp-{os.getpid()}"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def publish(task: str, store: str, models_root: str = MODELS_PATH,
+            chunk_size: int = CHUNK_SIZE) -> Dict:
+    """Chunk models/<task>/current into the store and write its manifest."""
+    model_dir = os.path.join(models_root, task)
+    current = os.path.join(model_dir, "current")
+    if not os.path.isdir(current):
+        raise FileNotFoundError(f"No promoted model at {current}")
+
+    files, new_chunks, new_bytes = [], 0, 0
+    for name in sorted(os.listdir(current)):
+        path = os.path.join(current, name)
+        if not os.path.isfile(path) or name == RELEASE_MANIFEST:
+            continue
+
+        chunks, h = [], hashlib.sha256()
+        for digest, block in iter_chunks(path, chunk_size):
+            chunks.append(digest)
+            h.update(block)
+            blob = os.path.join(store, blob_path(digest))
+            if not os.path.exists(blob):
+                _write_atomic(blob, zlib.compress(block, 6))
+                new_chunks += 1
+                new_bytes += os.path.getsize(blob)
+        files.append({"name": name, "size": os.path.getsize(path),
+                      "sha256": h.hexdigest(), "chunks": chunks})
+
+    current_versions = Manifest(model_dir).current_versions()
+    manifest = {
+        "format": FORMAT_VERSION,
+        "task": task,
+        "version": release_version(files),
+        "source_version": current_versions[0] if current_versions else None,
+        "published": datetime.now().isoformat(timespec="seconds"),
+        "chunk_size": chunk_size,
+        "files": files,
+    }
+    # Manifest last, so clients never see a release whose blobs are missing
+    _write_atomic(os.path.join(store, task, MANIFEST_NAME),
+                  json.dumps(manifest, indent=2).encode())
+
+    total = sum(f["size"] for f in files)
+    print(f"📤 {task}: release {manifest['version']} — {len(files)} files, "
+          f"{sum(len(f['chunks']) for f in files)} chunks, "
+          f"{new_chunks} new ({new_bytes / 1024:.0f} KB stored of {total / 1024:.0f} KB)")
+    return {"task": task, "version": manifest["version"], "new_chunks": new_chunks,
+            "new_bytes": new_bytes, "total_bytes": total}
+
+
+def prune(store: str) -> int:
+    """Delete blobs that no task manifest in the store refers to."""
+    keep = set()
+    for task in SYNC_TASKS:
+        path = os.path.join(store, task, MANIFEST_NAME)
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                for entry in json.load(f)["files"]:
+                    keep.update(entry["chunks"])
+
+    removed = 0
+    blobs = os.path.join(store, "blobs")
+    for prefix in os.listdir(blobs) if os.path.isdir(blobs) else []:
+        folder = os.path.join(blobs, prefix)
+        for name in os.listdir(folder):
+            if name not in keep:
+                os.remove(os.path.join(folder, name))
+                removed += 1
+        if not os.listdir(folder):
+            os.rmdir(folder)
+    if removed:
+        print(f"🧹 Pruned {removed} unreferenced chunks from {store}")
+    return removed
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Publish current models to a chunk store.")
+    parser.add_argument("--store", default=DEFAULT_STORE)
+    parser.add_argument("--task", action="append", choices=SYNC_TASKS, help="default: all tasks")
+    parser.add_argument("--models-root", default=MODELS_PATH)
+    args = parser.parse_args(argv)
+
+    for task in args.task or SYNC_TASKS:
+        publish(task, args.store, args.models_root)
+    prune(args.store)
+
+
+if __name__ == "__main__":
+    main()
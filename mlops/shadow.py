@@ -0,0 +1,311 @@
+"""
+Shadow replay: how model versions behave on recorded field readings.
+
+Promotion only sees the single train_test_split holdout. This replays logged
+readings (the merged live store `data/live/<task>.csv`, else the Pi's
+`data/new_<task>.csv`) through several versions at once:
+
+- each version is scored in its own worker process: the log is streamed in
+  chunks and every chunk goes through the model's batched `predict_batch()`
+- agreement: share of readings where two versions make the same decision
+  (every pair, and each version against the deployed `current/` model)
+- flips: how often a version's decision changes between consecutive
+  readings (a chattering model switches irrigation on and off)
+- field accuracy, when the log carries a label column
+- throughput: readings per second of batched prediction (load time excluded)
+
+`gate()` runs current vs a freshly trained candidate; promote_models() in
+mlops/pipeline.py uses it to hold back a candidate that loses field accuracy
+(or, on unlabelled logs, disagrees too often with what is deployed).
+
+Usage:
+    python3 -m mlops.shadow --task irrigation                 # current + last 3
+    python3 -m mlops.shadow --task plant_health --last 5 --workers 4
+    python3 -m mlops.shadow --task irrigation --versions 2026-03-01_04-13-36_acc_0.9559
+"""
+import os
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from mlops.config import (DATA_PATH, PROJECT_ROOT, IRRIGATION_MODEL_DIR, PLANT_MODEL_DIR,
+                          SHADOW_MIN_AGREEMENT, SHADOW_MAX_ACC_DROP)
+from mlops.manifest import Manifest
+from src.Irrigation_Model import IrrigationModel
+from src.plant_health import PlantHealthModel
+from src.rolling_features import RollingFeatures
+
+REPORT_DIR = os.path.join(PROJECT_ROOT, "reports")
+CHUNK_ROWS = 50_000
+CURRENT = "current"
+
+# task -> model class, model folder, label column, recorded logs (first existing wins)
+TASKS = {
+    "irrigation": {
+        "model": IrrigationModel,
+        "model_dir": IRRIGATION_MODEL_DIR,
+        "label": "result",
+        "sources": [os.path.join(DATA_PATH, "live", "irrigation.csv"),
+                    os.path.join(DATA_PATH, "new_irrigation.csv")],
+    },
+    "plant_health": {
+        "model": PlantHealthModel,
+        "model_dir": PLANT_MODEL_DIR,
+        "label": "Plant_Health_Status",
+        "sources": [os.path.join(DATA_PATH, "live", "plant_health.csv"),
+                    os.path.join(DATA_PATH, "new_plant_health.csv")],
+    },
+}
+
+
+# =========================================
+# INPUTS
+# =========================================
+def replay_source(task: str) -> Optional[str]:
+    """Recorded readings for a task: the merged live store, else the Pi's CSV."""
+    for path in TASKS[task]["sources"]:
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            return path
+    return None
+
+
+def version_path(task: str, version: str) -> str:
+    model_dir = TASKS[task]["model_dir"]
+    if version == CURRENT:
+        return os.path.join(model_dir, CURRENT)
+    return os.path.join(model_dir, "versions", version)
+
+
+def select_versions(task: str, last: int = 3, include: Sequence[str] = ()) -> List[str]:
+    """`current` (if deployed) + the newest `last` live versions + `include`."""
+    chosen = [CURRENT] if os.path.isdir(version_path(task, CURRENT)) else []
+    recent = [r["version"] for r in Manifest(TASKS[task]["model_dir"]).versions()]
+    for name in (recent[-last:] if last else []) + list(include):
+        if name not in chosen:
+            chosen.append(name)
+    return chosen
+
+
+# =========================================
+# WORKER
+# =========================================
+def _score_version(task: str, version: str, path: str, chunksize: int) -> Dict:
+    """Stream one log through one version (runs in a worker process)."""
+    cls = TASKS[task]["model"]
+    start = time.perf_counter()
+    try:
+        model = cls.load_dir(version_path(task, version))
+    except Exception as e:   # missing files, pickles from an incompatible sklearn …
+        return {"version": version, "error": f"load failed: {e}"}
+    load_seconds = time.perf_counter() - start
+
+    tracker = RollingFeatures(cls.ROLLING_COLUMNS) if model.rolling else None
+    preds, seconds = [], 0.0
+    try:
+        for chunk in pd.read_csv(path, chunksize=chunksize):
+            start = time.perf_counter()
+            preds.append(np.asarray(model.predict_batch(chunk, tracker)))
+            seconds += time.perf_counter() - start
+    except Exception as e:   # feature mismatch, unknown columns …
+        return {"version": version, "error": f"predict failed: {e}"}
+
+    predictions = np.concatenate(preds) if preds else np.empty(0)
+    return {"version": version, "predictions": predictions, "load_seconds": load_seconds,
+            "predict_seconds": seconds}
+
+
+def _labels(path: str, column: str, chunksize: int) -> Optional[np.ndarray]:
+    chunks = [c[column].to_numpy() for c in pd.read_csv(path, chunksize=chunksize,
+                                                        usecols=lambda c: c == column)
+              if column in c.columns]
+    return np.concatenate(chunks) if chunks else None
+
+
+# =========================================
+# METRICS
+# =========================================
+def _valid(pred: np.ndarray) -> np.ndarray:
+    """Rows the version could score (the irrigation model marks unknown categories -1)."""
+    if pred.dtype.kind in "iu":
+        return pred >= 0
+    return np.ones(len(pred), dtype=bool)
+
+
+def _flips(pred: np.ndarray) -> int:
+    scored = pred[_valid(pred)]
+    return int(np.count_nonzero(scored[1:] != scored[:-1]))
+
+
+def _agreement(a: np.ndarray, b: np.ndarray) -> Optional[float]:
+    both = _valid(a) & _valid(b)
+    if not both.any():
+        return None
+    return float(np.mean(a[both] == b[both]))
+
+
+def replay(task: str, versions: Optional[Sequence[str]] = None, path: Optional[str] = None,
+           workers: Optional[int] = None, chunksize: int = CHUNK_ROWS, last: int = 3) -> Dict:
+    """Score recorded readings with several versions in parallel; returns the report dict."""
+    path = path or replay_source(task)
+    versions = list(versions) if versions else select_versions(task, last)
+    report = {"task": task, "source": path, "versions": []}
+    if path is None or not versions:
+        report["skipped"] = "no recorded readings" if path is None else "no versions"
+        return report
+
+    workers = max(1, min(workers or os.cpu_count() or 1, len(versions)))
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_score_version, task, v, path, chunksize) for v in versions]
+        results = [f.result() for f in futures]
+    report["wall_seconds"] = round(time.perf_counter() - start, 3)
+    report["workers"] = workers
+
+    scored = [r for r in results if "error" not in r]
+    labels = _labels(path, TASKS[task]["label"], chunksize)
+    reference = next((r for r in scored if r["version"] == CURRENT), scored[0] if scored else None)
+    report["reference"] = reference["version"] if reference else None
+
+    for r in results:
+        if "error" in r:
+            report["versions"].append({"version": r["version"], "error": r["error"]})
+            continue
+        pred = r["predictions"]
+        row = {
+            "version": r["version"],
+            "rows": int(len(pred)),
+            "unscored": int(np.count_nonzero(~_valid(pred))),
+            "flips": _flips(pred),
+            "agreement_with_reference": _agreement(pred, reference["predictions"]),
+            "disagreements": int(np.count_nonzero(
+                (pred != reference["predictions"]) & _valid(pred) & _valid(reference["predictions"]))),
+            "field_acc": None,
+            "load_seconds": round(r["load_seconds"], 4),
+            "rows_per_second": round(len(pred) / r["predict_seconds"], 1) if r["predict_seconds"] else None,
+        }
+        if labels is not None:
+            known = _valid(pred) & pd.notna(labels)
+            if known.any():
+                row["field_acc"] = float(np.mean(pred[known].astype(str) == labels[known].astype(str)))
+        report["versions"].append(row)
+
+    report["pairwise_agreement"] = {
+        a["version"]: {b["version"]: _agreement(a["predictions"], b["predictions"]) for b in scored}
+        for a in scored
+    }
+    return report
+
+
+# =========================================
+# GATE
+# =========================================
+def gate(task: str, candidate_dir: str, min_agreement: float = SHADOW_MIN_AGREEMENT,
+         max_acc_drop: float = SHADOW_MAX_ACC_DROP, workers: int = 2) -> Tuple[bool, Dict]:
+    """Replay current vs candidate; False if the candidate should not be promoted.
+
+    Labelled logs: field accuracy may not drop more than `max_acc_drop` below
+    current. Unlabelled logs: agreement with current must be ≥ `min_agreement`.
+    A candidate that cannot be loaded or replayed fails. Passes without
+    comparing only when there is nothing to compare against (no log, no
+    current/, or a current/ that cannot be replayed itself).
+    """
+    candidate = os.path.basename(os.path.normpath(candidate_dir))
+    if not os.path.isdir(version_path(task, CURRENT)):
+        return True, {"task": task, "skipped": "no current model", "versions": []}
+
+    report = replay(task, [CURRENT, candidate], workers=workers)
+    rows = {r["version"]: r for r in report["versions"]}
+    if report.get("skipped"):
+        report["gate"] = {"passed": True, "reason": report["skipped"]}
+        return True, report
+    if "error" in rows[candidate]:
+        report["gate"] = {"candidate": candidate, "passed": False,
+                          "reason": f"candidate {rows[candidate]['error']}"}
+        return False, report
+    if "error" in rows[CURRENT]:
+        report["gate"] = {"candidate": candidate, "passed": True,
+                          "reason": f"current {rows[CURRENT]['error']}"}
+        return True, report
+
+    cur, cand = rows[CURRENT], rows[candidate]
+    if cand["field_acc"] is not None and cur["field_acc"] is not None:
+        passed = cand["field_acc"] >= cur["field_acc"] - max_acc_drop
+        reason = f"field acc {cand['field_acc']:.4f} vs current {cur['field_acc']:.4f}"
+    else:
+        agreement = cand["agreement_with_reference"]
+        passed = agreement is None or agreement >= min_agreement
+        reason = f"agreement with current {agreement:.2%}" if agreement is not None else "no overlap"
+    report["gate"] = {"candidate": candidate, "passed": bool(passed), "reason": reason}
+    return bool(passed), report
+
+
+# =========================================
+# OUTPUT
+# =========================================
+def _fmt(value, spec: str) -> str:
+    return "–" if value is None else format(value, spec)
+
+
+def report_lines(report: Dict) -> List[str]:
+    """Markdown lines for the nightly report."""
+    if report.get("skipped"):
+        return [f"- Shadow replay skipped: {report['skipped']}\n"]
+    lines = [f"- Replayed {report['versions'][0].get('rows', 0) if report['versions'] else 0} "
+             f"readings from `{os.path.relpath(report['source'], PROJECT_ROOT)}`\n"]
+    for r in report["versions"]:
+        if "error" in r:
+            lines.append(f"- {r['version']}: {r['error']}\n")
+            continue
+        lines.append(f"- {r['version']}: agreement {_fmt(r['agreement_with_reference'], '.2%')}, "
+                     f"{r['flips']} flips, field acc {_fmt(r['field_acc'], '.4f')}\n")
+    if "gate" in report:
+        g = report["gate"]
+        lines.append(f"- Gate: {'✅ passed' if g['passed'] else '⛔ held back'} ({g['reason']})\n")
+    return lines
+
+
+def print_report(report: Dict) -> None:
+    if report.get("skipped"):
+        print(f"⚠ Shadow replay skipped for {report['task']}: {report['skipped']}")
+        return
+    print(f"👥 Shadow replay — {report['task']} on {report['source']} "
+          f"({len(report['versions'])} versions, {report['workers']} workers, {report['wall_seconds']:.1f}s)")
+    print(f"{'version':<34}{'rows':>8}{'agree':>9}{'diff':>7}{'flips':>7}{'field acc':>11}{'rows/s':>11}")
+    for r in report["versions"]:
+        if "error" in r:
+            print(f"{r['version']:<34}  {r['error']}")
+            continue
+        print(f"{r['version']:<34}{r['rows']:>8}{_fmt(r['agreement_with_reference'], '.2%'):>9}"
+              f"{r['disagreements']:>7}{r['flips']:>7}{_fmt(r['field_acc'], '.4f'):>11}"
+              f"{_fmt(r['rows_per_second'], '.0f'):>11}")
+
+
+def save_report(report: Dict, report_dir: str = REPORT_DIR) -> str:
+    os.makedirs(report_dir, exist_ok=True)
+    path = os.path.join(report_dir, f"shadow_{report['task']}.json")
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay recorded field readings through model versions.")
+    parser.add_argument("--task", choices=sorted(TASKS), default="irrigation")
+    parser.add_argument("--versions", nargs="*", help="version folder names (default: current + --last)")
+    parser.add_argument("--last", type=int, default=3, help="newest versions to include")
+    parser.add_argument("--source", help="CSV of recorded readings (default: live store / new_*.csv)")
+    parser.add_argument("--workers", type=int, help="worker processes (default: one per version)")
+    parser.add_argument("--chunksize", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--no-save", action="store_true", help="print only, do not write reports/")
+    args = parser.parse_args()
+
+    versions = select_versions(args.task, 0, args.versions) if args.versions else None
+    report = replay(args.task, versions, args.source, args.workers, args.chunksize, args.last)
+    print_report(report)
+    if not args.no_save and not report.get("skipped"):
+        print(f"📝 Report written → {save_report(report)}")
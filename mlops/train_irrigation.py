@@ -1,7 +1,15 @@
 import os
 
-from mlops.config import IRRIGATION_MODEL_DIR
-from mlops.utils import create_version_dir, version_models
+from mlops import profiling
+from mlops.config import (IRRIGATION_MODEL_DIR, SVC_PROBABILITY, TRAIN_DEDUPE, CORESET_SIZE,
+                          ROLLING_FEATURES, OUT_OF_CORE, MEMORY_CAP_MB)
+from mlops.utils import create_version_dir, version_models, record_version
+from mlops.manifest import data_fingerprint
+from mlops.compact import compact_and_save, save_compact_report
+from mlops.cascade import cascade_and_save, save_cascade_report
+from mlops.calibrate import calibrate_model, save_calibration_report
+from mlops.lookup_table import LUT_FILE
+from mlops.drift import save_reference, reference_frame, IRRIGATION_FEATURES, IRRIGATION_CATEGORICAL
 from src.Irrigation_Model import IrrigationModel
 
 
@@ -9,8 +17,15 @@ def train_irrigation():
     """Train irrigation model, save a versioned snapshot, and return (acc, version_dir)."""
     print("🌱 Training IRRIGATION model...")
 
-    model = IrrigationModel()
+    model = IrrigationModel(probability=SVC_PROBABILITY, dedupe=TRAIN_DEDUPE,
+                            coreset_size=CORESET_SIZE["irrigation"],
+                            rolling=ROLLING_FEATURES["irrigation"],
+                            memory_cap_mb=MEMORY_CAP_MB if OUT_OF_CORE["irrigation"] else None)
     acc = model.train()
+    if model.split is not None:
+        X_train = model.split[0]
+        profiling.current().add_phases("irrigation", model.timings,
+                                       rows=len(X_train), features=X_train.shape[1])
 
     if acc is None:
         # Defensive: if training skipped due to empty dataset
@@ -19,8 +34,65 @@ def train_irrigation():
 
     print(f"🌱 Irrigation accuracy: {acc:.4f}")
 
+    return acc, publish_irrigation(model, acc)
+
+
+def publish_irrigation(model, acc, df=None, calibration_report=None, fingerprint=None):
+    """Post-training steps for a fitted IrrigationModel; returns the version dir.
+
+    Models trained without built-in probability get a separate calibrator here
+    unless one is passed in already fitted (pipeline calibrate stage); the
+    artifacts are then (re)written to the top-level model folder for versioning.
+    """
+    if model.calibrator is None and not model.probability:
+        with profiling.phase("calibrate", "irrigation"):
+            calibration_report = calibrate_model(model)
+    with profiling.phase("dump", "irrigation"):
+        model.dump_artifacts()
+
+    # Reduced support-vector model, saved beside the exact one so it is versioned too
+    with profiling.phase("compact", "irrigation"):
+        compact_report = compact_and_save(model, IRRIGATION_MODEL_DIR,
+                                          "irrigation_model_compact.pkl")
+
+    # Linear first stage for early-exit inference, tuned to stay within tolerance
+    with profiling.phase("cascade", "irrigation"):
+        cascade_report = cascade_and_save(model, IRRIGATION_MODEL_DIR, "irrigation_model_cascade.pkl")
+
+    # The lookup table is compiled at promotion only; keep an old one out of this version
+    stale_lut = os.path.join(IRRIGATION_MODEL_DIR, LUT_FILE)
+    if os.path.exists(stale_lut):
+        os.remove(stale_lut)
+
     # Save a version folder with timestamp + accuracy
     version_dir = create_version_dir(IRRIGATION_MODEL_DIR, acc)
     version_models(IRRIGATION_MODEL_DIR, version_dir)
+    save_compact_report(version_dir, compact_report)
+    save_cascade_report(version_dir, cascade_report)
+    if calibration_report is not None:
+        save_calibration_report(version_dir, calibration_report)
+
+    # Training distribution for drift checks against live data
+    if df is None:
+        df, fingerprint = reference_frame(model)
+    save_reference(version_dir, df, IRRIGATION_FEATURES, IRRIGATION_CATEGORICAL)
+
+    # Manifest entry: metrics the promotion / retention queries look at
+    compact = compact_report.get("compact") or {}
+    cascade = cascade_report.get("cascade") or {}
+    record_version(IRRIGATION_MODEL_DIR, version_dir, metrics={
+        "acc": float(acc),
+        "n_support_vectors": compact_report.get("n_support_vectors"),
+        "latency_ms": compact.get("exact_latency_ms"),
+        "compact_latency_ms": compact.get("compact_latency_ms"),
+        "cascade_short_circuit": cascade.get("short_circuit"),
+        "cascade_latency_ms": cascade.get("cascade_latency_ms"),
+        "fit_seconds": model.fit_seconds,
+        "train_rows": (model.coreset_report or {}).get("rows_out"),
+        "raw_rows": (model.coreset_report or {}).get("rows_in"),
+        "probability": bool(model.probability),
+        "calibration_seconds": (calibration_report or {}).get("calibration_seconds"),
+        "calibration_ece": (calibration_report or {}).get("ece"),
+    }, fingerprint=fingerprint or data_fingerprint(df))
 
-    return acc, version_dir
+    return version_dir
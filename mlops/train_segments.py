@@ -0,0 +1,148 @@
+"""
+Train per-segment (soil, stage) models in parallel.
+
+Each segment with enough rows gets its own model folder, laid out like the
+global one so the registry (src/model_registry.py) can resolve it:
+
+    models/<task>/segments/<soil>__<stage>/
+        *.pkl                 latest training output
+        versions/<ts>_acc_X/  versioned snapshots (same retention as the global model)
+        current/              promoted model
+        metrics.json          best accuracy for this segment
+
+Segments with too few rows are skipped; the registry falls back to the
+global model for them. Only irrigation rows record the field (soil type,
+growth stage); plant-health has no segment columns and uses the global model.
+
+Usage:
+    python3 -m mlops.train_segments                 # irrigation, all CPUs
+    python3 -m mlops.train_segments --workers 2 --min-rows 300
+"""
+import os
+import json
+import argparse
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from mlops.config import DATA_PATH, MODELS_PATH, SVC_PROBABILITY, TRAIN_DEDUPE, ROLLING_FEATURES
+from mlops.utils import (create_version_dir, version_models, set_current_from_version_dir,
+                         cleanup_old_versions)
+from src.model_registry import segment_dir
+from src.Irrigation_Model import IrrigationModel
+from src.plant_health import PlantHealthModel
+
+MIN_ROWS = 200
+KEEP_LAST = 30            # versions kept per segment, as for the global models
+
+# task -> (model class, training CSV, model file name, segment columns: soil, stage)
+SEGMENT_TASKS = {
+    "irrigation": (IrrigationModel, "irrigation.csv", "irrigation_model.pkl",
+                   ("soil_type", "Seedling Stage")),
+    "plant_health": (PlantHealthModel, "plant_health_data.csv", "plant_health_svm.pkl", ()),
+}
+
+
+def _segment_metrics(seg_dir: str) -> Dict:
+    path = os.path.join(seg_dir, "metrics.json")
+    if not os.path.exists(path):
+        return {"acc": 0.0}
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def train_segment(task: str, key: tuple, csv_path: str, models_root: str = MODELS_PATH,
+                  keep_last: int = KEEP_LAST) -> Dict:
+    """Train one segment from its CSV slice; promote it if it beats the segment's best."""
+    model_cls, _, model_name, _ = SEGMENT_TASKS[task]
+    seg_dir = segment_dir(models_root, task, *key)
+    os.makedirs(seg_dir, exist_ok=True)
+
+    model = model_cls(
+        dataset=csv_path,
+        model_file=os.path.join(seg_dir, model_name),
+        model_dir=seg_dir,
+        probability=SVC_PROBABILITY,
+        dedupe=TRAIN_DEDUPE,
+        rolling=ROLLING_FEATURES[task],
+    )
+    acc = model.train_from_csv(csv_path)
+    if acc is None:
+        return {"task": task, "segment": key, "acc": None, "promoted": False}
+
+    version_dir = create_version_dir(seg_dir, acc)
+    version_models(seg_dir, version_dir)
+
+    best = _segment_metrics(seg_dir)
+    promoted = acc > best.get("acc", 0.0) or not os.path.isdir(os.path.join(seg_dir, "current"))
+    if promoted:
+        set_current_from_version_dir(seg_dir, version_dir)
+        with open(os.path.join(seg_dir, "metrics.json"), "w") as f:
+            json.dump({"acc": float(acc), "version": os.path.basename(version_dir)}, f, indent=4)
+    cleanup_old_versions(seg_dir, keep_last=keep_last)
+
+    return {"task": task, "segment": key, "acc": float(acc), "promoted": promoted,
+            "version_dir": version_dir}
+
+
+def plan_segments(task: str, df: pd.DataFrame, min_rows: int = MIN_ROWS) -> List[tuple]:
+    """(key, frame) for each segment with at least min_rows rows."""
+    cols = SEGMENT_TASKS[task][3]
+    present = [c for c in cols if c in df.columns]
+    if not present:
+        return []
+
+    plans = []
+    for values, frame in df.groupby(present):
+        values = values if isinstance(values, tuple) else (values,)
+        lookup = dict(zip(present, values))
+        key = tuple(lookup.get(c) for c in cols)
+        if len(frame) >= min_rows:
+            plans.append((key, frame))
+        else:
+            print(f"⏭ {task} segment {key}: {len(frame)} rows < {min_rows}, using global model")
+    return plans
+
+
+def train_all_segments(task: str = "irrigation", workers: Optional[int] = None,
+                       min_rows: int = MIN_ROWS, models_root: str = MODELS_PATH,
+                       keep_last: int = KEEP_LAST) -> List[Dict]:
+    """Train every eligible segment of a task in parallel worker processes."""
+    _, csv_name, _, _ = SEGMENT_TASKS[task]
+    df = pd.read_csv(os.path.join(DATA_PATH, csv_name))
+    plans = plan_segments(task, df, min_rows)
+    if not plans:
+        print(f"ℹ No segments to train for {task}.")
+        return []
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        jobs = []
+        for i, (key, frame) in enumerate(plans):
+            path = os.path.join(tmp, f"segment_{i}.csv")
+            frame.to_csv(path, index=False)
+            jobs.append((key, path))
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(train_segment, task, key, path, models_root, keep_last)
+                       for key, path in jobs]
+            for fut in as_completed(futures):
+                res = fut.result()
+                results.append(res)
+                mark = "✅" if res["promoted"] else "➖"
+                print(f"{mark} {task} {res['segment']}: acc={res['acc']}")
+
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train per-segment models in parallel.")
+    parser.add_argument("--task", default="irrigation", choices=sorted(SEGMENT_TASKS))
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--min-rows", type=int, default=MIN_ROWS)
+    parser.add_argument("--keep-last", type=int, default=KEEP_LAST, help="versions kept per segment")
+    args = parser.parse_args()
+
+    train_all_segments(args.task, args.workers, args.min_rows, keep_last=args.keep_last)
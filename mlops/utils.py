@@ -2,12 +2,20 @@
 Utility helpers for model versioning, cleanup, reporting, and git integration.
 """
 import os
+import json
 import shutil
 import subprocess
-from typing import Optional, List
+from typing import Dict, Optional, List
 from datetime import datetime
 
+from mlops import profiling
 from mlops.config import PROJECT_ROOT, timestamp
+from mlops.manifest import Manifest, BUILDING, READY, dir_bytes
+from mlops.shadow import report_lines as shadow_report_lines
+
+
+def _task(model_dir: str) -> str:
+    return os.path.basename(os.path.normpath(model_dir))
 
 
 # =========================================
@@ -18,43 +26,96 @@ def create_version_dir(model_dir: str, acc: float) -> str:
     folder = f"{timestamp()}_acc_{acc:.4f}"
     version_dir = os.path.join(model_dir, "versions", folder)
     os.makedirs(version_dir, exist_ok=True)
+    Manifest(model_dir).put(folder, timestamp=datetime.now().isoformat(timespec="seconds"),
+                            acc=float(acc), status=BUILDING)
     return version_dir
 
 
+# Top-level files in a model folder that belong to a trained version
+ARTIFACT_EXTENSIONS = (".pkl", ".npz")
+
+
 def version_models(model_dir: str, version_dir: str) -> None:
-    """Copy all top-level .pkl files from model_dir into version_dir."""
+    """Copy all top-level model artifacts (.pkl, .npz) from model_dir into version_dir."""
     os.makedirs(version_dir, exist_ok=True)
 
-    for name in os.listdir(model_dir):
-        src = os.path.join(model_dir, name)
-        if os.path.isfile(src) and name.endswith(".pkl"):
-            dst = os.path.join(version_dir, name)
-            shutil.copy2(src, dst)
-
+    with profiling.phase("copy", _task(model_dir)) as p:
+        p["files"] = 0
+        for name in os.listdir(model_dir):
+            src = os.path.join(model_dir, name)
+            if os.path.isfile(src) and name.endswith(ARTIFACT_EXTENSIONS):
+                dst = os.path.join(version_dir, name)
+                shutil.copy2(src, dst)
+                p["files"] += 1
+
+    Manifest(model_dir).put(os.path.basename(version_dir), status=READY,
+                            bytes=dir_bytes(version_dir))
     print(f"📦 Saved versioned models → {version_dir}")
 
 
+def record_version(model_dir: str, version_dir: str, metrics: Optional[Dict] = None,
+                   fingerprint: Optional[str] = None) -> Dict:
+    """Attach metrics / data fingerprint to a version once all its files are written."""
+    fields = {"bytes": dir_bytes(version_dir)}
+    if metrics:
+        fields["metrics"] = metrics
+    if fingerprint:
+        fields["fingerprint"] = fingerprint
+    profiling.current().record_artifacts(_task(model_dir), version_dir)
+    return Manifest(model_dir).put(os.path.basename(version_dir), **fields)
+
+
 def list_versions(model_dir: str) -> List[str]:
-    versions_root = os.path.join(model_dir, "versions")
-    if not os.path.exists(versions_root):
-        return []
-    return sorted(
-        [d for d in os.listdir(versions_root)
-         if os.path.isdir(os.path.join(versions_root, d))]
-    )
+    """Live versions (ready or current), oldest first, from the manifest."""
+    return [r["version"] for r in Manifest(model_dir).versions()]
 
 
 def latest_version_dir(model_dir: str) -> Optional[str]:
-    versions = list_versions(model_dir)
-    if not versions:
+    latest = Manifest(model_dir).latest()
+    if latest is None:
         return None
-    return os.path.join(model_dir, "versions", versions[-1])
+    return os.path.join(model_dir, "versions", latest["version"])
 
 
-def set_current_from_version_dir(model_dir: str, version_dir: str) -> None:
+def best_version_dir(model_dir: str, max_latency_ms: Optional[float] = None,
+                     metric: str = "acc") -> Optional[str]:
+    """Best version by `metric` whose recorded per-reading latency fits the budget."""
+    best = Manifest(model_dir).best(metric, max_latency_ms=max_latency_ms)
+    if best is None:
+        return None
+    return os.path.join(model_dir, "versions", best["version"])
+
+
+def replace_current(model_dir: str, version_dir: str) -> None:
+    """Make current/ an exact copy of version_dir.
+
+    The version is copied next to current/ and swapped in by rename, so no
+    artifact of an earlier promotion (LUT, compact / cascade / calibration
+    pickles) survives next to a model it was not built for, and a failed
+    copy leaves current/ untouched.
+    """
     current_dir = os.path.join(model_dir, "current")
-    os.makedirs(current_dir, exist_ok=True)
-    shutil.copytree(version_dir, current_dir, dirs_exist_ok=True)
+    staging = os.path.join(model_dir, f".current-new-{os.getpid()}")
+    retired = os.path.join(model_dir, f".current-old-{os.getpid()}")
+    shutil.rmtree(staging, ignore_errors=True)
+    shutil.copytree(version_dir, staging)
+    try:
+        if os.path.isdir(current_dir):
+            os.replace(current_dir, retired)
+        os.replace(staging, current_dir)
+    except OSError:
+        if not os.path.isdir(current_dir) and os.path.isdir(retired):
+            os.replace(retired, current_dir)
+        raise
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+        shutil.rmtree(retired, ignore_errors=True)
+
+
+def set_current_from_version_dir(model_dir: str, version_dir: str) -> None:
+    with profiling.phase("promote_copy", _task(model_dir)):
+        replace_current(model_dir, version_dir)
+    Manifest(model_dir).set_current(os.path.basename(version_dir))
     print(f"🔁 Updated current model for {model_dir} from {version_dir}")
 
 
@@ -62,15 +123,20 @@ def set_current_from_version_dir(model_dir: str, version_dir: str) -> None:
 # ROLLBACK
 # =========================================
 def rollback_to_previous(model_dir: str) -> bool:
-    versions = list_versions(model_dir)
-    if len(versions) < 2:
-        print(f"⚠ Not enough versions to rollback in {model_dir}")
-        return False
-
-    prev = versions[-2]
-    src = os.path.join(model_dir, "versions", prev)
-    dst = os.path.join(model_dir, "current")
-    shutil.copytree(src, dst, dirs_exist_ok=True)
+    """Restore the previously promoted version (or the second newest if none was)."""
+    manifest = Manifest(model_dir)
+    target = manifest.previous_current()
+    if target is not None:
+        prev = target["version"]
+    else:
+        versions = [r["version"] for r in manifest.versions()]
+        if len(versions) < 2:
+            print(f"⚠ Not enough versions to rollback in {model_dir}")
+            return False
+        prev = versions[-2]
+
+    replace_current(model_dir, os.path.join(model_dir, "versions", prev))
+    manifest.set_current(prev)
     print(f"🔄 Rolled back to version {prev}")
     return True
 
@@ -78,35 +144,98 @@ def rollback_to_previous(model_dir: str) -> bool:
 # =========================================
 # AUTO-DELETE OLD VERSIONS
 # =========================================
-def cleanup_old_versions(model_dir: str, keep_last: int = 30) -> None:
-    versions_root = os.path.join(model_dir, "versions")
-    if not os.path.exists(versions_root):
-        return
+def cleanup_old_versions(model_dir: str, keep_last: int = 30, keep_best: int = 0) -> None:
+    """Apply the retention policy from the manifest; the current version is always kept."""
+    with profiling.phase("cleanup", _task(model_dir)) as p:
+        p["deleted"] = _apply_retention(model_dir, keep_last, keep_best)
+
 
-    versions = sorted(
-        [v for v in os.listdir(versions_root)
-         if os.path.isdir(os.path.join(versions_root, v))]
-    )
+def _apply_retention(model_dir: str, keep_last: int, keep_best: int) -> int:
+    manifest = Manifest(model_dir)
+    old_versions = manifest.retention(keep_last=keep_last, keep_best=keep_best)
 
-    if len(versions) <= keep_last:
-        return
+    # Versions left "building" by an interrupted run, older than the newest good one
+    latest = manifest.latest()
+    if latest is not None:
+        old_versions += [r["version"] for r in manifest.versions(statuses=(BUILDING,))
+                         if (r.get("timestamp") or "") < (latest.get("timestamp") or "")]
 
-    old_versions = versions[:-keep_last]
+    if not old_versions:
+        return 0
 
+    versions_root = os.path.join(model_dir, "versions")
     for v in old_versions:
         path = os.path.join(versions_root, v)
         shutil.rmtree(path, ignore_errors=True)
         print(f"🧹 Deleted old version: {path}")
+    manifest.mark_deleted(old_versions)
 
     print(f"✔ Cleanup complete (kept last {keep_last}).")
+    return len(old_versions)
 
 
 # =========================================
 # NIGHTLY MARKDOWN REPORT
 # =========================================
+def fit_time_summary(model_dir: str, version_dir: Optional[str]) -> Optional[Dict]:
+    """Fit (+ calibration) time of a version vs the latest fit with built-in probability."""
+    if version_dir is None:
+        return None
+    manifest = Manifest(model_dir)
+    metrics = manifest.records.get(os.path.basename(version_dir), {}).get("metrics", {})
+    if metrics.get("fit_seconds") is None:
+        return None
+
+    baseline = None
+    for rec in reversed(manifest.versions()):
+        m = rec.get("metrics", {})
+        if m.get("probability") and m.get("fit_seconds"):
+            baseline = m["fit_seconds"]
+            break
+
+    total = metrics["fit_seconds"] + (metrics.get("calibration_seconds") or 0.0)
+    return {
+        "probability": metrics.get("probability"),
+        "fit_seconds": metrics["fit_seconds"],
+        "calibration_seconds": metrics.get("calibration_seconds"),
+        "baseline_seconds": baseline,
+        "saving": 1.0 - total / baseline if baseline else None,
+    }
+
+
+def _fit_time_lines(summary: Optional[Dict]) -> List[str]:
+    if summary is None:
+        return ["- Fit Time: n/a\n"]
+    lines = [f"- Fit Time: {summary['fit_seconds']:.2f}s "
+             f"(built-in probability: {'on' if summary['probability'] else 'off'})\n"]
+    if summary["calibration_seconds"] is not None:
+        lines.append(f"- Calibration Time: {summary['calibration_seconds'] * 1e3:.0f} ms\n")
+    if summary["saving"] is not None and not summary["probability"]:
+        lines.append(f"- Fit-Time Saving vs built-in probability ({summary['baseline_seconds']:.2f}s): "
+                     f"{summary['saving']:.0%}\n")
+    return lines
+
+
+def _cascade_lines(version_dir: Optional[str]) -> List[str]:
+    """Early-exit cascade summary from the version's cascade_report.json (mlops/cascade.py)."""
+    path = os.path.join(version_dir, "cascade_report.json") if version_dir else None
+    if path is None or not os.path.exists(path):
+        return []
+    with open(path, "r") as f:
+        cascade = json.load(f).get("cascade")
+    if not cascade:
+        return ["- Cascade: not built (no confident threshold)\n"]
+    return [f"- Cascade: {cascade['short_circuit']:.0%} of readings short-circuited, "
+            f"{cascade['full_latency_ms']:.3f} → {cascade['cascade_latency_ms']:.3f} ms per reading "
+            f"({cascade['latency_saving']:.0%} saved), acc loss {cascade['acc_loss']:+.4f}\n"]
+
+
 def write_nightly_report(
         prev_irr, irr_acc, irr_version_dir, irr_updated,
-        prev_plant, plant_acc, plant_version_dir, plant_updated
+        prev_plant, plant_acc, plant_version_dir, plant_updated,
+        fit_times: Optional[Dict[str, Optional[Dict]]] = None,
+        history: Optional[List[Dict]] = None,
+        shadow: Optional[Dict[str, Dict]] = None
     ):
     report_dir = os.path.join(PROJECT_ROOT, "reports")
     os.makedirs(report_dir, exist_ok=True)
@@ -121,13 +250,33 @@ def write_nightly_report(
         f.write(f"- Previous Accuracy: {prev_irr}\n")
         f.write(f"- New Accuracy: {irr_acc}\n")
         f.write(f"- Saved Version: {irr_version_dir}\n")
-        f.write(f"- Current Model Updated? {'✅ Yes' if irr_updated else '❌ No'}\n\n")
+        f.write(f"- Current Model Updated? {'✅ Yes' if irr_updated else '❌ No'}\n")
+        if fit_times is not None:
+            f.writelines(_fit_time_lines(fit_times.get("irrigation")))
+        f.writelines(_cascade_lines(irr_version_dir))
+        f.write("\n")
 
         f.write("## Plant Health Model\n")
         f.write(f"- Previous Accuracy: {prev_plant}\n")
         f.write(f"- New Accuracy: {plant_acc}\n")
         f.write(f"- Saved Version: {plant_version_dir}\n")
-        f.write(f"- Current Model Updated? {'✅ Yes' if plant_updated else '❌ No'}\n\n")
+        f.write(f"- Current Model Updated? {'✅ Yes' if plant_updated else '❌ No'}\n")
+        if fit_times is not None:
+            f.writelines(_fit_time_lines(fit_times.get("plant_health")))
+        f.writelines(_cascade_lines(plant_version_dir))
+        f.write("\n")
+
+        if shadow:
+            f.write("## Shadow Replay (recorded field readings)\n")
+            for task, report in shadow.items():
+                f.write(f"### {task}\n")
+                f.writelines(shadow_report_lines(report))
+            f.write("\n")
+
+        if history is not None:
+            f.write(f"## Training Cost (last {len(history)} runs)\n")
+            f.writelines(profiling.trend_lines(history))
+            f.write("\n")
 
         f.write("---\n")
         f.write("Versions older than 30 were automatically deleted.\n")
@@ -0,0 +1,104 @@
+"""
+Benchmark: template advisory engine vs. offline LLM (FLAN-T5 Small).
+
+Usage (from project root):
+    python3 raspberry_pi/benchmark_advisory.py                # template only
+    python3 raspberry_pi/benchmark_advisory.py --llm          # + google/flan-t5-small
+    python3 raspberry_pi/benchmark_advisory.py --llm --tiny   # + tiny random T5 (no download)
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import resource
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.advisory import TemplateAdvisor, make_llm_generator, available_memory_mb
+
+
+def random_reading(rng):
+    return {
+        "irrigation_pred": rng.randint(0, 1),
+        "plant_health": rng.choice(["Healthy", "Moderate Stress", "High Stress"]),
+        "moisture": round(rng.uniform(5, 90), 2),
+        "temperature": round(rng.uniform(0, 42), 2),
+        "humidity": round(rng.uniform(20, 95), 2),
+        "light": round(rng.uniform(1, 2000), 2),
+        "nitrogen": rng.randint(5, 60),
+        "phosphorus": rng.randint(5, 60),
+        "potassium": rng.randint(5, 130),
+    }
+
+
+def build_prompt(r):
+    return (
+        f"Temperature: {r['temperature']}C, Humidity: {r['humidity']}%, "
+        f"Soil moisture: {r['moisture']}%, Light: {r['light']} lux. "
+        f"NPK: {r['nitrogen']},{r['phosphorus']},{r['potassium']}. "
+        f"Irrigation needed: {r['irrigation_pred']}. "
+        f"Plant health: {r['plant_health']}. "
+        "Give a short farming recommendation."
+    )
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def load_llm(tiny):
+    from transformers import AutoTokenizer, AutoModelForSeq2SeqLM, T5Config
+
+    tokenizer = AutoTokenizer.from_pretrained("google/flan-t5-small")
+    if tiny:
+        config = T5Config(vocab_size=tokenizer.vocab_size + 100, d_model=32, d_ff=64,
+                          num_layers=1, num_heads=2, d_kv=16,
+                          decoder_start_token_id=tokenizer.pad_token_id)
+        model = AutoModelForSeq2SeqLM.from_config(config)
+    else:
+        model = AutoModelForSeq2SeqLM.from_pretrained("google/flan-t5-small")
+    model.eval()
+    return tokenizer, model
+
+
+def timeit(fn, readings):
+    start = time.perf_counter()
+    for r in readings:
+        fn(r)
+    return (time.perf_counter() - start) / len(readings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=10000, help="template iterations")
+    parser.add_argument("--llm", action="store_true", help="also benchmark the LLM path")
+    parser.add_argument("--llm-n", type=int, default=10, help="LLM iterations")
+    parser.add_argument("--tiny", action="store_true", help="use a tiny randomly initialised T5")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    templates = TemplateAdvisor()
+
+    readings = [random_reading(rng) for _ in range(args.n)]
+    rss_before = peak_rss_mb()
+    t_template = timeit(lambda r: templates.render(templates.advise(**r)), readings)
+
+    print("# Advisory benchmark")
+    print(f"- Free memory: {available_memory_mb() or 0:.0f} MB")
+    print(f"- Template: {t_template * 1e6:.1f} µs/call over {args.n} calls, "
+          f"peak RSS {rss_before:.0f} MB")
+
+    if args.llm:
+        tokenizer, model = load_llm(args.tiny)
+        generate = make_llm_generator(tokenizer, model, max_length=80)
+        llm_readings = readings[:args.llm_n]
+        generate(build_prompt(llm_readings[0]))   # warm-up
+        t_llm = timeit(lambda r: generate(build_prompt(r)), llm_readings)
+        print(f"- LLM: {t_llm * 1e3:.1f} ms/call over {len(llm_readings)} calls, "
+              f"peak RSS {peak_rss_mb():.0f} MB")
+        print(f"- Speed-up: {t_llm / t_template:,.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Benchmark: logging overhead per field-loop iteration (predict + publish).
+
+Runs FieldPredictor + Publisher from src/agriculture.py on simulated readings
+(LogClient, so payloads are logged as with --no-mqtt) under:
+
+    none           root at WARNING — the models alone
+    sync           basicConfig-style handler writing on the calling thread
+    async          src/log_setup.py queue + listener, nothing dropped
+    async+thinned  same with the default SAMPLING / RATE_LIMITS
+
+Reported per iteration: the time the loop thread spends inside log calls,
+and the whole iteration's overhead above `none` (which also includes the
+listener thread's formatting, competing for the GIL). The listener's remaining
+backlog is flushed after the timed loop and reported separately. Point --dir at the SD card to measure the real device.
+
+Usage (from project root):
+    python3 raspberry_pi/benchmark_logging.py
+    python3 raspberry_pi/benchmark_logging.py --n 5000 --dir /home/pi/logs
+"""
+import os
+import sys
+import time
+import random
+import logging
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.agriculture import DEADBAND, FieldPredictor, LogClient, Publisher, SimulatedSensors
+from src.log_setup import FORMAT, configure_logging, shutdown_logging, stats
+from src.model_registry import ModelRegistry
+from src.scheduler import Deadband
+
+MODES = ("none", "sync", "async", "async+thinned")
+
+
+def setup(mode, log_dir):
+    path = os.path.join(log_dir, f"bench_{mode.replace('+', '_')}.log")
+    if mode == "none":
+        configure_logging(level=logging.WARNING, console=False, force=True)
+    elif mode == "sync":
+        shutdown_logging()
+        root = logging.getLogger()
+        for h in list(root.handlers):
+            root.removeHandler(h)
+        handler = logging.FileHandler(path)
+        handler.setFormatter(logging.Formatter(FORMAT))
+        root.addHandler(handler)
+        root.setLevel(logging.INFO)
+    elif mode == "async":
+        configure_logging(console=False, log_file=path, sampling={}, rate_limits={}, force=True)
+    else:
+        configure_logging(console=False, log_file=path, force=True)
+    return path
+
+
+def run(mode, readings, log_dir):
+    path = setup(mode, log_dir)
+    predictor = FieldPredictor(ModelRegistry()).load()
+    publisher = Publisher(LogClient(), Deadband(DEADBAND, heartbeat=0))
+
+    # Time spent inside the log calls themselves (record, filters, handlers
+    # that run on the caller) — free of the models' run-to-run noise
+    spent = [0.0]
+    original = logging.Logger._log
+
+    def timed_log(self, *args, **kwargs):
+        t = time.perf_counter()
+        try:
+            return original(self, *args, **kwargs)
+        finally:
+            spent[0] += time.perf_counter() - t
+
+    logging.Logger._log = timed_log
+    try:
+        start = time.perf_counter()
+        for reading in readings:
+            publisher(predictor(reading))
+        per_iteration = (time.perf_counter() - start) / len(readings)
+    finally:
+        logging.Logger._log = original
+    in_calls = spent[0] / len(readings)
+
+    dropped = stats()
+    start = time.perf_counter()
+    shutdown_logging()
+    for h in list(logging.getLogger().handlers):
+        h.close()
+        logging.getLogger().removeHandler(h)
+    drain = time.perf_counter() - start
+    # Current file + rotated backups
+    size = sum(os.path.getsize(os.path.join(log_dir, f)) for f in os.listdir(log_dir)
+               if f.startswith(os.path.basename(path)))
+    for f in os.listdir(log_dir):
+        if f.startswith(os.path.basename(path)):
+            os.remove(os.path.join(log_dir, f))
+    return per_iteration, in_calls, drain, size, dropped
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=2000, help="loop iterations per mode")
+    parser.add_argument("--rounds", type=int, default=3, help="interleaved rounds; the median is reported")
+    parser.add_argument("--dir", help="where to write the logs (default: a temp dir)")
+    args = parser.parse_args()
+
+    random.seed(42)
+    sensors = SimulatedSensors()
+    readings = [sensors.read() for _ in range(args.n)]
+    log_dir = args.dir or tempfile.mkdtemp(prefix="bench_logging_")
+    os.makedirs(log_dir, exist_ok=True)
+
+    # Interleave the modes so drift (thermal throttling, other load) hits all of them
+    rounds = {mode: [] for mode in MODES}
+    for _ in range(args.rounds):
+        for mode in MODES:
+            rounds[mode].append(run(mode, readings, log_dir))
+    results = {mode: sorted(runs, key=lambda r: r[0])[len(runs) // 2] for mode, runs in rounds.items()}
+    base = results["none"][0]
+
+    print(f"# Logging benchmark ({args.n} iterations, median of {args.rounds} rounds, logs in {log_dir})")
+    for mode, (per_iteration, in_calls, drain, size, dropped) in results.items():
+        line = f"- {mode}: {per_iteration * 1e6:.0f} µs/iteration"
+        if mode != "none":
+            line += (f", {in_calls * 1e6:.0f} µs in log calls, loop overhead {(per_iteration - base) * 1e6:+.0f} µs, "
+                     f"flush at exit {drain * 1e3:.0f} ms, {size / 1024:.0f} KB written")
+        if dropped and mode != "none":
+            line += (f" ({dropped['sampled_out']} sampled out, {dropped['rate_limited']} rate-limited, "
+                     f"{dropped['queue_full']} lost to a full queue)")
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,101 +1,166 @@
-import time
-import json
+import atexit
 import logging
 from datetime import datetime
 
 from src.Irrigation_Model import IrrigationModel
 from src.plant_health import PlantHealthModel
-from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
+from src.history_log import DEFAULT_HISTORY_DIR, HistoryWriter
+from src.log_setup import configure_logging
+from src.scheduler import AdaptiveScheduler, Deadband, SignalPolicy
+from src.advisory import (
+    AdvisoryWorker, LLMBudget, TemplateAdvisor, discretise_state, make_llm_generator
+)
 
 from sensors_ads import SensorADS
 from npk_sensor import NPKSensor
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s"
-)
+configure_logging(log_file="logs/inference_loop.jsonl", force=True)
+loop_log = logging.getLogger("edge.loop")   # per-reading lines, rate-limited
+
+# Field context for the irrigation model (also recorded with every reading, so
+# the uploaded history rows carry the full training schema — src/batch_upload.py)
+SOIL_TYPE = "Black Soil"
+GROWTH_STAGE = "Germination"
+
+# Template advice is always produced; the LLM only enriches it when enabled
+# and while it fits the latency budget / memory headroom below.
+USE_LLM = True
+LLM_LATENCY_BUDGET = 5.0    # seconds per generation
+LLM_MIN_FREE_MB = 300       # MB of MemAvailable required to run the LLM
+
+# Adaptive sampling: per-signal interval bounds (s) and the rates of change
+# (units/s) at which a signal counts as calm / changing fast
+SIGNALS = {
+    "moisture": SignalPolicy(min_interval=5, max_interval=300, rate_low=0.5 / 3600, rate_high=5 / 600),
+    "climate": SignalPolicy(min_interval=10, max_interval=300, rate_low=0.5 / 3600, rate_high=1 / 60),
+    "light": SignalPolicy(min_interval=10, max_interval=600, rate_low=100 / 3600, rate_high=100 / 60),
+    "npk": SignalPolicy(min_interval=60, max_interval=1800, rate_low=1 / 3600, rate_high=1 / 60),
+}
+# Log/publish only if a reading moved more than this (predictions: any change)
+DEADBAND = {"temperature": 0.5, "humidity": 2.0, "soil_moisture": 1.0, "light": 50,
+            "n": 2, "p": 2, "k": 2}
+HEARTBEAT = 300             # seconds between logs even when nothing changed
 
 # ======================================================
-# Load Models
+# Load Models (release from src/model_sync.py if synced, else git-tracked current/)
 # ======================================================
-irrigation_model = IrrigationModel(
-    dataset_path="data/irrigation.csv",
-    model_path="models/irrigation/current/irrigation_model.pkl",
-    scaler_path="models/irrigation/current/irrigation_scaler.pkl",
-    encoder_path="models/irrigation/current/irrigation_encoders.pkl"
-)
+irrigation_model = IrrigationModel.load_current()
+plant_model = PlantHealthModel.load_current()
 
-plant_model = PlantHealthModel(
-    dataset_path="data/plant_health_data.csv",
-    model_path="models/plant_health/current/plant_health_svm.pkl",
-    scaler_path="models/plant_health/current/plant_health_scaler.pkl",
-    encoder_path="models/plant_health/current/plant_health_encoder.pkl"
-)
+templates = TemplateAdvisor()
+advisor = None
 
 # Offline LLM (FLAN-T5 Small)
-tokenizer = AutoTokenizer.from_pretrained("google/flan-t5-small")
-llm_model = AutoModelForSeq2SeqLM.from_pretrained("google/flan-t5-small")
+if USE_LLM:
+    from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
+
+    tokenizer = AutoTokenizer.from_pretrained("google/flan-t5-small")
+    llm_model = AutoModelForSeq2SeqLM.from_pretrained("google/flan-t5-small")
+
+    # Advice is generated in the background and cached per discretised state
+    llm_budget = LLMBudget(latency_budget=LLM_LATENCY_BUDGET, min_free_mb=LLM_MIN_FREE_MB)
+    generate = llm_budget.wrap(make_llm_generator(tokenizer, llm_model, max_length=80))
+    advisor = AdvisoryWorker(generate, ttl=1800).start()
+    atexit.register(advisor.stop)
 
 # Sensors
 ads = SensorADS()
 npk = NPKSensor(port="/dev/ttyUSB0")  # optional
 
+# Sensor history (buffered, hourly segments under data/history/); the hourly
+# upload turns it into training-store batches (src/batch_upload.py)
+history = HistoryWriter(DEFAULT_HISTORY_DIR, flush_every=30, fsync="rotate")
+atexit.register(history.close)
+
 # ======================================================
 # Inference Loop
 # ======================================================
+scheduler = AdaptiveScheduler(SIGNALS)
+publish_gate = Deadband(DEADBAND, heartbeat=HEARTBEAT)
+temperature = humidity = moisture = light = None
+dht_imputed = False
+n = p = k = None
+
 while True:
+    # Sleep until the next signal is due (deadline based, no drift)
+    due = scheduler.wait()
     try:
-        # Read sensors
-        temperature, humidity = ads.read_temp_humidity()
-        moisture = ads.read_soil_moisture()
-        light = ads.read_light_intensity()
-
-        n, p, k = npk.read_npk() if npk else (None, None, None)
-
-        # Predictions
-        irrigation_pred = irrigation_model.predict([
-            temperature, humidity, moisture, light
-        ])
-
-        plant_pred = plant_model.predict([
-            temperature, humidity, moisture, light, n, p, k
-        ])
-
-        # LLM response
-        prompt = (
-            f"Temperature: {temperature}C, Humidity: {humidity}%, "
-            f"Soil moisture: {moisture}%, Light: {light} lux. "
-            f"NPK: {n},{p},{k}. "
-            f"Irrigation needed: {irrigation_pred}. "
-            f"Plant health: {plant_pred}. "
-            "Give a short farming recommendation."
+        # Read only the sensors that are due; others keep their last value
+        if "climate" in due:
+            temperature, humidity = ads.read_temp_humidity()
+            dht_imputed = ads.dht_imputed     # simulated DHT fallback values
+            scheduler.observe("climate", temperature)
+        if "moisture" in due:
+            moisture = ads.read_soil_moisture()
+            scheduler.observe("moisture", moisture)
+        if "light" in due:
+            light = ads.read_light_intensity()
+            scheduler.observe("light", light)
+        if "npk" in due:
+            n, p, k = npk.read_npk() if npk else (None, None, None)
+            scheduler.observe("npk", n)
+
+        # Predictions (both models see moisture in %)
+        irrigation_pred, moisture_pct = irrigation_model.predict(
+            SOIL_TYPE, GROWTH_STAGE, moisture, temperature, humidity
         )
+        irrigation_pred = int(irrigation_pred)
 
-        inputs = tokenizer(prompt, return_tensors="pt")
-        output = llm_model.generate(**inputs, max_length=80)
-        advisory = tokenizer.decode(output[0], skip_special_tokens=True)
+        plant_pred = str(plant_model.predict(
+            moisture_pct, temperature, humidity, light, n, p, k
+        ))
+
+        # A changed decision means the field is moving: sample fast again
+        scheduler.observe_prediction("irrigation", irrigation_pred)
+        scheduler.observe_prediction("plant_health", plant_pred)
 
-        # Logging
         log = {
             "timestamp": str(datetime.now()),
+            "soil_type": SOIL_TYPE,
+            "stage": GROWTH_STAGE,
             "temperature": temperature,
             "humidity": humidity,
-            "soil_moisture": moisture,
+            "soil_moisture": moisture_pct,
             "light": light,
             "n": n,
             "p": p,
             "k": k,
+            "dht_imputed": dht_imputed,
             "irrigation_needed": irrigation_pred,
             "plant_health": plant_pred,
-            "advice": advisory
         }
 
-        with open("data/live_log.json", "a") as f:
-            f.write(json.dumps(log) + "\n")
+        # Nothing moved beyond the deadband → skip advice, SD write and log line
+        if not publish_gate.should_publish(log):
+            continue
+
+        # Advisory (template always, cached LLM advice when present; new generations when budget allows)
+        prompt = (
+            f"Temperature: {temperature}C, Humidity: {humidity}%, "
+            f"Soil moisture: {moisture_pct}%, Light: {light} lux. "
+            f"NPK: {n},{p},{k}. "
+            f"Irrigation needed: {irrigation_pred}. "
+            f"Plant health: {plant_pred}. "
+            "Give a short farming recommendation."
+        )
+
+        advisory = templates.render(templates.advise(
+            irrigation_pred, plant_pred, moisture_pct, temperature, humidity,
+            light, n, p, k
+        ))
 
-        logging.info(f"LOGGED: {log}")
+        if advisor is not None:
+            state = discretise_state(irrigation_pred, plant_pred, moisture_pct, temperature, n, p, k)
+            # Never blocks on the LLM; only advice generated for this state replaces the template.
+            # Cached advice is always used; the budget only gates queueing a new generation.
+            advisory = advisor.request(state, prompt, generate=llm_budget.allows()) or advisory
 
-    except Exception as e:
-        logging.error(f"Error in inference loop: {e}")
+        # Logging
+        log["advice"] = advisory
+        history.append(log)
 
-    time.sleep(10)
+        loop_log.info("LOGGED: %s", log)
+
+    except Exception as e:
+        logging.error("Error in inference loop: %s", e)
+        scheduler.defer(due)
@@ -6,12 +6,28 @@ cd /home/pi/Smart-Farming-AI-System
 git config user.email "raspberrypi@local"
 git config user.name "Raspberry Pi Bot"
 
+# Fetch blobs only for the paths that are checked out (partial clone)
+git config remote.origin.promisor true
+git config remote.origin.partialclonefilter blob:none
+
 # Pull latest
 git pull --rebase
 
+# Activate newly promoted models from the chunk store CI publishes: only the
+# chunks not already cached are assembled into models/.sync/ (src/model_sync.py).
+# Once a synced release is active, models/ (every nightly .pkl and version
+# folder) is left out of the checkout, so later pulls skip the model trees.
+# A failed sync keeps the active model and does not stop the upload.
+if python3 src/model_sync.py --source model_store; then
+    git sparse-checkout set --no-cone '/*' '!/models/'
+fi
+
+# Pack history records not yet sent into compressed training-schema batches
+# (src/batch_upload.py); the history itself stays on the Pi
+python3 src/batch_upload.py
+
 # Add new data
-git add data/*.csv
-git add data/live_log.json
+git add data/batches
 
 # Commit with timestamp
 git commit -m "Raspberry Pi auto-upload sensor data $(date)" || true
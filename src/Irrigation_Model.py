@@ -1,5 +1,6 @@
 import os
 import csv
+import numpy as np
 import pandas as pd
 import adafruit_dht
 from gpiozero import MCP3008
@@ -11,19 +12,56 @@ from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score, classification_report
 from sklearn.svm import SVC
 
+try:
+    from src.data_quality import clean
+    from src.compact_svm import CompactSVC
+    from src.cascade import CascadeClassifier, LinearGate
+    from src.irrigation_lut import IrrigationLUT
+    from src.calibration import Calibrator
+    from src.coreset import reduce_training_set, GRID_RESOLUTION
+    from src.rolling_features import (RollingFeatures, add_rolling_features, cold_start,
+                                      rolling_columns, rolling_resolution, uses_rolling,
+                                      require_timestamps, stamped_rows)
+    from src.log_setup import configure_logging
+    from src.out_of_core import csv_columns, prepare_training, read_csv_chunks, source_columns
+    from src.model_sync import active_dir
+except ImportError:  # imported from inside src/ (edge scripts)
+    from data_quality import clean
+    from compact_svm import CompactSVC
+    from cascade import CascadeClassifier, LinearGate
+    from irrigation_lut import IrrigationLUT
+    from calibration import Calibrator
+    from coreset import reduce_training_set, GRID_RESOLUTION
+    from rolling_features import (RollingFeatures, add_rolling_features, cold_start,
+                                  rolling_columns, rolling_resolution, uses_rolling,
+                                  require_timestamps, stamped_rows)
+    from log_setup import configure_logging
+    from out_of_core import csv_columns, prepare_training, read_csv_chunks, source_columns
+    from model_sync import active_dir
+
 # --------------------------
 # CONFIGURE LOGGING
 # --------------------------
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s"
-)
+configure_logging()
 
 class IrrigationModel:
+    FEATURES = ["soil_type", "Seedling Stage", "MOI", "temp", "humidity"]
+    # Signals with optional rolling features (src/rolling_features.py)
+    ROLLING_COLUMNS = ["MOI", "temp", "humidity"]
+    LABEL = "result"
+    DROP_COLUMNS = ["Unnamed: 0", "crop_ID", "row_hash"]
+
     def __init__(
         self,
         dataset="data/irrigation.csv",
-        model_file="models/irrigation/irrigation_model.pkl"
+        live_dataset="data/live/irrigation.csv",
+        model_file="models/irrigation/irrigation_model.pkl",
+        model_dir="models/irrigation",
+        probability=True,
+        dedupe=True,
+        coreset_size=None,
+        rolling=False,
+        memory_cap_mb=None
     ):
 
         # Compute PROJECT ROOT (one level above src/)
@@ -31,14 +69,41 @@ class IrrigationModel:
 
         # Construct correct absolute paths
         self.dataset = os.path.join(BASE_DIR, dataset)
+        # Field rows uploaded by the Pi and merged by mlops/merge_batches.py
+        self.live_dataset = os.path.join(BASE_DIR, live_dataset) if live_dataset else None
         self.model_file = os.path.join(BASE_DIR, model_file)
-        self.scaler_file = os.path.join(BASE_DIR, "models/irrigation/irrigation_scaler.pkl")
-        self.encoder_file = os.path.join(BASE_DIR, "models/irrigation/irrigation_encoders.pkl")
+        self.scaler_file = os.path.join(BASE_DIR, model_dir, "irrigation_scaler.pkl")
+        self.encoder_file = os.path.join(BASE_DIR, model_dir, "irrigation_encoders.pkl")
+        self.calibration_file = os.path.join(BASE_DIR, model_dir, "irrigation_calibration.pkl")
+
+        # False skips libsvm's internal 5-fold Platt scaling at fit time;
+        # confidences then come from a separately fitted calibrator
+        self.probability = probability
+
+        # Training-set reduction (src/coreset.py): near-duplicate collapse on a
+        # feature grid, optionally a class-balanced coreset of this many rows
+        self.dedupe = dedupe
+        self.coreset_size = coreset_size
+
+        # Extra EWMA / slope / min / max features per signal over the stream
+        self.rolling = rolling
+
+        # Out-of-core training (src/out_of_core.py) within this working-set
+        # cap in MB; None = the whole dataset in memory
+        self.memory_cap_mb = memory_cap_mb
 
         # Create model directories if missing
-        os.makedirs(os.path.join(BASE_DIR, "models/irrigation"), exist_ok=True)
+        os.makedirs(os.path.join(BASE_DIR, model_dir), exist_ok=True)
 
         self.model = None
+        self.lut = None
+        self.calibrator = None
+        self.fit_seconds = None
+        self.timings = {}         # seconds per train() phase (load, preprocess, fit, …)
+        self.split = None
+        self.sample_weight = None
+        self.quality_report = None
+        self.coreset_report = None
         self.scaler = StandardScaler()
 
         # Categorical encoding
@@ -49,19 +114,72 @@ class IrrigationModel:
 
         logging.info(f"IrrigationModel initialized with dataset: {self.dataset}")
 
+    # -----------------------------------------
+    def sources(self):
+        """Training CSVs: the bundled dataset, then the merged field rows (if any)."""
+        paths = [self.dataset]
+        if self.live_dataset and os.path.exists(self.live_dataset):
+            paths.append(self.live_dataset)
+        return paths
+
     # -----------------------------------------
     def load_dataset(self):
-        """Load dataset fresh every time."""
-        df = pd.read_csv(self.dataset)
+        """Load dataset fresh every time (bundled CSV + field rows)."""
+        df = pd.concat([pd.read_csv(path) for path in self.sources()], ignore_index=True, sort=False)
 
         # Remove unnecessary columns
-        for col in ["Unnamed: 0", "crop_ID"]:
+        for col in self.DROP_COLUMNS:
             if col in df.columns:
                 df = df.drop(columns=[col])
 
+        # Drop out-of-range / imputed / duplicate rows before they reach training
+        df, self.quality_report = clean(df)
+
         # logging.info(f"Dataset loaded with shape {df.shape}.")
         return df
 
+    # -----------------------------------------
+    def feature_columns(self):
+        """Model input columns, in order."""
+        return self.FEATURES + (rolling_columns(self.ROLLING_COLUMNS) if self.rolling else [])
+
+    # -----------------------------------------
+    def add_rolling(self, df):
+        """Rolling feature columns over the time-ordered rows (no-op unless enabled).
+
+        Only the time-stamped (field) rows are kept; raises ValueError if
+        there are none to order by.
+        """
+        if not self.rolling:
+            return df
+        df = stamped_rows(df, self.live_dataset or self.dataset)
+        return add_rolling_features(df, self.ROLLING_COLUMNS)
+
+    # -----------------------------------------
+    def iter_chunks(self, chunk_rows):
+        """load_dataset() + add_rolling() one block of rows at a time (out-of-core path)."""
+        self.quality_report = {}
+        tracker = RollingFeatures(self.ROLLING_COLUMNS) if self.rolling else None
+        sources = self.sources()
+        if tracker is not None:
+            # Rolling features train on the time-stamped field rows only
+            sources = [path for path in sources if "timestamp" in csv_columns(path)]
+            if not sources:
+                require_timestamps(pd.DataFrame(), self.live_dataset or self.dataset)
+        columns = source_columns(sources, drop=self.DROP_COLUMNS)
+        for path in sources:
+            for chunk in read_csv_chunks(path, chunk_rows, drop=self.DROP_COLUMNS,
+                                         report=self.quality_report):
+                chunk = chunk.reindex(columns=columns)
+                if tracker is not None:
+                    chunk = stamped_rows(chunk, required=False)
+                    if chunk.empty:
+                        continue
+                    chunk = add_rolling_features(chunk, self.ROLLING_COLUMNS, tracker=tracker)
+                yield chunk
+        if tracker is not None and not tracker.last:
+            require_timestamps(pd.DataFrame(), self.live_dataset or self.dataset)
+
     # -----------------------------------------
     def preprocess(self, df):
         """Encode + scale features."""
@@ -71,7 +189,7 @@ class IrrigationModel:
         for col in self.encoders:
             df[col] = self.encoders[col].fit_transform(df[col])
 
-        X = df[["soil_type", "Seedling Stage", "MOI", "temp", "humidity"]]
+        X = df[self.feature_columns()]
         y = df["result"]
 
         # Scale numeric features
@@ -80,50 +198,146 @@ class IrrigationModel:
         return X_scaled, y
 
     # -----------------------------------------
-    def train(self):
-        """Train the SVM model."""
-        df = self.load_dataset()
+    def transform(self, df):
+        """Encode + scale with the already fitted encoders/scaler (no refit)."""
+        df = df.copy()
+        for col in self.encoders:
+            df[col] = self.encoders[col].transform(df[col])
 
-        # Only rows with result 0/1
-        df = df[df["result"].isin([0, 1])]
+        X = df[self.feature_columns()]
+        return self.scaler.transform(X), df["result"]
 
-        if df.empty:
-            logging.warning("Training skipped — dataset has no labeled result 0/1.")
-            return
+    # -----------------------------------------
+    def labeled(self, df):
+        """Only rows with result 0/1."""
+        return df[df["result"].isin([0, 1])]
 
-        X, y = self.preprocess(df)
+    # -----------------------------------------
+    def grid_resolution(self):
+        """Coreset grid cell per numeric input column (src/coreset.py)."""
+        if self.rolling:
+            return {**GRID_RESOLUTION, **rolling_resolution(self.ROLLING_COLUMNS, GRID_RESOLUTION)}
+        return GRID_RESOLUTION
 
-        X_train, X_test, y_train, y_test = train_test_split(
-            X, y, test_size=0.2, random_state=42
+    # -----------------------------------------
+    def reduce(self, df):
+        """Collapse near-duplicate rows before preprocess; returns (df, sample_weight)."""
+        df, weights, self.coreset_report = reduce_training_set(
+            df, "result", categorical=list(self.encoders), resolution=self.grid_resolution(),
+            dedupe=self.dedupe, target_size=self.coreset_size
         )
+        return df, weights
+
+    # -----------------------------------------
+    def build_model(self):
+        """Fresh, unfitted classifier."""
+        return SVC(kernel="rbf", probability=self.probability)
+
+    # -----------------------------------------
+    def dump_artifacts(self):
+        """Save model + scaler + encoders to their configured paths."""
+        joblib.dump(self.model, self.model_file)
+        joblib.dump(self.scaler, self.scaler_file)
+        joblib.dump(self.encoders, self.encoder_file)
 
-        self.model = SVC(kernel="rbf", probability=True)
-        self.model.fit(X_train, y_train)
+        # Calibrator travels with the model; drop a stale one from an older run
+        if self.calibrator is not None:
+            joblib.dump(self.calibrator.to_dict(), self.calibration_file)
+        elif os.path.exists(self.calibration_file):
+            os.remove(self.calibration_file)
 
+    # -----------------------------------------
+    def predict_proba(self, X_scaled):
+        """Class probabilities for scaled rows: calibrator, else built-in Platt scaling."""
+        if self.calibrator is not None:
+            return self.calibrator.predict_proba(self.model.decision_function(X_scaled))
+        return self.model.predict_proba(X_scaled)
+
+    # -----------------------------------------
+    def train(self):
+        """Train the SVM model."""
+        if self.memory_cap_mb:
+            # Streamed blocks → float32 memory map → capped training / holdout rows
+            start = time.perf_counter()
+            self.split, self.sample_weight = prepare_training(self, self.memory_cap_mb)
+            self.timings = {"preprocess": time.perf_counter() - start}
+            if self.split is None:
+                logging.warning("Training skipped — dataset has no labeled result 0/1.")
+                return
+        else:
+            start = time.perf_counter()
+            # Rolling features follow the full time series, before unlabeled rows go
+            df = self.labeled(self.add_rolling(self.load_dataset()))
+            self.timings = {"load": time.perf_counter() - start}
+
+            if df.empty:
+                logging.warning("Training skipped — dataset has no labeled result 0/1.")
+                return
+
+            # Encoders + scaler see every labeled row
+            start = time.perf_counter()
+            self.preprocess(df)
+
+            train_df, test_df = train_test_split(df, test_size=0.2, random_state=42)
+
+            # Only the training rows are reduced; the holdout stays raw
+            train_df, w_train = self.reduce(train_df)
+            X_train, y_train = self.transform(train_df)
+            X_test, y_test = self.transform(test_df)
+
+            # Kept for post-training steps in mlops (e.g. compaction)
+            self.split = (X_train, X_test, y_train, y_test)
+            self.sample_weight = w_train
+            self.timings["preprocess"] = time.perf_counter() - start
+
+        X_train, X_test, y_train, y_test = self.split
+        w_train = self.sample_weight
+
+        self.model = self.build_model()
+        start = time.perf_counter()
+        self.model.fit(X_train, y_train, sample_weight=w_train)
+        self.fit_seconds = self.timings["fit"] = time.perf_counter() - start
+
+        start = time.perf_counter()
         preds = self.model.predict(X_test)
         acc = accuracy_score(y_test, preds)
+        self.timings["evaluate"] = time.perf_counter() - start
 
         logging.info(f"Training complete. Accuracy = {acc}")
         #logging.info("\n" + classification_report(y_test, preds))
 
         # Save model + scaler + encoders
-        joblib.dump(self.model, self.model_file)
-        joblib.dump(self.scaler, self.scaler_file)
-        joblib.dump(self.encoders, self.encoder_file)
+        start = time.perf_counter()
+        self.dump_artifacts()
+        self.timings["dump"] = time.perf_counter() - start
 
         return acc
 
     # -----------------------------------------
-    def predict(self, soil_type, stage, moi_raw, temp, humidity):
-        """Predict irrigation need using input values."""
-        # Convert raw ADC (0–1023) to moisture percentage
-        moi = round((moi_raw / 1023) * 100, 2)
+    @staticmethod
+    def moisture_percent(moi_raw):
+        """Convert raw ADC (0–1023) to moisture percentage."""
+        return round((moi_raw / 1023) * 100, 2)
+
+    # -----------------------------------------
+    def predict(self, soil_type, stage, moi_raw, temp, humidity, rolling=None):
+        """Predict irrigation need using input values.
+
+        rolling: RollingFeatures values for MOI / temp / humidity; only used by
+        models trained with rolling features (cold-start values if omitted).
+        """
+        moi = self.moisture_percent(moi_raw)
+
+        # Precomputed decision table (mlops/lookup_table.py): O(1) array lookup
+        if self.lut is not None and not self.rolling:
+            return self.lut.predict(soil_type, stage, moi, temp, humidity), moi
 
         # Load model and processors if not in memory
         if self.model is None:
             self.model = joblib.load(self.model_file)
             self.scaler = joblib.load(self.scaler_file)
             self.encoders = joblib.load(self.encoder_file)
+            self.rolling = uses_rolling(self.scaler)
 
         data = pd.DataFrame([{
             "soil_type": soil_type,
@@ -132,13 +346,18 @@ class IrrigationModel:
             "temp": temp,
             "humidity": humidity
         }])
+        if self.rolling:
+            feats = cold_start({"MOI": moi, "temp": temp, "humidity": humidity})
+            feats.update(rolling or {})
+            for col in rolling_columns(self.ROLLING_COLUMNS):
+                data[col] = feats[col]
 
         # Encode categoricals
         for col in self.encoders:
             data[col] = self.encoders[col].transform(data[col])
 
         # Scale inputs
-        X_scaled = self.scaler.transform(data)
+        X_scaled = self.scaler.transform(data[self.feature_columns()])
 
         # Prediction output (0/1)
         pred = self.model.predict(X_scaled)[0]
@@ -149,6 +368,26 @@ class IrrigationModel:
 
         return pred, moi
 
+    # -----------------------------------------
+    def predict_batch(self, df, tracker=None):
+        """Batched predict() for logged rows (MOI already in %); -1 where a category is unknown.
+
+        tracker: RollingFeatures carried across chunks of one log (rolling models only).
+        """
+        if self.rolling:
+            df = add_rolling_features(df, self.ROLLING_COLUMNS, tracker=tracker)
+        known = np.ones(len(df), dtype=bool)
+        for col, encoder in self.encoders.items():
+            known &= df[col].isin(encoder.classes_).to_numpy()
+
+        preds = np.full(len(df), -1, dtype=np.int64)
+        if known.any():
+            data = df[known].copy()
+            for col in self.encoders:
+                data[col] = self.encoders[col].transform(data[col])
+            preds[known] = self.model.predict(self.scaler.transform(data[self.feature_columns()]))
+        return preds
+
     # -----------------------------------------
     def retrain(self):
         """Retrain model using updated CSV."""
@@ -159,6 +398,7 @@ class IrrigationModel:
     def train_from_csv(self, path):
         """Train from any CSV path (used by MLOps)."""
         self.dataset = path
+        self.live_dataset = None
         return self.train()
 
     # -----------------------------------------
@@ -179,16 +419,43 @@ class IrrigationModel:
 
     # -----------------------------------------
     @staticmethod
-    def load_current():
-        """Load the latest model for inference."""
-        BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        current_path = os.path.join(BASE_DIR, "models/irrigation/current")
+    def load_current(compact=False, lut=False, cascade=False):
+        """Load the latest model for inference (synced release if present)."""
+        current_path = active_dir("irrigation")
+        return IrrigationModel.load_dir(current_path, compact=compact, lut=lut, cascade=cascade)
 
+    # -----------------------------------------
+    @staticmethod
+    def load_dir(current_path, compact=False, lut=False, cascade=False):
+        """Load model + scaler + encoders from any artifact folder (used by the registry)."""
         model = joblib.load(os.path.join(current_path, "irrigation_model.pkl"))
+
+        # Reduced-set SVM (mlops/compact.py) — same predict(), fewer kernel evaluations
+        compact_path = os.path.join(current_path, "irrigation_model_compact.pkl")
+        if compact and os.path.exists(compact_path):
+            model = CompactSVC.from_dict(joblib.load(compact_path))
+        full_model = model
+
+        # Early-exit cascade (mlops/cascade.py): a linear first stage answers
+        # confident readings, the (exact or compact) SVC the rest
+        cascade_path = os.path.join(current_path, "irrigation_model_cascade.pkl")
+        if cascade and os.path.exists(cascade_path):
+            model = CascadeClassifier(LinearGate.from_dict(joblib.load(cascade_path)), model)
+
         scaler = joblib.load(os.path.join(current_path, "irrigation_scaler.pkl"))
         encoders = joblib.load(os.path.join(current_path, "irrigation_encoders.pkl"))
 
-        obj = IrrigationModel()
+        obj = IrrigationModel(rolling=uses_rolling(scaler))
+
+        # Post-hoc calibration (mlops/calibrate.py), fitted on the exact model's decisions
+        calibration_path = os.path.join(current_path, "irrigation_calibration.pkl")
+        if not isinstance(full_model, CompactSVC) and os.path.exists(calibration_path):
+            obj.calibrator = Calibrator.from_dict(joblib.load(calibration_path))
+
+        lut_path = os.path.join(current_path, "irrigation_lut.npz")
+        if lut and not obj.rolling and os.path.exists(lut_path):
+            obj.lut = IrrigationLUT.load(lut_path)
+
         obj.model = model
         obj.scaler = scaler
         obj.encoders = encoders
@@ -0,0 +1,413 @@
+"""
+Advisory generation: a fast rule/template engine plus the offline LLM.
+
+TemplateAdvisor turns the two model outputs and the raw readings into the
+same categories of guidance the LLM prompt asks for (irrigation, NPK balance,
+light, care plan) in microseconds. The LLM is optional: LLMBudget only lets
+it run while its observed latency fits a per-call budget and the device has
+enough free memory.
+
+The sensing loop never waits on the LLM: it hands the current state to an
+AdvisoryWorker and immediately gets back the advice cached for that state, or
+None (keep the template advice) while it is being generated. A background
+thread regenerates advice only when the discretised state changes (or the
+cached entry is older than its TTL), through a bounded queue that keeps only
+the newest pending request.
+"""
+import time
+import queue
+import logging
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+try:
+    from src.log_setup import configure_logging
+except ImportError:  # imported from inside src/ (edge scripts)
+    from log_setup import configure_logging
+
+# --------------------------
+# CONFIGURE LOGGING
+# --------------------------
+configure_logging()
+
+# Bin widths used to discretise continuous readings into a cache key
+DEFAULT_BINS = {
+    "moisture": 10.0,      # %
+    "temperature": 3.0,    # °C
+    "npk": 10.0,           # mg/kg
+}
+
+
+# Sensor thresholds used by the template engine
+DEFAULT_THRESHOLDS = {
+    "moisture_dry": 25.0,        # % below which soil is dry
+    "moisture_wet": 70.0,        # % above which soil is waterlogged
+    "temp_cold": 10.0,           # °C
+    "temp_hot": 35.0,            # °C
+    "humidity_low": 35.0,        # %
+    "humidity_high": 85.0,       # %
+    "light_low": 200.0,          # lux
+    "light_high": 1500.0,        # lux
+    "npk_low": 15.0,             # mg/kg, per nutrient
+    "npk_high": 45.0,            # mg/kg, per nutrient
+}
+
+
+# =========================================
+# STATE KEY
+# =========================================
+def _bin(value, width: float):
+    if value is None:
+        return None
+    return int(float(value) // width)
+
+
+def discretise_state(
+        irrigation_pred, plant_health, moisture, temperature,
+        nitrogen=None, phosphorus=None, potassium=None,
+        bins: Optional[Dict[str, float]] = None):
+    """Map a reading + predictions to a hashable key; nearby readings share a key."""
+    bins = {**DEFAULT_BINS, **(bins or {})}
+    return (
+        int(irrigation_pred),
+        str(plant_health),
+        _bin(moisture, bins["moisture"]),
+        _bin(temperature, bins["temperature"]),
+        _bin(nitrogen, bins["npk"]),
+        _bin(phosphorus, bins["npk"]),
+        _bin(potassium, bins["npk"]),
+    )
+
+
+# =========================================
+# CACHE
+# =========================================
+class AdvisoryCache:
+    """Small LRU of state key -> (advice, created_at) with a TTL."""
+
+    def __init__(self, ttl: float = 1800.0, max_entries: int = 256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._items: "OrderedDict[Tuple, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key) -> Optional[str]:
+        """Fresh advice for key, or None if missing/expired."""
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            advice, created = item
+            if time.monotonic() - created > self.ttl:
+                return None
+            self._items.move_to_end(key)
+            return advice
+
+    def put(self, key, advice: str) -> None:
+        with self._lock:
+            self._items[key] = (advice, time.monotonic())
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+    def __len__(self):
+        return len(self._items)
+
+
+# =========================================
+# TEMPLATE ADVISOR
+# =========================================
+class TemplateAdvisor:
+    """Deterministic rule/template advice from predictions + thresholds."""
+
+    def __init__(self, thresholds: Optional[Dict[str, float]] = None):
+        self.t = {**DEFAULT_THRESHOLDS, **(thresholds or {})}
+
+    # -----------------------------------------
+    def _irrigation(self, irrigation_pred, moisture, temperature, humidity) -> str:
+        t = self.t
+        if int(irrigation_pred) == 1:
+            msg = (f"Irrigate now: soil moisture is {moisture:.0f}%." if moisture is not None
+                   else "Irrigate now.")
+            if temperature is not None and temperature >= t["temp_hot"]:
+                msg += " Water early morning or evening to limit evaporation."
+            elif humidity is not None and humidity <= t["humidity_low"]:
+                msg += " Dry air increases water loss; mulch after watering."
+            return msg
+        if moisture is not None and moisture >= t["moisture_wet"]:
+            return f"Do not irrigate: soil is waterlogged ({moisture:.0f}%); check drainage."
+        if humidity is not None and humidity >= t["humidity_high"]:
+            return "No irrigation needed; high humidity, watch for fungal growth."
+        if moisture is not None and moisture <= t["moisture_dry"]:
+            return f"No irrigation needed yet, but soil is drying ({moisture:.0f}%); re-check soon."
+        return "No irrigation needed; soil moisture is adequate."
+
+    # -----------------------------------------
+    def _npk(self, nitrogen, phosphorus, potassium) -> str:
+        t = self.t
+        low, high = [], []
+        for name, value in (("nitrogen", nitrogen), ("phosphorus", phosphorus), ("potassium", potassium)):
+            if value is None:
+                continue
+            if value < t["npk_low"]:
+                low.append(name)
+            elif value > t["npk_high"]:
+                high.append(name)
+        if nitrogen is None and phosphorus is None and potassium is None:
+            return "NPK not measured; run a soil test before fertilising."
+        parts = []
+        if low:
+            parts.append("Apply fertiliser rich in " + ", ".join(low) + ".")
+        if high:
+            parts.append("Hold back on " + ", ".join(high) + "; levels are high.")
+        return " ".join(parts) if parts else "NPK levels are balanced."
+
+    # -----------------------------------------
+    def _light(self, light) -> str:
+        t = self.t
+        if light is None:
+            return "Light not measured."
+        if light < t["light_low"]:
+            return f"Low light ({light:.0f} lux): remove shading or add grow lights."
+        if light > t["light_high"]:
+            return f"Strong light ({light:.0f} lux): use shade net during midday."
+        return "Light level is suitable."
+
+    # -----------------------------------------
+    def _care_plan(self, plant_health, temperature) -> str:
+        status = str(plant_health).lower()
+        t = self.t
+        if "high" in status:
+            plan = ("Next 3-5 days: inspect leaves daily for wilting, pests and discolouration; "
+                    "correct water and nutrients first, then re-check health.")
+        elif "moderate" in status:
+            plan = ("Next 3-5 days: check plants every 2 days and keep moisture steady; "
+                    "watch for yellowing leaves.")
+        else:
+            plan = "Next 3-5 days: continue the current routine; plants are healthy."
+        if temperature is not None and temperature <= t["temp_cold"]:
+            plan += " Protect from cold at night (mulch or cover)."
+        elif temperature is not None and temperature >= t["temp_hot"]:
+            plan += " Heat stress risk: mulch to keep roots cool."
+        return plan
+
+    # -----------------------------------------
+    def advise(self, irrigation_pred, plant_health, moisture, temperature, humidity,
+               light, nitrogen=None, phosphorus=None, potassium=None) -> Dict[str, str]:
+        """Return advice sections: irrigation, npk, light, care_plan."""
+        return {
+            "irrigation": self._irrigation(irrigation_pred, moisture, temperature, humidity),
+            "npk": self._npk(nitrogen, phosphorus, potassium),
+            "light": self._light(light),
+            "care_plan": self._care_plan(plant_health, temperature),
+        }
+
+    @staticmethod
+    def render(sections: Dict[str, str]) -> str:
+        return " ".join(sections[k] for k in ("irrigation", "npk", "light", "care_plan"))
+
+
+# =========================================
+# LLM BUDGET
+# =========================================
+def available_memory_mb() -> Optional[float]:
+    """MemAvailable from /proc/meminfo, or None where it is not available."""
+    try:
+        with open("/proc/meminfo", "r") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    return None
+
+
+class LLMBudget:
+    """Decide whether an LLM call fits the latency budget and memory headroom.
+
+    The latency estimate is an EWMA of observed call times; until the first
+    call is measured it is `initial_estimate` (None = unknown, allowed once).
+    While the estimate is over budget one probe call is still allowed every
+    `reprobe_interval` seconds, so a single slow call (e.g. a cold first
+    generation) cannot switch the LLM off for good.
+    """
+
+    def __init__(self, latency_budget: float = 5.0, min_free_mb: float = 300.0,
+                 initial_estimate: Optional[float] = None, alpha: float = 0.3,
+                 reprobe_interval: float = 300.0):
+        self.latency_budget = latency_budget
+        self.min_free_mb = min_free_mb
+        self.estimate = initial_estimate
+        self.alpha = alpha
+        self.reprobe_interval = reprobe_interval
+        self.calls = 0
+        self.skipped = 0
+        self.probes = 0
+        self._last_allowed = time.monotonic()
+
+    def allows(self) -> bool:
+        now = time.monotonic()
+        if self.estimate is not None and self.estimate > self.latency_budget:
+            if now - self._last_allowed < self.reprobe_interval:
+                self.skipped += 1
+                return False
+            self.probes += 1
+        free = available_memory_mb()
+        if free is not None and free < self.min_free_mb:
+            self.skipped += 1
+            return False
+        self._last_allowed = now
+        return True
+
+    def record(self, seconds: float) -> None:
+        self.calls += 1
+        if self.estimate is None:
+            self.estimate = seconds
+        else:
+            self.estimate = self.alpha * seconds + (1 - self.alpha) * self.estimate
+
+    def wrap(self, generate: Callable[[str], str]) -> Callable[[str], str]:
+        """Return generate() that records its own latency into this budget."""
+        def timed(prompt: str) -> str:
+            start = time.perf_counter()
+            try:
+                return generate(prompt)
+            finally:
+                self.record(time.perf_counter() - start)
+
+        return timed
+
+
+class FastAdvisor:
+    """Template advice always; LLM advice only when the budget allows."""
+
+    def __init__(self, generate: Optional[Callable[[str], str]] = None,
+                 budget: Optional[LLMBudget] = None,
+                 thresholds: Optional[Dict[str, float]] = None):
+        self.templates = TemplateAdvisor(thresholds)
+        self.budget = budget or LLMBudget()
+        self.generate = self.budget.wrap(generate) if generate is not None else None
+
+    def advise(self, prompt: Optional[str] = None, **reading) -> Tuple[str, str]:
+        """Return (advice, source) where source is "template" or "llm"."""
+        text = self.templates.render(self.templates.advise(**reading))
+        if self.generate is None or prompt is None or not self.budget.allows():
+            return text, "template"
+        try:
+            return self.generate(prompt), "llm"
+        except Exception as e:
+            logging.error(f"LLM advisory failed, using template: {e}")
+            return text, "template"
+
+
+# =========================================
+# LLM GENERATOR
+# =========================================
+def make_llm_generator(tokenizer, model, max_length: int = 80) -> Callable[[str], str]:
+    """Wrap a HuggingFace seq2seq tokenizer/model pair as prompt -> text."""
+    def generate(prompt: str) -> str:
+        inputs = tokenizer(prompt, return_tensors="pt")
+        output = model.generate(**inputs, max_length=max_length)
+        return tokenizer.decode(output[0], skip_special_tokens=True)
+
+    return generate
+
+
+# =========================================
+# BACKGROUND WORKER
+# =========================================
+class AdvisoryWorker:
+    """Generate advice on a background thread; callers never block."""
+
+    def __init__(
+        self,
+        generate: Callable[[str], str],
+        ttl: float = 1800.0,
+        queue_size: int = 1,
+    ):
+        self.generate = generate
+        self.cache = AdvisoryCache(ttl=ttl)
+
+        self._queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self._pending = set()
+        self._pending_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="advisory-worker", daemon=True)
+
+        self.stats = {"requests": 0, "cache_hits": 0, "generated": 0, "dropped": 0, "errors": 0}
+
+    # -----------------------------------------
+    def start(self) -> "AdvisoryWorker":
+        self._thread.start()
+        return self
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        self._thread.join(timeout=timeout)
+
+    # -----------------------------------------
+    def request(self, key, prompt: str, generate: bool = True) -> Optional[str]:
+        """Return fresh advice cached for this state right away, else None.
+
+        On a miss a regeneration is queued (unless `generate` is False, e.g.
+        when LLMBudget refuses new work) and the caller keeps its own
+        (template) advice; advice generated for another state is never
+        returned. When the queue is full the oldest pending request is
+        replaced, so the worker always catches up to the newest state.
+        """
+        self.stats["requests"] += 1
+
+        cached = self.cache.get(key)
+        if cached is not None:
+            self.stats["cache_hits"] += 1
+            return cached
+        if not generate:
+            return None
+
+        with self._pending_lock:
+            if key in self._pending:
+                return None
+            try:
+                self._queue.put_nowait((key, prompt))
+            except queue.Full:
+                try:
+                    old_key, _ = self._queue.get_nowait()
+                    self._pending.discard(old_key)
+                    self.stats["dropped"] += 1
+                except queue.Empty:
+                    pass
+                self._queue.put_nowait((key, prompt))
+            self._pending.add(key)
+
+        return None
+
+    # -----------------------------------------
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                key, prompt = self._queue.get(timeout=0.2)
+            except queue.Empty:
+                continue
+
+            try:
+                advice = self.generate(prompt)
+                self.cache.put(key, advice)
+                self.stats["generated"] += 1
+            except Exception as e:
+                self.stats["errors"] += 1
+                logging.error(f"Advisory generation failed: {e}")
+            finally:
+                with self._pending_lock:
+                    self._pending.discard(key)
+
+    # -----------------------------------------
+    def wait_idle(self, timeout: float = 30.0) -> bool:
+        """Block until no request is pending (tests / shutdown)."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self._pending_lock:
+                if not self._pending:
+                    return True
+            time.sleep(0.01)
+        return False
@@ -1,30 +1,91 @@
+"""
+Field edge loop: sensors → irrigation + plant-health predictions → MQTT.
+
+Runs on the pipelined asyncio runtime (src/edge_runtime.py): sensor reads,
+inference and publishing are separate stages with their own deadlines, so a
+slow DHT read or a blocked publish no longer stalls the whole loop. Importing
+this module does not open hardware or connect to the broker; `main()` does.
+
+Usage:
+    python3 src/agriculture.py
+    python3 src/agriculture.py --simulate --no-mqtt --duration 120
+"""
+import sys
 import time
 import json
 import ssl
-import logging
 import random
-import os
-import paho.mqtt.client as mqtt
+import asyncio
+import logging
+import argparse
 
 # Local imports
-from npk_sensor import NPKSensor
-from sensors_ads import SensorADS
-from Irrigation_Model import IrrigationModel
-from plant_health import PlantHealthModel
+try:
+    from src.Irrigation_Model import IrrigationModel
+    from src.plant_health import PlantHealthModel
+    from src.rolling_features import RollingFeatures
+    from src.model_registry import ModelRegistry
+    from src.advisory import TemplateAdvisor
+    from src.scheduler import AdaptiveScheduler, Deadband, SignalPolicy
+    from src.edge_runtime import EdgeRuntime, StagePolicy
+    from src.log_setup import configure_logging
+except ImportError:  # run as a script from inside src/
+    from Irrigation_Model import IrrigationModel
+    from plant_health import PlantHealthModel
+    from rolling_features import RollingFeatures
+    from model_registry import ModelRegistry
+    from advisory import TemplateAdvisor
+    from scheduler import AdaptiveScheduler, Deadband, SignalPolicy
+    from edge_runtime import EdgeRuntime, StagePolicy
+    from log_setup import configure_logging
 
 # ======================================================
 # CONFIG
 # ======================================================
 USE_SIMULATION = False    # True = fake data, False = real sensors
 NPK_ENABLED = False       # Enable only if RS485 NPK sensor connected
+NPK_DEFAULT = (20, 15, 18)
+USE_CASCADE = False       # linear first stage answers confident readings (mlops/cascade.py)
+USE_LUT = False           # irrigation decision lookup table, if current/ has one (mlops/lookup_table.py)
+
+SOIL_TYPE = "Black Soil"
+GROWTH_STAGE = "Germination"
+
+# Adaptive cadence: interval bounds (s) + calm / fast rates of change (units/s)
+SIGNALS = {
+    "moisture": SignalPolicy(min_interval=5, max_interval=300, rate_low=0.5 / 3600, rate_high=5 / 600),
+    "temperature": SignalPolicy(min_interval=10, max_interval=300, rate_low=0.5 / 3600, rate_high=1 / 60),
+    "light": SignalPolicy(min_interval=10, max_interval=600, rate_low=100 / 3600, rate_high=100 / 60),
+    "npk": SignalPolicy(min_interval=60, max_interval=1800, rate_low=1 / 3600, rate_high=1 / 60),
+}
+# Reading fields filled by one read of each signal's sensor
+SIGNAL_FIELDS = {
+    "moisture": ("soil_moisture",),
+    "temperature": ("temperature", "humidity"),     # one DHT11 read
+    "light": ("light",),
+    "npk": ("nitrogen", "phosphorus", "potassium"),
+}
+# MQTT publish only on changes beyond these bands (predictions: any change)
+DEADBAND = {"temperature": 0.5, "humidity": 2.0, "moisture": 1.0, "light": 50,
+            "nitrogen": 2, "phosphorus": 2, "potassium": 2}
+HEARTBEAT = 300           # seconds between publishes even when nothing changed
+
+# Per-stage deadlines (s); stale readings are dropped instead of published late
+STAGE_POLICIES = {
+    "acquire": StagePolicy(deadline=6.0),                          # DHT11 retries included
+    "predict": StagePolicy(deadline=2.0, queue_size=2, max_age=30.0),
+    "publish": StagePolicy(deadline=5.0, queue_size=8, max_age=120.0),
+}
 
 # ======================================================
 # LOGGING
 # ======================================================
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s"
-)
+configure_logging()
+LOG_FILE = "logs/field_edge.jsonl"   # structured, rotating (src/log_setup.py)
+
+# Per-reading lines go through rate-limited "edge.*" loggers
+predict_log = logging.getLogger("edge.predict")
+publish_log = logging.getLogger("edge.publish")
 
 # ======================================================
 # MQTT SETTINGS
@@ -37,194 +98,271 @@ PASSWORD = "!A5PgmOd1MS$<7z9X#bf"
 TOPIC_SENSOR = "agriedge/sensor"
 TOPIC_ADVICE = "agriedge/advice"
 
+
 # ======================================================
-# SENSOR SETUP
+# SENSORS
 # ======================================================
-if not USE_SIMULATION:
-    sensor = SensorADS()   # ADS1115 + DHT11 wrapper
+def signals_to_read(due, last):
+    """Signals to sample now: the due ones (all if None), plus any never read yet."""
+    return [name for name, fields in SIGNAL_FIELDS.items()
+            if due is None or name in due or fields[0] not in last]
+
+
+class SimulatedSensors:
+    """Random readings in realistic ranges (no hardware needed).
+
+    Like FieldSensors, only the due signals get new values; the rest keep
+    their last reading.
+    """
+
+    def __init__(self):
+        self.last = {}
+
+    def read(self, due=None):
+        for name in signals_to_read(due, self.last):
+            if name == "temperature":
+                self.last["temperature"] = round(random.uniform(22, 29), 2)
+                self.last["humidity"] = round(random.uniform(40, 70), 2)
+            elif name == "moisture":
+                self.last["soil_moisture"] = round(random.uniform(10, 75), 2)
+            elif name == "light":
+                self.last["light"] = random.randint(200, 900)
+            elif name == "npk":
+                self.last["nitrogen"] = random.randint(10, 40)
+                self.last["phosphorus"] = random.randint(10, 40)
+                self.last["potassium"] = random.randint(10, 40)
+        return dict(self.last)
+
+
+class FieldSensors:
+    """ADS1115 + DHT11 wrapper, plus the optional RS485 NPK probe.
+
+    read(due) touches only the sensors of the due signals (the DHT11 alone
+    can take seconds with retries); the others keep their last value.
+    """
+
+    def __init__(self, npk_enabled=NPK_ENABLED):
+        from sensors_ads import SensorADS
+        self.sensor = SensorADS()
+        self.npk = None
+        if npk_enabled:
+            from npk_sensor import NPKSensor
+            self.npk = NPKSensor(port="/dev/ttyS0", slave_id=1)
+        self.last = {}
+
+    def read(self, due=None):
+        for name in signals_to_read(due, self.last):
+            if name == "temperature":
+                self.last["temperature"], self.last["humidity"] = self.sensor.get_dht()
+                # Simulated DHT fallback values: dropped by src/data_quality.py before training
+                self.last["dht_imputed"] = bool(self.sensor.dht_imputed)
+            elif name == "moisture":
+                self.last["soil_moisture"] = self.sensor.get_moisture()
+            elif name == "light":
+                self.last["light"] = self.sensor.get_lux()
+            elif name == "npk":
+                nitrogen, phosphorus, potassium = self.npk.read_npk() if self.npk else NPK_DEFAULT
+                if nitrogen is None:
+                    nitrogen, phosphorus, potassium = NPK_DEFAULT
+                self.last.update(nitrogen=nitrogen, phosphorus=phosphorus, potassium=potassium)
+        return dict(self.last)
 
-    if NPK_ENABLED:
-        npk = NPKSensor(port="/dev/ttyS0", slave_id=1)
 
-# ======================================================
-# MQTT CLIENT INITIALIZATION
-# ======================================================
-client = mqtt.Client()
-client.username_pw_set(USERNAME, PASSWORD)
-client.tls_set(cert_reqs=ssl.CERT_REQUIRED, tls_version=ssl.PROTOCOL_TLSv1_2)
+def signal_values(reading):
+    """Scheduler signals from one reading (moisture as %, like the model sees it)."""
+    return {
+        "moisture": IrrigationModel.moisture_percent(reading["soil_moisture"]),
+        "temperature": reading["temperature"],
+        "light": reading["light"],
+        "npk": reading["nitrogen"],
+    }
 
-logging.info("Connecting to HiveMQ Cloud...")
-client.connect(MQTT_BROKER, MQTT_PORT, keepalive=60)
-client.loop_start()
-logging.info("MQTT Connected and Publishing Enabled.")
 
 # ======================================================
-# LOAD ML MODELS WITH CORRECT PATH
+# MQTT
 # ======================================================
-logging.info("Loading ML models...")
+def connect_mqtt():
+    import paho.mqtt.client as mqtt
 
-# FIXED PATHS → do NOT pass simple file names
-irrigation_model = IrrigationModel("data/irrigation.csv")
-irrigation_model.train()
+    client = mqtt.Client()
+    client.username_pw_set(USERNAME, PASSWORD)
+    client.tls_set(cert_reqs=ssl.CERT_REQUIRED, tls_version=ssl.PROTOCOL_TLSv1_2)
 
-plant_model = PlantHealthModel("data/plant_health_data.csv")
-plant_model.train()
+    logging.info("Connecting to HiveMQ Cloud...")
+    client.connect(MQTT_BROKER, MQTT_PORT, keepalive=60)
+    client.loop_start()
+    logging.info("MQTT Connected and Publishing Enabled.")
+    return client
 
-logging.info("Irrigation & Plant Health Models Loaded Successfully.")
 
-# ======================================================
-# LLM DISABLED (COMMENTED OUT SAFELY)
-# ======================================================
+class LogClient:
+    """Stand-in for the MQTT client that only logs (offline / simulation runs)."""
 
-"""
-from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
+    def publish(self, topic, payload):
+        publish_log.info("[%s] %s", topic, payload)
 
-logging.info("Loading Hugging Face flan-t5-small...")
+    def loop_stop(self):
+        pass
 
-model_name = "google/flan-t5-small"
-tokenizer = AutoTokenizer.from_pretrained(model_name)
-hf_model = AutoModelForSeq2SeqLM.from_pretrained(model_name).to("cpu")
+    def disconnect(self):
+        pass
 
-logging.info("LLM Loaded Successfully.")
-"""
 
 # ======================================================
-# MAIN LOOP
+# PREDICT + PUBLISH STAGES
 # ======================================================
-logging.info("System Running...")
+class FieldPredictor:
+    """Both models for this field, from the registry (segment model if one exists).
+
+    Rolling features are tracked for every reading, whether or not the loaded
+    models use them, so a hot-swapped rolling model starts with warm history.
+    """
+
+    def __init__(self, registry, soil_type=SOIL_TYPE, stage=GROWTH_STAGE):
+        self.registry = registry
+        self.soil_type = soil_type
+        self.stage = stage
+        self.rolling = {
+            "irrigation": RollingFeatures(IrrigationModel.ROLLING_COLUMNS),
+            "plant_health": RollingFeatures(PlantHealthModel.ROLLING_COLUMNS),
+        }
 
-while True:
-    try:
-        # ---------------------------------------------------
-        # SENSOR READINGS
-        # ---------------------------------------------------
-        if USE_SIMULATION:
-            temperature = round(random.uniform(22, 29), 2)
-            humidity = round(random.uniform(40, 70), 2)
-            soil_moisture = round(random.uniform(10, 75), 2)
-            light = random.randint(200, 900)
-            nitrogen = random.randint(10, 40)
-            phosphorus = random.randint(10, 40)
-            potassium = random.randint(10, 40)
-
-        else:
-            readings = sensor.read_all()
-            temperature = readings["temperature"]
-            humidity = readings["humidity"]
-            soil_moisture = readings["moi"]
-            light = readings["lux"]
-
-            if NPK_ENABLED:
-                nitrogen, phosphorus, potassium = npk.read_npk()
-                if nitrogen is None:
-                    nitrogen, phosphorus, potassium = 20, 15, 18
-            else:
-                nitrogen, phosphorus, potassium = 20, 15, 18
+    def load(self):
+        self.registry.get("irrigation", soil=self.soil_type, stage=self.stage)
+        self.registry.get("plant_health", soil=self.soil_type, stage=self.stage)
+        logging.info("Irrigation & Plant Health Models Loaded Successfully.")
+        return self
+
+    def __call__(self, reading):
+        irrigation_model = self.registry.get("irrigation", soil=self.soil_type, stage=self.stage)
+        plant_model = self.registry.get("plant_health", soil=self.soil_type, stage=self.stage)
 
-        # ---------------------------------------------------
-        # ML MODEL PREDICTIONS
-        # ---------------------------------------------------
-        soil_type = "Black Soil"
-        stage = "Germination"
+        now = time.time()
+        moisture = IrrigationModel.moisture_percent(reading["soil_moisture"])
+        irrigation_rolling = self.rolling["irrigation"].update(
+            {"MOI": moisture, "temp": reading["temperature"], "humidity": reading["humidity"]}, now)
+        plant_rolling = self.rolling["plant_health"].update(
+            {"Soil_Moisture": moisture, "Ambient_Temperature": reading["temperature"],
+             "Humidity": reading["humidity"], "Light_Intensity": reading["light"]}, now)
 
         irrigation_pred, moisture_percent = irrigation_model.predict(
-            soil_type=soil_type,
-            stage=stage,
-            moi_raw=soil_moisture,
-            temp=temperature,
-            humidity=humidity
+            soil_type=self.soil_type,
+            stage=self.stage,
+            moi_raw=reading["soil_moisture"],
+            temp=reading["temperature"],
+            humidity=reading["humidity"],
+            rolling=irrigation_rolling
         )
 
         plant_pred = plant_model.predict(
             soil_moisture=moisture_percent,
-            temp=temperature,
-            humidity=humidity,
-            light=light,
-            nitrogen=nitrogen,
-            phosphorus=phosphorus,
-            potassium=potassium
+            temp=reading["temperature"],
+            humidity=reading["humidity"],
+            light=reading["light"],
+            nitrogen=reading["nitrogen"],
+            phosphorus=reading["phosphorus"],
+            potassium=reading["potassium"],
+            rolling=plant_rolling
         )
 
-        logging.info(f"Irrigation Need: {irrigation_pred}")
-        logging.info(f"Plant Health: {plant_pred}")
+        predict_log.info("Irrigation Need: %s", irrigation_pred)
+        predict_log.info("Plant Health: %s", plant_pred)
+        return {**reading, "moisture": moisture_percent,
+                "irrigation_prediction": int(irrigation_pred),
+                "plant_health_prediction": str(plant_pred)}
 
-        # ---------------------------------------------------
-        # MQTT PUBLISH
-        # ---------------------------------------------------
-        payload = {
-            "temperature": float(temperature),
-            "humidity": float(humidity),
-            "moisture": float(moisture_percent),
-            "light": int(light),
-            "nitrogen": int(nitrogen),
-            "phosphorus": int(phosphorus),
-            "potassium": int(potassium),
-            "irrigation_prediction": int(irrigation_pred),
-            "plant_health_prediction": str(plant_pred),
-            "timestamp": float(time.time())
-        }
 
-        client.publish(TOPIC_SENSOR, json.dumps(payload))
-        logging.info("MQTT Published Sensor Data")
-        logging.info("---------------------------")
-
-    except Exception as e:
-        logging.error(f"Error: {e}")
-
-    time.sleep(10)
-        # ---------------------------------------------------
-        # LLM ADVICE
-        # ---------------------------------------------------
-        prompt = f"""
-You are an agricultural expert AI system.
-
-Sensor Inputs:
-- Soil Type: {soil_type}
-- Growth Stage: {stage}
-- Soil Moisture: {moisture_percent}
-- Temperature: {temperature}
-- Humidity: {humidity}
-- Light: {light}
-- Nitrogen: {nitrogen}
-- Phosphorus: {phosphorus}
-- Potassium: {potassium}
-
-ML Predictions:
-- Irrigation Required (0/1): {irrigation_pred}
-- Plant Health: {plant_pred}
-
-Generate detailed guidance for irrigation, plant health, NPK balance, shade/light corrections, next 3–5 day care plan, warning signs, and prevention.
-"""
+def prediction_labels(result):
+    return {"irrigation": result["irrigation_prediction"],
+            "plant_health": result["plant_health_prediction"]}
 
-        #inputs = tokenizer(prompt, return_tensors="pt")
-        #outputs = hf_model.generate(**inputs, max_length=250)
-        #advice = tokenizer.decode(outputs[0], skip_special_tokens=True)
 
-        # ---------------------------------------------------
-        # MQTT PUBLISH
-        # ---------------------------------------------------
+class Publisher:
+    """Deadband-gated MQTT publish of readings + template advice."""
+
+    def __init__(self, client, gate, advisor=None):
+        self.client = client
+        self.gate = gate
+        self.advisor = advisor or TemplateAdvisor()
+
+    def __call__(self, result):
         payload = {
-            "temperature": float(temperature),
-            "humidity": float(humidity),
-            "moisture": float(moisture_percent),
-            "light": int(light),
-            "nitrogen": int(nitrogen),
-            "phosphorus": int(phosphorus),
-            "potassium": int(potassium),
-            "irrigation_prediction": int(irrigation_pred),
-            "plant_health_prediction": str(plant_pred),
+            "temperature": float(result["temperature"]),
+            "humidity": float(result["humidity"]),
+            "moisture": float(result["moisture"]),
+            "light": int(result["light"]),
+            "nitrogen": int(result["nitrogen"]),
+            "phosphorus": int(result["phosphorus"]),
+            "potassium": int(result["potassium"]),
+            "irrigation_prediction": result["irrigation_prediction"],
+            "plant_health_prediction": result["plant_health_prediction"],
+            "dht_imputed": bool(result.get("dht_imputed", False)),
             "timestamp": float(time.time())
         }
 
-        client.publish(TOPIC_SENSOR, json.dumps(payload))
-        #client.publish(TOPIC_ADVICE, str(advice))
+        # Skip the uplink when nothing moved beyond the deadband
+        if not self.gate.should_publish(payload):
+            return False
+
+        advice = self.advisor.render(self.advisor.advise(
+            payload["irrigation_prediction"], payload["plant_health_prediction"],
+            payload["moisture"], payload["temperature"], payload["humidity"], payload["light"],
+            payload["nitrogen"], payload["phosphorus"], payload["potassium"],
+        ))
+        self.client.publish(TOPIC_SENSOR, json.dumps(payload))
+        self.client.publish(TOPIC_ADVICE, advice)
+        publish_log.info("MQTT Published Sensor Data + Advice")
+        publish_log.info("---------------------------")
+        return True
+
 
-        logging.info("MQTT Published Sensor Data + Advice")
-        logging.info("---------------------------")
-        #logging.info(advice)
-        logging.info("---------------------------")
+# ======================================================
+# RUNTIME
+# ======================================================
+def build_runtime(sensors, client, registry=None, policies=None, signals=None, cascade=USE_CASCADE,
+                  lut=USE_LUT):
+    """Wire sensors, models and publisher into an EdgeRuntime (no I/O until run)."""
+    predictor = FieldPredictor(registry or ModelRegistry(cascade=cascade, lut=lut)).load()
+    return EdgeRuntime(
+        acquire=sensors.read,
+        predict=predictor,
+        publish=Publisher(client, Deadband(DEADBAND, heartbeat=HEARTBEAT)),
+        scheduler=AdaptiveScheduler(signals or SIGNALS),
+        signals=signal_values,
+        predictions=prediction_labels,
+        policies=policies or STAGE_POLICIES,
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Field edge loop (sensors → models → MQTT).")
+    parser.add_argument("--simulate", action="store_true", default=USE_SIMULATION,
+                        help="use random readings instead of the sensors")
+    parser.add_argument("--no-mqtt", action="store_true", help="log payloads instead of publishing")
+    parser.add_argument("--duration", type=float, help="stop after this many seconds")
+    parser.add_argument("--cascade", action="store_true", default=USE_CASCADE,
+                        help="early-exit cascade: full SVM only for unconfident readings")
+    parser.add_argument("--lut", action="store_true", default=USE_LUT,
+                        help="irrigation decisions from the precomputed lookup table")
+    parser.add_argument("--log-file", default=LOG_FILE, help="rotating JSON-lines log ('' = console only)")
+    args = parser.parse_args(argv)
+
+    configure_logging(log_file=args.log_file or None, force=True)
+
+    sensors = SimulatedSensors() if args.simulate else FieldSensors()
+    client = LogClient() if args.no_mqtt else connect_mqtt()
+
+    logging.info("Loading ML models...")
+    runtime = build_runtime(sensors, client, cascade=args.cascade, lut=args.lut)
+
+    logging.info("System Running...")
+    try:
+        asyncio.run(runtime.run(duration=args.duration))
+    finally:
+        client.loop_stop()
+        client.disconnect()
+    return 0
 
-    except Exception as e:
-        logging.error(f"Error: {e}")
 
-    time.sleep(10)
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,330 @@
+"""
+Deduplicated, compressed batch upload of live sensor rows.
+
+The edge loop (raspberry_pi/inference_loop.py) records every logged reading
+in the sensor history (src/history_log.py, `data/history/`). Instead of
+pushing the history or whole CSVs every hour, the uploader:
+
+1. Reads new records from a high-water mark: the newest history timestamp
+   already handled (HistoryReader range query), and for any extra CSV passed
+   on the command line the byte offset of the last complete line (a
+   truncated or replaced file restarts at 0). History records are mapped to
+   the training schema of each dataset (`HISTORY_SCHEMAS`).
+2. Hashes every new row (content only) and drops rows already sent — from
+   this file, an overlapping copy, or a rewrite.
+3. Packs the remaining rows into a columnar, zlib-compressed `.npz` batch named
+   by the hash of its rows, so re-packing the same rows yields the same file.
+4. Spools the batch to a local outbox before committing the new offset and
+   hashes, then copies outbox batches to the destination with retries.
+
+A crash at any point either resends an identical batch or re-reads rows that
+will hash to the same batch — the server-side merger
+(mlops/merge_batches.py) folds batches in idempotently.
+
+Usage:
+    python3 src/batch_upload.py                         # history → data/batches/
+    python3 src/batch_upload.py --dest /mnt/share/batches
+    python3 src/batch_upload.py data/new_irrigation.csv # also backfill an old CSV
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import logging
+import argparse
+from io import StringIO
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+try:
+    from src.history_log import DEFAULT_HISTORY_DIR, HistoryReader
+    from src.log_setup import configure_logging
+except ImportError:  # imported from inside src/ (edge scripts)
+    from history_log import DEFAULT_HISTORY_DIR, HistoryReader
+    from log_setup import configure_logging
+
+# --------------------------
+# CONFIGURE LOGGING
+# --------------------------
+configure_logging()
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Training-set column -> field of the history records written by the edge loop.
+# Labels are the edge model's own decisions at the time of the reading.
+HISTORY_SCHEMAS = {
+    "irrigation": {
+        "timestamp": "timestamp",
+        "soil_type": "soil_type",
+        "Seedling Stage": "stage",
+        "MOI": "soil_moisture",
+        "temp": "temperature",
+        "humidity": "humidity",
+        "result": "irrigation_needed",
+        "dht_imputed": "dht_imputed",
+    },
+    "plant_health": {
+        "timestamp": "timestamp",
+        "Soil_Moisture": "soil_moisture",
+        "Ambient_Temperature": "temperature",
+        "Humidity": "humidity",
+        "Light_Intensity": "light",
+        "Nitrogen_Level": "n",
+        "Phosphorus_Level": "p",
+        "Potassium_Level": "k",
+        "Plant_Health_Status": "plant_health",
+        "dht_imputed": "dht_imputed",
+    },
+}
+HISTORY_MARK = "history:"      # offsets key prefix for a history root
+
+DEFAULT_DEST = "data/batches"
+STATE_DIR = "data/upload_state"
+
+MAX_BATCH_ROWS = 50_000
+MAX_SEEN = 500_000          # row hashes remembered on the device (8 bytes each)
+RETRIES = 5
+BACKOFF = 2.0               # seconds, doubled per attempt
+
+HASH_COLUMN = "__row_hash"
+COLUMNS_KEY = "__columns"
+DATASET_KEY = "__dataset"
+
+
+# =========================================
+# ROWS + BATCHES
+# =========================================
+def dataset_name(path: str) -> str:
+    """new_irrigation.csv → irrigation"""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return stem[4:] if stem.startswith("new_") else stem
+
+
+def history_rows(records: List[Dict], dataset: str) -> pd.DataFrame:
+    """History records → rows in the dataset's training schema.
+
+    Records missing the label or any input of the dataset are skipped (e.g.
+    readings taken before the NPK probe answered).
+    """
+    schema = HISTORY_SCHEMAS[dataset]
+    df = pd.DataFrame([{col: rec.get(field) for col, field in schema.items()} for rec in records],
+                      columns=list(schema))
+    if "dht_imputed" in df.columns:
+        df["dht_imputed"] = df["dht_imputed"].fillna(False).astype(bool)
+    required = [c for c in df.columns if c != "dht_imputed"]
+    return df.dropna(subset=required).reset_index(drop=True)
+
+
+def csv_lines(df: pd.DataFrame) -> List[str]:
+    """One CSV line per row (the text the row hash is computed over)."""
+    return df.to_csv(index=False, header=False, lineterminator="\n").splitlines()
+
+
+def row_hashes(lines) -> np.ndarray:
+    """Content hash per row (uint64) of the normalised CSV line text.
+
+    Hashing the text rather than parsed values keeps the hash stable across
+    files and reads where pandas may infer different dtypes.
+    """
+    return pd.util.hash_array(np.asarray(lines, dtype=object)).astype(np.uint64)
+
+
+def batch_id(dataset: str, hashes: np.ndarray) -> str:
+    return f"{dataset}-{hashlib.sha256(hashes.tobytes()).hexdigest()[:16]}"
+
+
+def pack_batch(path: str, dataset: str, df: pd.DataFrame, hashes: np.ndarray) -> None:
+    """Columnar compressed batch: one array per column + row hashes."""
+    arrays = {f"col:{c}": (df[c].to_numpy() if pd.api.types.is_numeric_dtype(df[c])
+                           else df[c].astype(str).to_numpy(dtype=str))
+              for c in df.columns}
+    tmp = f"{path}.tmp-{os.getpid()}.npz"
+    np.savez_compressed(tmp, **arrays, **{HASH_COLUMN: hashes,
+                                          COLUMNS_KEY: np.array(list(df.columns), dtype=str),
+                                          DATASET_KEY: np.array(dataset)})
+    os.replace(tmp, path)
+
+
+def read_batch(path: str):
+    """(dataset, DataFrame, row hashes) from a batch file."""
+    with np.load(path, allow_pickle=False) as data:
+        columns = data[COLUMNS_KEY].tolist()
+        df = pd.DataFrame({c: data[f"col:{c}"] for c in columns}, columns=columns)
+        return str(data[DATASET_KEY]), df, data[HASH_COLUMN]
+
+
+# =========================================
+# UPLOADER
+# =========================================
+class BatchUploader:
+    """High-water-mark + row-hash deduplicating uploader with a local outbox."""
+
+    def __init__(self, dest: str = DEFAULT_DEST, state_dir: str = STATE_DIR,
+                 max_seen: int = MAX_SEEN):
+        self.dest = dest if os.path.isabs(dest) else os.path.join(BASE_DIR, dest)
+        self.state_dir = state_dir if os.path.isabs(state_dir) else os.path.join(BASE_DIR, state_dir)
+        self.outbox = os.path.join(self.state_dir, "outbox")
+        self.max_seen = max_seen
+        os.makedirs(self.outbox, exist_ok=True)
+
+        self._state_file = os.path.join(self.state_dir, "offsets.json")
+        self._seen_file = os.path.join(self.state_dir, "seen.npy")
+        self.offsets: Dict[str, Dict] = {}
+        if os.path.exists(self._state_file):
+            with open(self._state_file, "r") as f:
+                self.offsets = json.load(f)
+        self.seen = (np.load(self._seen_file) if os.path.exists(self._seen_file)
+                     else np.empty(0, dtype=np.uint64))
+
+    # -----------------------------------------
+    def _commit(self) -> None:
+        """Persist offsets + seen hashes (each written atomically)."""
+        if len(self.seen) > self.max_seen:
+            self.seen = self.seen[-self.max_seen:]
+        tmp = f"{self._seen_file}.tmp.npy"
+        np.save(tmp, self.seen)
+        os.replace(tmp, self._seen_file)
+
+        tmp = f"{self._state_file}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.offsets, f, indent=2)
+        os.replace(tmp, self._state_file)
+
+    def _read_new(self, path: str):
+        """Complete lines after the high-water mark → (DataFrame, lines, new offset, inode)."""
+        st = os.stat(path)
+        mark = self.offsets.get(path, {})
+        offset = mark.get("offset", 0)
+        if mark.get("inode") != st.st_ino or st.st_size < offset:
+            offset = 0   # rotated / truncated: start over, hashes skip what was sent
+
+        with open(path, "rb") as f:
+            header = f.readline()
+            offset = max(offset, len(header))
+            f.seek(offset)
+            chunk = f.read()
+
+        end = chunk.rfind(b"\n") + 1   # leave a partially written last line for next time
+        lines = [ln.strip() for ln in chunk[:end].decode("utf-8").splitlines()]
+        lines = [ln for ln in lines if ln]
+        if not lines:
+            return None, None, offset + end, st.st_ino
+        df = pd.read_csv(StringIO("\n".join([header.decode("utf-8").strip()] + lines)))
+        return df, lines, offset + end, st.st_ino
+
+    def _spool(self, dataset: str, df: pd.DataFrame, lines: List[str], stats: Dict[str, int]) -> None:
+        """Drop rows already sent and pack the rest into outbox batches."""
+        hashes = row_hashes(lines)
+        # Unseen and not repeated within this read
+        _, first = np.unique(hashes, return_index=True)
+        keep = np.zeros(len(df), dtype=bool)
+        keep[first] = True
+        keep &= ~np.isin(hashes, self.seen)
+
+        stats["read"] += len(df)
+        stats["duplicates"] += int((~keep).sum())
+        df, hashes = df[keep].reset_index(drop=True), hashes[keep]
+
+        for i in range(0, len(df), MAX_BATCH_ROWS):
+            part, part_hashes = df.iloc[i:i + MAX_BATCH_ROWS], hashes[i:i + MAX_BATCH_ROWS]
+            name = batch_id(dataset, part_hashes) + ".npz"
+            pack_batch(os.path.join(self.outbox, name), dataset, part, part_hashes)
+            stats["spooled"] += len(part)
+            stats["batches"] += 1
+        self.seen = np.concatenate([self.seen, hashes])
+
+    def collect(self, sources) -> Dict[str, int]:
+        """Spool new, unseen rows from every CSV source into the outbox."""
+        stats = {"read": 0, "duplicates": 0, "spooled": 0, "batches": 0}
+        for rel in sources:
+            path = rel if os.path.isabs(rel) else os.path.join(BASE_DIR, rel)
+            if not os.path.exists(path):
+                continue
+            df, lines, offset, inode = self._read_new(path)
+            if df is not None:
+                self._spool(dataset_name(path), df, lines, stats)
+
+            # Outbox is durable before the high-water mark moves
+            self.offsets[path] = {"offset": offset, "inode": inode}
+            self._commit()
+        return stats
+
+    def collect_history(self, root: str = DEFAULT_HISTORY_DIR,
+                        stats: Optional[Dict[str, int]] = None) -> Dict[str, int]:
+        """Spool history records newer than the last run as rows of every dataset."""
+        stats = stats if stats is not None else {"read": 0, "duplicates": 0, "spooled": 0, "batches": 0}
+        key = HISTORY_MARK + os.path.abspath(root)
+        mark = self.offsets.get(key, {}).get("ts")
+        records = [r for r in HistoryReader(root).read_range(mark, None)
+                   if mark is None or r["ts"] > mark]
+        if not records:
+            return stats
+
+        for dataset in HISTORY_SCHEMAS:
+            df = history_rows(records, dataset)
+            if not df.empty:
+                self._spool(dataset, df, csv_lines(df), stats)
+
+        self.offsets[key] = {"ts": max(r["ts"] for r in records)}
+        self._commit()
+        return stats
+
+    def send(self, retries: int = RETRIES, backoff: float = BACKOFF) -> Dict[str, int]:
+        """Copy outbox batches to the destination; failed ones stay for the next run."""
+        os.makedirs(self.dest, exist_ok=True)
+        stats = {"sent": 0, "bytes": 0, "failed": 0}
+        for name in sorted(os.listdir(self.outbox)):
+            if not name.endswith(".npz") or ".tmp-" in name:
+                continue
+            src = os.path.join(self.outbox, name)
+            for attempt in range(retries):
+                try:
+                    tmp = os.path.join(self.dest, f".{name}.part")
+                    shutil.copyfile(src, tmp)
+                    os.replace(tmp, os.path.join(self.dest, name))
+                    stats["sent"] += 1
+                    stats["bytes"] += os.path.getsize(src)
+                    os.remove(src)
+                    break
+                except OSError as exc:
+                    logging.warning(f"Upload of {name} failed (attempt {attempt + 1}): {exc}")
+                    time.sleep(backoff * (2 ** attempt))
+            else:
+                stats["failed"] += 1
+        return stats
+
+    def run(self, sources=(), history: Optional[str] = DEFAULT_HISTORY_DIR) -> Dict[str, int]:
+        stats = self.collect(sources)
+        if history is not None:
+            self.collect_history(history, stats)
+        stats.update(self.send())
+        logging.info(
+            f"Upload: {stats['read']} new rows, {stats['duplicates']} duplicates skipped, "
+            f"{stats['sent']} batches sent ({stats['bytes'] / 1024:.1f} KB), {stats['failed']} pending"
+        )
+        return stats
+
+
+# =========================================
+# CLI
+# =========================================
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Upload new sensor rows as deduplicated batches.")
+    parser.add_argument("sources", nargs="*", help="extra CSVs to upload (e.g. an old data/new_irrigation.csv)")
+    parser.add_argument("--history", default=DEFAULT_HISTORY_DIR, help="sensor history root")
+    parser.add_argument("--no-history", action="store_true", help="upload only the given CSVs")
+    parser.add_argument("--dest", default=DEFAULT_DEST, help="destination batch folder")
+    parser.add_argument("--state-dir", default=STATE_DIR)
+    args = parser.parse_args(argv)
+
+    history = None if args.no_history else args.history
+    stats = BatchUploader(args.dest, args.state_dir).run(args.sources, history)
+    return 1 if stats["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
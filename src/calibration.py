@@ -0,0 +1,61 @@
+"""
+Post-hoc probability calibration for the SVC models.
+
+`SVC(probability=True)` makes libsvm run an extra internal 5-fold
+cross-validation at fit time just to learn Platt scaling, although the edge
+code only calls predict(). The models can now be trained without it, and a
+Calibrator is fitted separately on a held-out split instead:
+
+- binary: Platt scaling, p(classes_[1]) = sigmoid(a * f(x) + b)
+- multiclass: multinomial logistic regression on the one-vs-rest decision
+  values (sklearn's default decision_function shape)
+
+It maps the exact SVC's decision_function output to class probabilities and
+is stored as a plain dict of NumPy arrays (`*_calibration.pkl`) next to the
+model, so loading it needs no custom pickled class.
+"""
+from typing import Dict
+
+import numpy as np
+
+
+class Calibrator:
+    """Maps SVC decision values to calibrated class probabilities."""
+
+    def __init__(self, coef, intercept, classes):
+        self.coef = np.asarray(coef, dtype=np.float64)            # (k, d)
+        self.intercept = np.asarray(intercept, dtype=np.float64)  # (k,)
+        self.classes_ = np.asarray(classes)
+
+    # -----------------------------------------
+    @classmethod
+    def fit(cls, decisions, y, classes, C: float = 1e4) -> "Calibrator":
+        """Fit on held-out decision values; large C ≈ unregularised Platt scaling."""
+        from sklearn.linear_model import LogisticRegression
+
+        D = np.asarray(decisions, dtype=np.float64).reshape(len(y), -1)
+        lr = LogisticRegression(C=C, max_iter=1000).fit(D, y)
+        # Keep the column order of `classes` (the SVC's classes_)
+        order = [list(lr.classes_).index(c) for c in classes] if len(classes) > 2 else None
+        coef = lr.coef_ if order is None else lr.coef_[order]
+        intercept = lr.intercept_ if order is None else lr.intercept_[order]
+        return cls(coef, intercept, classes)
+
+    def predict_proba(self, decisions) -> np.ndarray:
+        D = np.asarray(decisions, dtype=np.float64)
+        D = D.reshape(len(D), -1)
+        z = D @ self.coef.T + self.intercept
+        if len(self.classes_) == 2:
+            p1 = 1.0 / (1.0 + np.exp(-z[:, 0]))
+            return np.column_stack([1.0 - p1, p1])
+        z -= z.max(axis=1, keepdims=True)
+        e = np.exp(z)
+        return e / e.sum(axis=1, keepdims=True)
+
+    # -----------------------------------------
+    def to_dict(self) -> Dict:
+        return {"coef": self.coef, "intercept": self.intercept, "classes": self.classes_}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Calibrator":
+        return cls(**data)
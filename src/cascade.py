@@ -0,0 +1,84 @@
+"""
+Early-exit cascade: a linear first stage in front of the RBF SVM.
+
+Most readings are easy (very wet or very dry soil), yet every one of them pays
+for a full kernel sum over the support vectors. A CascadeClassifier first
+scores the scaled features with a multinomial / logistic linear model, a
+single matrix-vector product. When its top-class probability reaches
+`threshold`, that label is the answer; only the remaining readings go to the
+full model (exact or compact SVC).
+
+The threshold is tuned on held-out data so the cascade stays within a set
+accuracy tolerance of the full model (mlops/cascade.py). The first stage is
+stored as a plain dict of NumPy arrays, like CompactSVC.
+"""
+from typing import Dict
+
+import numpy as np
+
+
+class LinearGate:
+    """First-stage linear classifier with a confidence threshold."""
+
+    def __init__(self, coef, intercept, classes, threshold):
+        self.coef = np.asarray(coef, dtype=np.float64)              # (n_classes or 1, n_features)
+        self.intercept = np.asarray(intercept, dtype=np.float64)
+        self.classes_ = np.asarray(classes)
+        self.threshold = float(threshold)
+
+    def proba(self, X) -> np.ndarray:
+        z = np.asarray(X, dtype=np.float64) @ self.coef.T + self.intercept
+        if z.shape[1] == 1:
+            # Binary logistic regression: one score for the positive class
+            p = 1.0 / (1.0 + np.exp(-z[:, 0]))
+            return np.column_stack([1.0 - p, p])
+        z -= z.max(axis=1, keepdims=True)
+        e = np.exp(z)
+        return e / e.sum(axis=1, keepdims=True)
+
+    def decide(self, X):
+        """(labels, confident mask) of the first stage."""
+        p = self.proba(X)
+        return self.classes_[p.argmax(axis=1)], p.max(axis=1) >= self.threshold
+
+    # -----------------------------------------
+    def to_dict(self) -> Dict:
+        return {
+            "coef": self.coef,
+            "intercept": self.intercept,
+            "classes": self.classes_,
+            "threshold": self.threshold,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "LinearGate":
+        return cls(**data)
+
+
+class CascadeClassifier:
+    """Gate answers confident rows, `model` the rest; sklearn-compatible predict()."""
+
+    def __init__(self, gate: LinearGate, model):
+        self.gate = gate
+        self.model = model
+        self.classes_ = model.classes_
+        self.stats = {"rows": 0, "short_circuited": 0}
+
+    def predict(self, X) -> np.ndarray:
+        X = np.asarray(X)
+        labels, confident = self.gate.decide(X)
+        out = labels.astype(np.asarray(self.classes_).dtype)
+        rest = ~confident
+        if rest.any():
+            out[rest] = self.model.predict(X[rest])
+        self.stats["rows"] += len(X)
+        self.stats["short_circuited"] += int(confident.sum())
+        return out
+
+    def decision_function(self, X):
+        # Calibration / margins always come from the full model
+        return self.model.decision_function(X)
+
+    @property
+    def short_circuit_rate(self) -> float:
+        return self.stats["short_circuited"] / self.stats["rows"] if self.stats["rows"] else 0.0
@@ -0,0 +1,72 @@
+"""
+Compact RBF-SVM predictor for the Raspberry Pi.
+
+A CompactSVC evaluates decision functions of the form
+
+    f_p(x) = sum_j coef[j, p] * exp(-gamma * ||x - center_j||^2) + intercept[p]
+
+over a small set of reduced-set centers instead of all support vectors of
+the exact sklearn SVC (see mlops/compact.py for how it is built). It is stored
+as a plain dict of NumPy arrays, so loading it needs no custom pickled class.
+"""
+from typing import Dict, Tuple
+
+import numpy as np
+
+
+class CompactSVC:
+    """Reduced-set RBF SVM with sklearn-compatible predict()."""
+
+    def __init__(self, centers, coef, intercept, gamma, classes):
+        self.centers = np.asarray(centers, dtype=np.float64)
+        self.coef = np.asarray(coef, dtype=np.float64)              # (m, n_pairs)
+        self.intercept = np.asarray(intercept, dtype=np.float64)    # (n_pairs,)
+        self.gamma = float(gamma)
+        self.classes_ = np.asarray(classes)
+        self._center_sq = np.einsum("ij,ij->i", self.centers, self.centers)
+
+        n = len(self.classes_)
+        # One-vs-one pair order used by libsvm: (0,1), (0,2), ..., (1,2), ...
+        self.pairs: Tuple[Tuple[int, int], ...] = tuple(
+            (i, j) for i in range(n) for j in range(i + 1, n)
+        )
+
+    # -----------------------------------------
+    @property
+    def n_centers(self) -> int:
+        return len(self.centers)
+
+    def kernel(self, X) -> np.ndarray:
+        X = np.asarray(X, dtype=np.float64)
+        sq = np.einsum("ij,ij->i", X, X)[:, None] + self._center_sq[None, :] - 2.0 * X @ self.centers.T
+        return np.exp(-self.gamma * np.maximum(sq, 0.0))
+
+    def decision_function(self, X) -> np.ndarray:
+        """Pairwise (one-vs-one) decision values, shape (n, n_pairs)."""
+        return self.kernel(X) @ self.coef + self.intercept
+
+    def predict(self, X) -> np.ndarray:
+        D = self.decision_function(X)
+        if len(self.classes_) == 2:
+            return self.classes_[(D[:, 0] > 0).astype(int)]
+
+        votes = np.zeros((D.shape[0], len(self.classes_)), dtype=np.int32)
+        for k, (i, j) in enumerate(self.pairs):
+            pos = D[:, k] > 0
+            votes[pos, i] += 1
+            votes[~pos, j] += 1
+        return self.classes_[votes.argmax(axis=1)]
+
+    # -----------------------------------------
+    def to_dict(self) -> Dict:
+        return {
+            "centers": self.centers,
+            "coef": self.coef,
+            "intercept": self.intercept,
+            "gamma": self.gamma,
+            "classes": self.classes_,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "CompactSVC":
+        return cls(**data)
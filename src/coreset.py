@@ -0,0 +1,142 @@
+"""
+Training-set reduction for the SVC models.
+
+Live rows arrive every few seconds and are nearly identical to their
+neighbours (MOI 22.02, 22.03, 22.06 …), while exact SVC fit time grows
+super-linearly with row count. Before `preprocess`, rows are therefore
+
+1. collapsed on a quantized feature grid: rows with the same label, the same
+   categorical values and the same grid cell on every numeric feature become
+   one row at the cell mean, with a sample weight = number of rows merged
+2. optionally subsampled to `target_size` rows as a stratified,
+   class-balanced coreset: every class gets an equal share of the budget
+   (small classes are kept whole and their unused share is passed on) and
+   rows are drawn with probability ∝ weight. Heavy cells are already
+   represented by being drawn more often, so each drawn row gets an equal
+   share of its class's total weight (keeping the drawn row's own weight as
+   well would count it twice, ≈ weight²)
+
+The SVC is fitted with `sample_weight`, so the loss still reflects how often
+each situation occurred, but fit cost follows the number of distinct
+situations instead of the raw row count.
+"""
+import logging
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    from src.log_setup import configure_logging
+except ImportError:  # imported from inside src/ (edge scripts)
+    from log_setup import configure_logging
+
+# --------------------------
+# CONFIGURE LOGGING
+# --------------------------
+configure_logging()
+
+# Grid cell size per numeric feature (≈ sensor noise / agronomic irrelevance)
+GRID_RESOLUTION = {
+    # Irrigation model
+    "MOI": 0.5,
+    "temp": 0.5,
+    "humidity": 1.0,
+    # Plant health model
+    "Soil_Moisture": 0.5,
+    "Ambient_Temperature": 0.5,
+    "Humidity": 1.0,
+    "Light_Intensity": 25.0,
+    "Nitrogen_Level": 1.0,
+    "Phosphorus_Level": 1.0,
+    "Potassium_Level": 1.0,
+}
+
+
+def dedupe_grid(df: pd.DataFrame, label: str, categorical: Iterable[str] = (),
+                resolution: Optional[Dict[str, float]] = None,
+                weights: Optional[np.ndarray] = None) -> Tuple[pd.DataFrame, np.ndarray]:
+    """Collapse rows sharing (label, categoricals, grid cell); returns (df, weights).
+
+    Only columns with a resolution are gridded (and averaged); any other column
+    (timestamps, ids) is not part of the key and keeps the cell's first value.
+    """
+    resolution = GRID_RESOLUTION if resolution is None else resolution
+    categorical = [c for c in categorical if c in df.columns]
+    numeric = [c for c in df.columns if c in resolution and c != label and c not in categorical]
+    if df.empty:
+        return df.copy(), np.empty(0)
+
+    w = np.ones(len(df)) if weights is None else np.asarray(weights, dtype=np.float64)
+    keys = pd.DataFrame({c: df[c].to_numpy() for c in [label] + categorical}, index=df.index)
+    for c in numeric:
+        values = df[c].to_numpy(dtype=np.float64)
+        keys[f"_cell_{c}"] = np.floor(values / resolution[c]).astype(np.int64)
+
+    # Weighted cell means, so merging already-weighted rows stays exact
+    group = keys.groupby(list(keys.columns), sort=False, dropna=False).ngroup().to_numpy()
+    n_groups = group.max() + 1
+    total = np.bincount(group, weights=w, minlength=n_groups)
+    first = pd.Series(np.arange(len(df))).groupby(group).first().to_numpy()
+
+    out = df.iloc[first].reset_index(drop=True)
+    for c in numeric:
+        sums = np.bincount(group, weights=w * df[c].to_numpy(dtype=np.float64), minlength=n_groups)
+        out[c] = sums / total   # group ids follow first appearance, like `first`
+    return out, total
+
+
+def stratified_coreset(df: pd.DataFrame, weights: np.ndarray, label: str, target_size: int,
+                       random_state: int = 42) -> Tuple[pd.DataFrame, np.ndarray]:
+    """Class-balanced subsample of at most `target_size` rows; class weight totals preserved."""
+    if target_size is None or len(df) <= target_size:
+        return df, weights
+    rng = np.random.default_rng(random_state)
+    y = df[label].to_numpy()
+    classes, counts = np.unique(y, return_counts=True)
+
+    # Equal share per class; classes smaller than their share donate the rest
+    quota = {}
+    budget, remaining = target_size, len(classes)
+    for cls, count in sorted(zip(classes, counts), key=lambda t: t[1]):
+        quota[cls] = min(count, budget // remaining)
+        budget -= quota[cls]
+        remaining -= 1
+
+    picked, new_w = [], []
+    for cls in classes:
+        idx = np.flatnonzero(y == cls)
+        w = weights[idx]
+        if quota[cls] < len(idx):
+            chosen = rng.choice(len(idx), size=quota[cls], replace=False, p=w / w.sum())
+            # Drawn ∝ weight: each pick stands for an equal share of the class total
+            idx, w = idx[chosen], np.full(quota[cls], w.sum() / quota[cls])
+        picked.append(idx)
+        new_w.append(w)
+
+    order = np.concatenate(picked)
+    return df.iloc[order].reset_index(drop=True), np.concatenate(new_w)
+
+
+def reduce_training_set(df: pd.DataFrame, label: str, categorical: Iterable[str] = (),
+                        resolution: Optional[Dict[str, float]] = None, dedupe: bool = True,
+                        target_size: Optional[int] = None,
+                        random_state: int = 42) -> Tuple[pd.DataFrame, np.ndarray, Dict]:
+    """dedupe_grid (+ stratified_coreset); returns (df, sample_weight, report)."""
+    rows_in = len(df)
+    weights = np.ones(rows_in)
+    if dedupe:
+        df, weights = dedupe_grid(df, label, categorical, resolution)
+    rows_dedup = len(df)
+    df, weights = stratified_coreset(df, weights, label, target_size, random_state)
+
+    report = {
+        "rows_in": int(rows_in),
+        "rows_deduplicated": int(rows_dedup),
+        "rows_out": int(len(df)),
+        "target_size": target_size,
+        "reduction": round(1.0 - len(df) / rows_in, 4) if rows_in else 0.0,
+    }
+    if rows_in and len(df) < rows_in:
+        logging.info(f"Training set reduced {rows_in} → {rows_dedup} (grid) → {len(df)} rows")
+    return df, weights, report
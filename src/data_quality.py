@@ -0,0 +1,213 @@
+"""
+Vectorised data-quality validation for sensor batches and training data.
+
+Every check runs as whole-column NumPy operations, so a batch of millions of
+rows is validated in well under a second and the stage can sit inline both
+in ingestion and at the start of every training run.
+
+Checks:
+- range        value outside the physically plausible range of its feature
+- imputed      row carries an imputed flag from the sensor layer
+- duplicate    repeated timestamp (first occurrence is kept)
+- stuck        identical value repeated >= stuck_run times in a row
+- flatline     step-to-step change <= flat_eps for flat_window rows
+
+stuck / flatline only make sense for time series, so they run only when the
+batch has a timestamp column, and only flag rows that carry a timestamp (the
+training frame mixes the bundled CSVs with time-stamped field rows).
+"""
+import sys
+import time
+import logging
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    from src.log_setup import configure_logging
+except ImportError:  # imported from inside src/ (edge scripts)
+    from log_setup import configure_logging
+
+# --------------------------
+# CONFIGURE LOGGING
+# --------------------------
+configure_logging()
+
+# Physically plausible (min, max) per feature, both models
+FEATURE_RANGES = {
+    # Irrigation model
+    "MOI": (0.0, 100.0),
+    "temp": (-40.0, 80.0),
+    "humidity": (0.0, 100.0),
+    # Plant health model
+    "Soil_Moisture": (0.0, 100.0),
+    "Ambient_Temperature": (-40.0, 80.0),
+    "Humidity": (0.0, 100.0),
+    "Light_Intensity": (0.0, 200000.0),
+    "Nitrogen_Level": (0.0, 2000.0),
+    "Phosphorus_Level": (0.0, 2000.0),
+    "Potassium_Level": (0.0, 2000.0),
+    # Raw edge readings
+    "temperature": (-40.0, 80.0),
+    "moisture": (0.0, 100.0),
+    "light": (0.0, 200000.0),
+}
+
+# Columns written by the sensor layer when a value was substituted
+IMPUTED_COLUMNS = ("imputed", "dht_imputed")
+
+STUCK_RUN = 60          # ~7 minutes of identical readings at 7 s cadence
+FLAT_WINDOW = 120
+FLAT_EPS = 0.05         # below the 2-decimal noise of the ADC readings
+
+# Checks that remove rows in clean(); "stuck"/"flatline" are report-only by default
+DEFAULT_DROP = ("range", "imputed", "duplicate")
+
+
+# =========================================
+# COLUMN KERNELS
+# =========================================
+def run_lengths(values: np.ndarray) -> np.ndarray:
+    """Length of the run of identical consecutive values each row belongs to."""
+    n = len(values)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+    starts = np.empty(n, dtype=bool)
+    starts[0] = True
+    np.not_equal(values[1:], values[:-1], out=starts[1:])
+    run_id = np.cumsum(starts) - 1
+    return np.bincount(run_id)[run_id]
+
+
+def flatline_mask(values: np.ndarray, window: int, eps: float) -> np.ndarray:
+    """Rows in a stretch of >= window rows where each step changes by <= eps.
+
+    Catches sensors that only jitter within their quantisation noise, which
+    an exact-equality stuck check misses.
+    """
+    n = len(values)
+    if n < window or window < 2:
+        return np.zeros(n, dtype=bool)
+    still = np.empty(n, dtype=bool)
+    still[0] = False
+    np.less_equal(np.abs(np.diff(values)), eps, out=still[1:])
+    seg_id = np.cumsum(~still) - 1
+    return np.bincount(seg_id)[seg_id] >= window
+
+
+def duplicate_mask(ts) -> np.ndarray:
+    """True for every repeat of an earlier timestamp (missing timestamps never repeat)."""
+    arr = np.asarray(ts)
+    if arr.dtype.kind == "M":
+        mask = np.zeros(len(arr), dtype=bool)
+        present = ~np.isnat(arr)
+        mask[present] = duplicate_mask(arr[present].view(np.int64))
+        return mask
+    if arr.dtype.kind in "iuf":
+        order = np.argsort(arr, kind="stable")
+        sorted_keys = arr[order]
+        dup_sorted = np.zeros(len(arr), dtype=bool)
+        dup_sorted[1:] = sorted_keys[1:] == sorted_keys[:-1]
+        mask = np.zeros(len(arr), dtype=bool)
+        mask[order] = dup_sorted
+        return mask
+    # Strings / objects: hash-based
+    series = pd.Series(arr)
+    return (series.duplicated(keep="first") & series.notna()).to_numpy()
+
+
+# =========================================
+# BATCH VALIDATION
+# =========================================
+def validate(
+        df: pd.DataFrame,
+        ranges: Optional[Dict[str, Tuple[float, float]]] = None,
+        time_col: str = "timestamp",
+        imputed_cols: Iterable[str] = IMPUTED_COLUMNS,
+        stuck_run: int = STUCK_RUN,
+        flat_window: int = FLAT_WINDOW,
+        flat_eps: float = FLAT_EPS,
+    ) -> Tuple[Dict[str, np.ndarray], Dict]:
+    """Run every check over a batch.
+
+    Returns (masks, report): masks maps check name -> boolean array of
+    failing rows; report is a per-batch summary suitable for logging/JSON.
+    """
+    start = time.perf_counter()
+    ranges = FEATURE_RANGES if ranges is None else ranges
+    n = len(df)
+
+    masks = {name: np.zeros(n, dtype=bool)
+             for name in ("range", "imputed", "duplicate", "stuck", "flatline")}
+    per_feature: Dict[str, Dict[str, int]] = {}
+    is_series = time_col in df.columns
+    stamped = df[time_col].notna().to_numpy() if is_series else None
+
+    for col, (lo, hi) in ranges.items():
+        if col not in df.columns:
+            continue
+        v = pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=np.float64)
+        bad = ~((v >= lo) & (v <= hi))          # NaN fails too
+        masks["range"] |= bad
+        stats = {"out_of_range": int(bad.sum())}
+
+        if is_series:
+            stuck = (run_lengths(v) >= stuck_run) & stamped
+            flat = flatline_mask(v, flat_window, flat_eps) & stamped
+            masks["stuck"] |= stuck
+            masks["flatline"] |= flat
+            stats["stuck"] = int(stuck.sum())
+            stats["flatline"] = int(flat.sum())
+        per_feature[col] = stats
+
+    for col in imputed_cols:
+        if col in df.columns:
+            masks["imputed"] |= df[col].fillna(False).to_numpy(dtype=bool)
+
+    if is_series:
+        masks["duplicate"] = duplicate_mask(df[time_col].to_numpy())
+
+    invalid = np.zeros(n, dtype=bool)
+    for m in masks.values():
+        invalid |= m
+
+    elapsed = time.perf_counter() - start
+    report = {
+        "rows": n,
+        "invalid_rows": int(invalid.sum()),
+        "checks": {name: int(m.sum()) for name, m in masks.items()},
+        "features": per_feature,
+        "seconds": elapsed,
+        "rows_per_sec": n / elapsed if elapsed > 0 else float("inf"),
+    }
+    return masks, report
+
+
+def clean(df: pd.DataFrame, drop: Iterable[str] = DEFAULT_DROP, **kwargs) -> Tuple[pd.DataFrame, Dict]:
+    """Validate a batch and drop rows failing any check listed in `drop`."""
+    masks, report = validate(df, **kwargs)
+    bad = np.zeros(len(df), dtype=bool)
+    for name in drop:
+        bad |= masks[name]
+    report["dropped_rows"] = int(bad.sum())
+    report["dropped_by"] = list(drop)
+
+    if bad.any():
+        logging.warning(
+            f"Data quality: dropped {report['dropped_rows']}/{report['rows']} rows "
+            f"({', '.join(f'{k}={v}' for k, v in report['checks'].items() if v)})"
+        )
+    return df.loc[~bad], report
+
+
+# =========================================
+# CLI
+# =========================================
+if __name__ == "__main__":
+    import json
+
+    for path in sys.argv[1:]:
+        _, rep = validate(pd.read_csv(path))
+        print(f"# {path}")
+        print(json.dumps(rep, indent=2))
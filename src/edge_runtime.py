@@ -0,0 +1,279 @@
+"""
+Pipelined asyncio runtime for the edge loops.
+
+The serial loop (read sensors → predict → publish → sleep) lets one slow step
+hold up everything else: a DHT retry or a blocked MQTT publish delays the next
+sample and skews the sampling cadence. Here the three steps are separate
+stages connected by small bounded queues:
+
+    acquire ──[readings]──▶ predict ──[results]──▶ publish
+
+- every blocking call (sensor read, model inference, network publish) runs in
+  its own single-thread executor, so the event loop only schedules
+- each stage has a deadline; a call that overruns is abandoned (its result is
+  discarded) and, while it is still stuck, new work for that stage is skipped
+  instead of piling up behind it
+- full queues drop the oldest item (the freshest reading wins), and items
+  older than a stage's `max_age` are dropped before doing work on them
+- acquire timing comes from the AdaptiveScheduler (src/scheduler.py)
+- SIGINT/SIGTERM stop acquisition, let queued items drain within
+  `drain_timeout`, then shut the executors down
+
+Nothing here touches hardware or the network; the stages are plain callables,
+so the runtime can be driven with simulated sensors.
+"""
+import signal
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+try:
+    from src.scheduler import AdaptiveScheduler
+    from src.log_setup import configure_logging
+except ImportError:  # imported from inside src/ (edge scripts)
+    from scheduler import AdaptiveScheduler
+    from log_setup import configure_logging
+
+# --------------------------
+# CONFIGURE LOGGING
+# --------------------------
+configure_logging()
+
+DROP_OLDEST = "drop_oldest"
+DROP_NEWEST = "drop_newest"
+
+STAGES = ("acquire", "predict", "publish")
+
+_FAILED = object()   # stage call timed out / raised / was skipped
+_STOP = object()     # end-of-stream marker passed down the queues
+
+
+class StagePolicy:
+    """Deadline and overload behaviour of one stage."""
+
+    def __init__(self, deadline: float, queue_size: int = 4, overflow: str = DROP_OLDEST,
+                 max_age: Optional[float] = None):
+        if overflow not in (DROP_OLDEST, DROP_NEWEST):
+            raise ValueError(f"Unknown overflow policy: {overflow}")
+        self.deadline = deadline          # seconds a single call may take
+        self.queue_size = queue_size      # capacity of the queue feeding this stage
+        self.overflow = overflow          # what to drop when that queue is full
+        self.max_age = max_age            # drop items whose reading is older (s)
+
+
+DEFAULT_POLICIES = {
+    "acquire": StagePolicy(deadline=5.0),
+    "predict": StagePolicy(deadline=2.0, queue_size=2, max_age=30.0),
+    "publish": StagePolicy(deadline=5.0, queue_size=8, max_age=120.0),
+}
+
+
+class EdgeRuntime:
+    """acquire → predict → publish as concurrent stages with deadlines.
+
+    acquire(due) → reading dict      (blocking; `due` = scheduler signals due)
+    predict(reading) → result dict   (blocking, CPU-bound)
+    publish(result) → None           (blocking I/O)
+    signals(reading) → {signal: value} fed to the scheduler for due signals
+    predictions(result) → {name: label} tracked for prediction flips
+    """
+
+    def __init__(self, acquire: Callable, predict: Callable, publish: Callable,
+                 scheduler: AdaptiveScheduler,
+                 signals: Optional[Callable[[Dict], Dict]] = None,
+                 predictions: Optional[Callable[[Dict], Dict]] = None,
+                 policies: Optional[Dict[str, StagePolicy]] = None,
+                 drain_timeout: float = 10.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.fns = {"acquire": acquire, "predict": predict, "publish": publish}
+        self.scheduler = scheduler
+        self.signals = signals or (lambda reading: {})
+        self.predictions = predictions or (lambda result: {})
+        self.policies = {**DEFAULT_POLICIES, **(policies or {})}
+        self.drain_timeout = drain_timeout
+        self.clock = clock
+
+        self.stats = {name: {"ok": 0, "timeouts": 0, "errors": 0, "skipped": 0,
+                             "dropped": 0, "stale": 0, "seconds": 0.0} for name in STAGES}
+        self._pools: Dict[str, ThreadPoolExecutor] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stopping: Optional[asyncio.Event] = None
+
+    # -----------------------------------------
+    # STAGE CALLS
+    # -----------------------------------------
+    async def _call(self, stage: str, *args):
+        """Run one blocking stage call in its executor, bounded by the stage deadline."""
+        stats = self.stats[stage]
+        busy = self._inflight.get(stage)
+        if busy is not None and not busy.done():
+            # The previous call overran its deadline and is still stuck
+            stats["skipped"] += 1
+            return _FAILED
+
+        start = self.clock()
+        future = self._loop.run_in_executor(self._pools[stage], self.fns[stage], *args)
+        future.add_done_callback(self._retrieve)
+        self._inflight[stage] = future
+        try:
+            result = await asyncio.wait_for(asyncio.shield(future), self.policies[stage].deadline)
+        except asyncio.TimeoutError:
+            stats["timeouts"] += 1
+            logging.warning(f"{stage} missed its {self.policies[stage].deadline}s deadline — skipped")
+            return _FAILED
+        except Exception as e:
+            stats["errors"] += 1
+            logging.error(f"{stage} failed: {e}")
+            return _FAILED
+
+        stats["ok"] += 1
+        stats["seconds"] += self.clock() - start
+        return result
+
+    @staticmethod
+    def _retrieve(future) -> None:
+        # Abandoned calls may still fail later; consume the error quietly
+        if not future.cancelled() and future.exception() is not None:
+            logging.debug(f"Abandoned stage call failed: {future.exception()}")
+
+    def _offer(self, stage: str, queue: asyncio.Queue, item) -> None:
+        """Enqueue for `stage`, applying its overflow policy when the queue is full."""
+        if queue.full():
+            self.stats[stage]["dropped"] += 1
+            if self.policies[stage].overflow == DROP_NEWEST:
+                return
+            queue.get_nowait()
+        queue.put_nowait(item)
+
+    def _stale(self, stage: str, stamp: float) -> bool:
+        max_age = self.policies[stage].max_age
+        if max_age is not None and self.clock() - stamp > max_age:
+            self.stats[stage]["stale"] += 1
+            return True
+        return False
+
+    # -----------------------------------------
+    # STAGES
+    # -----------------------------------------
+    async def _acquire_loop(self, readings: asyncio.Queue) -> None:
+        while not self._stopping.is_set():
+            delay = self.scheduler.delay()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), delay)
+                    break
+                except asyncio.TimeoutError:
+                    pass
+
+            due = self.scheduler.due()
+            if not due:
+                continue
+
+            reading = await self._call("acquire", due)
+            if reading is _FAILED:
+                self.scheduler.defer(due)
+                continue
+
+            now = self.clock()
+            values = self.signals(reading)
+            self.scheduler.observe_many({name: values[name] for name in due if name in values}, now)
+            # Signals the reading did not cover still need a new deadline
+            self.scheduler.defer([name for name in due if name not in values], now)
+            self._offer("predict", readings, (now, reading))
+
+    async def _predict_loop(self, readings: asyncio.Queue, results: asyncio.Queue) -> None:
+        while True:
+            item = await readings.get()
+            if item is _STOP:
+                break
+            stamp, reading = item
+            if self._stale("predict", stamp):
+                continue
+
+            result = await self._call("predict", reading)
+            if result is _FAILED:
+                continue
+
+            # A changed decision means the field is moving: sample fast again
+            for name, value in self.predictions(result).items():
+                self.scheduler.observe_prediction(name, value)
+            self._offer("publish", results, (stamp, result))
+        await results.put(_STOP)
+
+    async def _publish_loop(self, results: asyncio.Queue) -> None:
+        while True:
+            item = await results.get()
+            if item is _STOP:
+                break
+            stamp, result = item
+            if self._stale("publish", stamp):
+                continue
+            await self._call("publish", result)
+
+    # -----------------------------------------
+    # LIFECYCLE
+    # -----------------------------------------
+    def stop(self) -> None:
+        """Request a graceful shutdown (safe to call from any thread)."""
+        if self._loop is not None and self._stopping is not None:
+            self._loop.call_soon_threadsafe(self._stopping.set)
+
+    def _install_signal_handlers(self) -> List[int]:
+        installed = []
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                self._loop.add_signal_handler(sig, self._stopping.set)
+                installed.append(sig)
+            except (NotImplementedError, RuntimeError, ValueError):
+                pass   # not the main thread / platform without signal support
+        return installed
+
+    async def run(self, duration: Optional[float] = None) -> Dict:
+        """Run until stop() / SIGINT / SIGTERM (or `duration` seconds); returns summary()."""
+        self._loop = asyncio.get_running_loop()
+        self._stopping = asyncio.Event()
+        self._pools = {name: ThreadPoolExecutor(1, thread_name_prefix=f"edge-{name}")
+                       for name in STAGES}
+        installed = self._install_signal_handlers()
+        if duration is not None:
+            self._loop.call_later(duration, self._stopping.set)
+
+        readings = asyncio.Queue(self.policies["predict"].queue_size)
+        results = asyncio.Queue(self.policies["publish"].queue_size)
+        acquire = asyncio.create_task(self._acquire_loop(readings))
+        consumers = asyncio.gather(self._predict_loop(readings, results),
+                                   self._publish_loop(results))
+        logging.info("Edge runtime started.")
+
+        try:
+            await acquire
+        finally:
+            self._stopping.set()
+
+            async def drain():
+                await readings.put(_STOP)
+                await consumers
+
+            try:
+                await asyncio.wait_for(drain(), self.drain_timeout)
+            except asyncio.TimeoutError:
+                logging.warning("Shutdown: queued items not drained in time — dropped.")
+                consumers.cancel()
+            for sig in installed:
+                self._loop.remove_signal_handler(sig)
+            for pool in self._pools.values():
+                pool.shutdown(wait=False, cancel_futures=True)
+
+        summary = self.summary()
+        logging.info(f"Edge runtime stopped: {summary}")
+        return summary
+
+    def summary(self) -> Dict:
+        out = {}
+        for name, s in self.stats.items():
+            out[name] = {k: v for k, v in s.items() if k != "seconds"}
+            out[name]["mean_ms"] = round(s["seconds"] / s["ok"] * 1e3, 2) if s["ok"] else None
+        return out
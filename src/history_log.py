@@ -0,0 +1,377 @@
+"""
+Buffered, rotating, time-indexed sensor history log.
+
+Layout under the history root (default: data/history/):
+
+    active.jsonl               - records of the bucket currently being written
+    segments/<start>.jsonl.gz  - sealed, compressed time buckets
+    index.json                 - one entry per sealed segment + hourly rollups
+
+The index lets time-range queries open only the segments that overlap the
+requested window, and hourly rollups are answered straight from the index
+for sealed data (the active file is scanned only for the current bucket).
+
+HistoryReader is the source of the hourly upload (src/batch_upload.py), whose
+batches become the time-stamped training store `data/live/`, and of
+dashboards / ad-hoc analysis.
+"""
+import os
+import gzip
+import json
+import time
+import logging
+from typing import Dict, Iterator, List, Optional
+
+try:
+    from src.log_setup import configure_logging
+except ImportError:  # imported from inside src/ (edge scripts)
+    from log_setup import configure_logging
+
+# --------------------------
+# CONFIGURE LOGGING
+# --------------------------
+configure_logging()
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_HISTORY_DIR = os.path.join(BASE_DIR, "data", "history")
+
+ACTIVE_FILE = "active.jsonl"
+INDEX_FILE = "index.json"
+SEGMENTS_DIR = "segments"
+
+# fsync policies for HistoryWriter.flush()
+FSYNC_ALWAYS = "always"   # fsync after every flushed batch
+FSYNC_ROTATE = "rotate"   # fsync only when a segment is sealed
+FSYNC_NEVER = "never"     # leave it to the OS page cache
+
+HOUR = 3600
+
+
+# =========================================
+# SHARED HELPERS
+# =========================================
+def _bucket_start(ts: float, bucket_seconds: int) -> int:
+    return int(ts // bucket_seconds) * bucket_seconds
+
+
+def _load_index(root: str) -> Dict:
+    path = os.path.join(root, INDEX_FILE)
+    if not os.path.exists(path):
+        return {"segments": []}
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def _save_index(root: str, index: Dict) -> None:
+    """Write index atomically (tmp file + rename) so readers never see half a file."""
+    path = os.path.join(root, INDEX_FILE)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(index, f, indent=1)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _read_jsonl(path: str) -> Iterator[Dict]:
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                # Torn last line after a power cut — skip it
+                continue
+
+
+def _hourly_rollups(records: List[Dict]) -> Dict[str, Dict]:
+    """Per-hour count/min/max/sum for every numeric field."""
+    hours: Dict[str, Dict] = {}
+    for rec in records:
+        hour = str(_bucket_start(rec["ts"], HOUR))
+        slot = hours.setdefault(hour, {"count": 0, "fields": {}})
+        slot["count"] += 1
+        for key, value in rec.items():
+            if key == "ts" or isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            stats = slot["fields"].get(key)
+            if stats is None:
+                slot["fields"][key] = {"min": value, "max": value, "sum": value, "n": 1}
+            else:
+                stats["min"] = min(stats["min"], value)
+                stats["max"] = max(stats["max"], value)
+                stats["sum"] += value
+                stats["n"] += 1
+    return hours
+
+
+def _merge_rollup(target: Dict, hour: str, slot: Dict) -> None:
+    if hour not in target:
+        target[hour] = {"count": 0, "fields": {}}
+    dst = target[hour]
+    dst["count"] += slot["count"]
+    for key, stats in slot["fields"].items():
+        cur = dst["fields"].get(key)
+        if cur is None:
+            dst["fields"][key] = dict(stats)
+        else:
+            cur["min"] = min(cur["min"], stats["min"])
+            cur["max"] = max(cur["max"], stats["max"])
+            cur["sum"] += stats["sum"]
+            cur["n"] += stats["n"]
+
+
+# =========================================
+# WRITER
+# =========================================
+class HistoryWriter:
+    """Append sensor records with batching, rotation and an on-disk index."""
+
+    def __init__(
+        self,
+        root: str = DEFAULT_HISTORY_DIR,
+        bucket_seconds: int = HOUR,
+        flush_every: int = 30,
+        flush_interval: float = 60.0,
+        fsync: str = FSYNC_ROTATE,
+        retention_seconds: Optional[float] = None,
+    ):
+        if fsync not in (FSYNC_ALWAYS, FSYNC_ROTATE, FSYNC_NEVER):
+            raise ValueError(f"Unknown fsync policy: {fsync}")
+
+        self.root = root
+        self.bucket_seconds = int(bucket_seconds)
+        self.flush_every = int(flush_every)
+        self.flush_interval = float(flush_interval)
+        self.fsync = fsync
+        self.retention_seconds = retention_seconds
+
+        os.makedirs(os.path.join(self.root, SEGMENTS_DIR), exist_ok=True)
+
+        self.active_path = os.path.join(self.root, ACTIVE_FILE)
+        self._buffer: List[Dict] = []
+        self._last_flush = time.monotonic()
+        self._active_bucket = self._recover_active_bucket()
+
+    # -----------------------------------------
+    def _recover_active_bucket(self) -> Optional[int]:
+        """Pick up the bucket of an active file left over from a previous run."""
+        if not os.path.exists(self.active_path):
+            return None
+        for rec in _read_jsonl(self.active_path):
+            return _bucket_start(rec["ts"], self.bucket_seconds)
+        return None
+
+    # -----------------------------------------
+    def append(self, record: Dict, ts: Optional[float] = None) -> None:
+        """Buffer one record; flushes when the batch size or interval is reached."""
+        rec = dict(record)
+        rec["ts"] = float(ts if ts is not None else rec.get("ts", time.time()))
+
+        bucket = _bucket_start(rec["ts"], self.bucket_seconds)
+        if self._active_bucket is None:
+            self._active_bucket = bucket
+        elif bucket != self._active_bucket:
+            # New time bucket: everything buffered so far belongs to the old one
+            self.flush()
+            self.rotate()
+            self._active_bucket = bucket
+
+        self._buffer.append(rec)
+
+        if (len(self._buffer) >= self.flush_every
+                or time.monotonic() - self._last_flush >= self.flush_interval):
+            self.flush()
+
+    # -----------------------------------------
+    def flush(self) -> int:
+        """Write buffered records to the active segment. Returns records written."""
+        if not self._buffer:
+            self._last_flush = time.monotonic()
+            return 0
+
+        lines = "".join(json.dumps(r, separators=(",", ":")) + "\n" for r in self._buffer)
+        with open(self.active_path, "a") as f:
+            f.write(lines)
+            if self.fsync == FSYNC_ALWAYS:
+                f.flush()
+                os.fsync(f.fileno())
+
+        written = len(self._buffer)
+        self._buffer = []
+        self._last_flush = time.monotonic()
+        return written
+
+    # -----------------------------------------
+    def rotate(self) -> Optional[str]:
+        """Seal the active file into a compressed segment and index it."""
+        self.flush()
+        if not os.path.exists(self.active_path):
+            return None
+
+        records = list(_read_jsonl(self.active_path))
+        if not records:
+            os.remove(self.active_path)
+            return None
+
+        start = _bucket_start(records[0]["ts"], self.bucket_seconds)
+        name = f"{start}.jsonl.gz"
+        seg_path = os.path.join(self.root, SEGMENTS_DIR, name)
+
+        # Two runs may have touched the same bucket (restart) — append as a new gzip member
+        with gzip.open(seg_path, "at") as f:
+            for rec in records:
+                f.write(json.dumps(rec, separators=(",", ":")) + "\n")
+            if self.fsync != FSYNC_NEVER:
+                f.flush()
+                os.fsync(f.fileno())
+
+        index = _load_index(self.root)
+        entry = next((s for s in index["segments"] if s["file"] == name), None)
+        ts_values = [r["ts"] for r in records]
+        rollups = _hourly_rollups(records)
+        if entry is None:
+            entry = {
+                "file": name,
+                "start": start,
+                "end": start + self.bucket_seconds,
+                "min_ts": min(ts_values),
+                "max_ts": max(ts_values),
+                "count": len(records),
+                "rollups": {},
+            }
+            index["segments"].append(entry)
+            index["segments"].sort(key=lambda s: s["start"])
+        else:
+            entry["min_ts"] = min(entry["min_ts"], min(ts_values))
+            entry["max_ts"] = max(entry["max_ts"], max(ts_values))
+            entry["count"] += len(records)
+        for hour, slot in rollups.items():
+            _merge_rollup(entry["rollups"], hour, slot)
+
+        self._apply_retention(index)
+        _save_index(self.root, index)
+        os.remove(self.active_path)
+
+        logging.info(f"History segment sealed: {name} ({len(records)} records)")
+        return seg_path
+
+    # -----------------------------------------
+    def _apply_retention(self, index: Dict) -> None:
+        if self.retention_seconds is None:
+            return
+        cutoff = time.time() - self.retention_seconds
+        keep = []
+        for seg in index["segments"]:
+            if seg["end"] <= cutoff:
+                path = os.path.join(self.root, SEGMENTS_DIR, seg["file"])
+                if os.path.exists(path):
+                    os.remove(path)
+                logging.info(f"History segment expired: {seg['file']}")
+            else:
+                keep.append(seg)
+        index["segments"] = keep
+
+    # -----------------------------------------
+    def close(self) -> None:
+        """Flush pending records (the active bucket stays open for the next run)."""
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+# =========================================
+# READER
+# =========================================
+class HistoryReader:
+    """Time-range queries and hourly rollups over a HistoryWriter directory.
+
+    Used by the uploader (new records since its high-water mark) and dashboards.
+    """
+
+    def __init__(self, root: str = DEFAULT_HISTORY_DIR):
+        self.root = root
+
+    # -----------------------------------------
+    def segments(self, start: Optional[float] = None, end: Optional[float] = None) -> List[Dict]:
+        """Index entries overlapping [start, end)."""
+        index = _load_index(self.root)
+        return [
+            seg for seg in index["segments"]
+            if (start is None or seg["max_ts"] >= start)
+            and (end is None or seg["min_ts"] < end)
+        ]
+
+    # -----------------------------------------
+    def read_range(self, start: Optional[float] = None, end: Optional[float] = None) -> Iterator[Dict]:
+        """Yield records with start <= ts < end, oldest first."""
+        paths = [os.path.join(self.root, SEGMENTS_DIR, seg["file"])
+                 for seg in self.segments(start, end)]
+        active = os.path.join(self.root, ACTIVE_FILE)
+        if os.path.exists(active):
+            paths.append(active)
+
+        for path in paths:
+            if not os.path.exists(path):
+                continue
+            for rec in _read_jsonl(path):
+                ts = rec["ts"]
+                if (start is None or ts >= start) and (end is None or ts < end):
+                    yield rec
+
+    # -----------------------------------------
+    def last(self, seconds: float, now: Optional[float] = None) -> List[Dict]:
+        """Records from the last `seconds` (e.g. 6 * 3600 for "last 6 hours")."""
+        now = time.time() if now is None else now
+        return list(self.read_range(now - seconds, None))
+
+    # -----------------------------------------
+    def hourly_rollups(self, start: Optional[float] = None, end: Optional[float] = None) -> List[Dict]:
+        """Per-hour count/mean/min/max per numeric field.
+
+        Sealed segments are answered from the index; only the active file is scanned.
+        """
+        merged: Dict[str, Dict] = {}
+        for seg in self.segments(start, end):
+            for hour, slot in seg["rollups"].items():
+                _merge_rollup(merged, hour, slot)
+
+        active = os.path.join(self.root, ACTIVE_FILE)
+        if os.path.exists(active):
+            for hour, slot in _hourly_rollups(list(_read_jsonl(active))).items():
+                _merge_rollup(merged, hour, slot)
+
+        rows = []
+        for hour in sorted(merged, key=int):
+            h = int(hour)
+            if (start is not None and h + HOUR <= start) or (end is not None and h >= end):
+                continue
+            slot = merged[hour]
+            fields = {
+                key: {
+                    "mean": stats["sum"] / stats["n"],
+                    "min": stats["min"],
+                    "max": stats["max"],
+                }
+                for key, stats in slot["fields"].items()
+            }
+            rows.append({"hour": h, "count": slot["count"], "fields": fields})
+        return rows
+
+    # -----------------------------------------
+    def to_frame(self, start: Optional[float] = None, end: Optional[float] = None):
+        """Load a time range as a pandas DataFrame (dashboards, analysis)."""
+        import pandas as pd
+
+        df = pd.DataFrame(list(self.read_range(start, end)))
+        if not df.empty:
+            df["timestamp"] = pd.to_datetime(df["ts"], unit="s")
+        return df
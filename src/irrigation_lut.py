@@ -0,0 +1,102 @@
+"""
+Precomputed decision lookup table for O(1) irrigation inference.
+
+The irrigation model has two small categorical inputs (soil type, seedling
+stage) and three bounded continuous ones (MOI %, temperature, humidity).
+mlops/lookup_table.py evaluates the trained SVC on a regular grid per
+(soil, stage) and stores the result here, so a prediction becomes an array
+index instead of a kernel sum over every support vector.
+
+Two table modes:
+- "bits": bit-packed 0/1 decisions, nearest-cell lookup (smallest file)
+- "int8": quantised decision values, trilinear interpolation then threshold
+          (follows the decision boundary between grid points more closely)
+
+Saved as a plain .npz, so loading needs no pickled classes.
+"""
+from typing import Sequence
+
+import numpy as np
+
+AXES = ("MOI", "temp", "humidity")
+
+
+class IrrigationLUT:
+    """Grid lookup of the irrigation decision per (soil type, stage)."""
+
+    def __init__(self, table, mode: str, soil_types: Sequence[str], stages: Sequence[str],
+                 lo: Sequence[float], step: Sequence[float], shape: Sequence[int], scale: float = 1.0):
+        if mode not in ("bits", "int8"):
+            raise ValueError(f"Unknown LUT mode: {mode}")
+        self.table = np.asarray(table)
+        self.mode = mode
+        self.soil_types = [str(s) for s in soil_types]
+        self.stages = [str(s) for s in stages]
+        self.lo = np.asarray(lo, dtype=np.float64)
+        self.step = np.asarray(step, dtype=np.float64)
+        self.shape = tuple(int(n) for n in shape)
+        self.scale = float(scale)
+
+        self._soil_index = {s: i for i, s in enumerate(self.soil_types)}
+        self._stage_index = {s: i for i, s in enumerate(self.stages)}
+        self._cells = int(np.prod(self.shape))
+        self._strides = np.array([self.shape[1] * self.shape[2], self.shape[2], 1], dtype=np.int64)
+
+    # -----------------------------------------
+    def _offsets(self, soil_idx, stage_idx) -> np.ndarray:
+        return (np.asarray(soil_idx, dtype=np.int64) * len(self.stages)
+                + np.asarray(stage_idx, dtype=np.int64)) * self._cells
+
+    def predict_batch(self, soil_idx, stage_idx, moi, temp, humidity) -> np.ndarray:
+        """Vectorised decisions from encoded categoricals + raw continuous values."""
+        values = np.stack([np.asarray(moi, dtype=np.float64),
+                           np.asarray(temp, dtype=np.float64),
+                           np.asarray(humidity, dtype=np.float64)], axis=-1)
+        pos = (values - self.lo) / self.step
+        max_idx = np.array(self.shape) - 1
+        base = self._offsets(soil_idx, stage_idx)
+
+        if self.mode == "bits":
+            cell = np.clip(np.rint(pos), 0, max_idx).astype(np.int64)
+            flat = base + cell @ self._strides
+            byte = self.table[flat >> 3]
+            return ((byte >> (7 - (flat & 7))) & 1).astype(np.int64)
+
+        # int8: trilinear interpolation of decision values
+        pos = np.clip(pos, 0, max_idx)
+        i0 = np.minimum(np.floor(pos).astype(np.int64), np.maximum(max_idx - 1, 0))
+        frac = pos - i0
+        decision = np.zeros(pos.shape[:-1])
+        for corner in range(8):
+            bits = np.array([(corner >> 2) & 1, (corner >> 1) & 1, corner & 1])
+            idx = np.minimum(i0 + bits, max_idx)
+            w = np.prod(np.where(bits == 1, frac, 1.0 - frac), axis=-1)
+            decision += w * self.table[base + idx @ self._strides]
+        return (decision > 0).astype(np.int64)
+
+    def predict(self, soil_type: str, stage: str, moi: float, temp: float, humidity: float) -> int:
+        """Single reading (moi already in %), same output as IrrigationModel.predict."""
+        return int(self.predict_batch(self._soil_index[soil_type], self._stage_index[stage],
+                                      moi, temp, humidity))
+
+    # -----------------------------------------
+    @property
+    def nbytes(self) -> int:
+        return int(self.table.nbytes)
+
+    def save(self, path: str) -> None:
+        np.savez_compressed(
+            path, table=self.table, mode=self.mode,
+            soil_types=np.array(self.soil_types), stages=np.array(self.stages),
+            lo=self.lo, step=self.step, shape=np.array(self.shape), scale=self.scale,
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "IrrigationLUT":
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                table=data["table"], mode=str(data["mode"]),
+                soil_types=data["soil_types"].tolist(), stages=data["stages"].tolist(),
+                lo=data["lo"], step=data["step"], shape=data["shape"].tolist(),
+                scale=float(data["scale"]),
+            )
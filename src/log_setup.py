@@ -0,0 +1,356 @@
+"""
+Shared logging setup: records leave the calling thread through a queue.
+
+Every module used to call `logging.basicConfig`, so each log line was
+formatted and written to the console (and from there the SD card) on the
+thread that produced it — inside the inference loop. `configure_logging()`
+instead installs one `QueueHandler` on the root logger:
+
+    caller thread:    level check → sampling / rate-limit filters → deque append
+    listener thread:  every FLUSH_INTERVAL s (at once for warnings):
+                      format the batch → console (human-readable)
+                                       → rotating JSON-lines file (optional)
+                      one write per output per batch
+
+Messages are formatted lazily: records are queued with their `%`-style args
+and only turned into text by the listener, so a sampled-out or dropped record
+costs a dict lookup. Hot paths log through named loggers so they can be thinned
+per logger (`SAMPLING`: keep 1 in N records, `RATE_LIMITS`: token bucket in
+records/s). Warnings and errors are never sampled or rate-limited. If the
+queue is full (storage stalled) records are dropped and counted, the caller
+never blocks.
+
+Module-level calls only make sure logging is set up (like basicConfig, a
+no-op if the root logger already has handlers); entry points pass
+`force=True` with their log file.
+"""
+import os
+import sys
+import json
+import time
+import atexit
+import logging
+import threading
+from collections import deque
+from logging.handlers import QueueHandler, RotatingFileHandler
+from typing import Dict, Optional
+
+FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+QUEUE_SIZE = 10000          # records held between listener batches
+FLUSH_INTERVAL = 0.5        # s between listener batches (warnings wake it at once)
+MAX_BYTES = 1 * 2 ** 20     # rotate the JSON-lines file at 1 MB ...
+BACKUP_COUNT = 5            # ... keeping this many old files
+
+# Hot-path loggers (prefix match on the dotted name)
+SAMPLING = {"plant_health.predict": 10}     # keep 1 in N records
+RATE_LIMITS = {"edge": 2.0}                 # records per second
+RATE_BURST = 10                             # records allowed back to back
+
+# LogRecord attributes; anything else on a record came from `extra=`
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+def _prefix(name: str, table: Dict) -> Optional[str]:
+    """Longest configured prefix of a dotted logger name, or None."""
+    while name:
+        if name in table:
+            return name
+        name = name.rpartition(".")[0]
+    return None
+
+
+# ======================================================
+# FILTERS (run on the caller thread, before queueing)
+# ======================================================
+class SamplingFilter(logging.Filter):
+    """Keep every N-th INFO/DEBUG record of the configured loggers."""
+
+    def __init__(self, sampling: Dict[str, int]):
+        super().__init__()
+        self.sampling = dict(sampling)
+        self.counts: Dict[str, int] = {}
+        self.dropped = 0
+
+    def filter(self, record) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        every = self.sampling.get(_prefix(record.name, self.sampling))
+        if not every or every <= 1:
+            return True
+        n = self.counts.get(record.name, 0)
+        self.counts[record.name] = n + 1
+        if n % every:
+            self.dropped += 1
+            return False
+        record.sampled = every
+        return True
+
+
+class RateLimitFilter(logging.Filter):
+    """Token bucket per configured logger prefix for INFO/DEBUG records."""
+
+    def __init__(self, rates: Dict[str, float], burst: int = RATE_BURST):
+        super().__init__()
+        self.rates = dict(rates)
+        self.burst = burst
+        self.buckets: Dict[str, list] = {}      # prefix -> [tokens, last refill, suppressed]
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def filter(self, record) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        prefix = _prefix(record.name, self.rates)
+        if prefix is None:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            bucket = self.buckets.setdefault(prefix, [float(self.burst), now, 0])
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rates[prefix])
+            bucket[1] = now
+            if bucket[0] < 1.0:
+                bucket[2] += 1
+                self.dropped += 1
+                return False
+            bucket[0] -= 1.0
+            if bucket[2]:
+                # First record after a burst carries how many were dropped
+                record.suppressed, bucket[2] = bucket[2], 0
+        return True
+
+
+# ======================================================
+# QUEUE + LISTENER
+# ======================================================
+class AsyncQueueHandler(QueueHandler):
+    """Appends records, unformatted, to a bounded deque; never blocks the caller."""
+
+    def __init__(self, records: deque, wake: threading.Event, max_records: int = QUEUE_SIZE):
+        super().__init__(records)
+        self.wake = wake
+        self.max_records = max_records
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Formatting happens on the listener thread (QueueHandler would do it here)
+        return record
+
+    def enqueue(self, record):
+        if len(self.queue) >= self.max_records:
+            self.dropped += 1
+            return
+        self.queue.append(record)
+        if record.levelno >= logging.WARNING or len(self.queue) >= self.max_records // 2:
+            self.wake.set()
+
+
+class _Listener(threading.Thread):
+    """Writes queued records in batches: every FLUSH_INTERVAL s, at once for warnings."""
+
+    def __init__(self, records: deque, wake: threading.Event, targets, interval: float = FLUSH_INTERVAL):
+        super().__init__(name="log-listener", daemon=True)
+        self.records = records
+        self.wake = wake
+        self.targets = targets
+        self.interval = interval
+        self.stopping = False
+
+    def run(self):
+        while not self.stopping:
+            self.wake.wait(self.interval)
+            self.wake.clear()
+            self.drain()
+        self.drain()
+
+    def drain(self):
+        if not self.records:
+            return
+        while self.records:
+            record = self.records.popleft()
+            for target in self.targets:
+                if record.levelno >= target.level:
+                    target.handle(record)
+        for target in self.targets:
+            target.flush()
+
+    def stop(self):
+        self.stopping = True
+        self.wake.set()
+        self.join()
+
+
+# ======================================================
+# OUTPUTS (one write per batch instead of one per record)
+# ======================================================
+class _Batched:
+    """Collects formatted records; flush() writes them in one go."""
+
+    immediate = False       # write on every record (forked workers, no listener)
+
+    def emit(self, record):
+        try:
+            self.pending.append(self.format(record))
+        except Exception:
+            self.handleError(record)
+            return
+        if self.immediate:
+            self.flush()
+
+    def flush(self):
+        self.acquire()
+        try:
+            if self.pending:
+                text = "\n".join(self.pending) + "\n"
+                self.pending = []
+                self.write(text)
+        finally:
+            self.release()
+        super().flush()
+
+
+class BatchedStreamHandler(_Batched, logging.StreamHandler):
+    def __init__(self, stream=None):
+        super().__init__(stream)
+        self.pending = []
+
+    def write(self, text):
+        self.stream.write(text)
+
+
+class BatchedRotatingFileHandler(_Batched, RotatingFileHandler):
+    # RotatingFileHandler.shouldRollover formats every record a second time;
+    # here the size is checked once per batch instead
+    def __init__(self, filename, max_bytes: int = MAX_BYTES, backup_count: int = BACKUP_COUNT):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count,
+                         encoding="utf-8", delay=True)
+        self.pending = []
+
+    def write(self, text):
+        if self.stream is None:
+            self.stream = self._open()
+        self.stream.write(text)
+        if self.maxBytes and self.stream.tell() >= self.maxBytes:
+            self.doRollover()
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: time, level, logger, message, location, extras."""
+
+    def format(self, record) -> str:
+        out = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "module": record.module,
+            "line": record.lineno,
+            "thread": record.threadName,
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and key not in out:
+                out[key] = value
+        if record.exc_info:
+            out["exc"] = self.formatException(record.exc_info)
+        return json.dumps(out, default=str)
+
+
+# ======================================================
+# SETUP
+# ======================================================
+_handler: Optional[AsyncQueueHandler] = None
+_listener: Optional[_Listener] = None
+_targets = []
+_lock = threading.Lock()
+
+
+def configure_logging(level=logging.INFO, log_file: Optional[str] = None, console: bool = True,
+                      sampling: Optional[Dict[str, int]] = None,
+                      rate_limits: Optional[Dict[str, float]] = None,
+                      force: bool = False) -> Optional[AsyncQueueHandler]:
+    """Route the root logger through a background listener (idempotent).
+
+    Without `force` this does nothing once logging is configured — by an
+    earlier call or by the host application.
+    """
+    global _handler, _listener, _targets
+    with _lock:
+        root = logging.getLogger()
+        if not force and (_handler is not None or root.handlers):
+            return _handler
+        _shutdown()
+
+        targets = []
+        if console:
+            stream = BatchedStreamHandler(sys.stderr)
+            stream.setFormatter(logging.Formatter(FORMAT))
+            targets.append(stream)
+        if log_file:
+            os.makedirs(os.path.dirname(os.path.abspath(log_file)), exist_ok=True)
+            rotating = BatchedRotatingFileHandler(log_file)
+            rotating.setFormatter(JsonFormatter())
+            targets.append(rotating)
+
+        records, wake = deque(), threading.Event()
+        handler = AsyncQueueHandler(records, wake)
+        handler.addFilter(SamplingFilter(SAMPLING if sampling is None else sampling))
+        handler.addFilter(RateLimitFilter(RATE_LIMITS if rate_limits is None else rate_limits))
+        for h in list(root.handlers):
+            root.removeHandler(h)
+        root.addHandler(handler)
+        root.setLevel(level)
+
+        _handler, _targets = handler, targets
+        _listener = _Listener(records, wake, targets)
+        _listener.start()
+        return handler
+
+
+def _shutdown() -> None:
+    global _handler, _listener, _targets
+    if _listener is not None:
+        _listener.stop()            # drains the queue before returning
+    if _handler is not None:
+        logging.getLogger().removeHandler(_handler)
+    for target in _targets:
+        target.close()
+    _handler, _listener, _targets = None, None, []
+
+
+def shutdown_logging() -> None:
+    """Write queued records and stop the listener (runs at exit)."""
+    with _lock:
+        _shutdown()
+
+
+def stats() -> Dict[str, int]:
+    """Records waiting, and dropped so far by sampling, rate limiting and a full queue."""
+    if _handler is None:
+        return {}
+    out = {"queued": len(_handler.queue), "queue_full": _handler.dropped}
+    for f in _handler.filters:
+        key = "sampled_out" if isinstance(f, SamplingFilter) else "rate_limited"
+        out[key] = f.dropped
+    return out
+
+
+def _after_fork_in_child() -> None:
+    # Forked workers (e.g. shadow replay) have no listener thread and exit via
+    # os._exit, which would lose queued records: log synchronously there
+    global _handler, _listener
+    if _handler is None:
+        return
+    root = logging.getLogger()
+    root.removeHandler(_handler)
+    _handler.queue.clear()          # the parent writes these
+    for target in _targets:
+        target.pending = []
+        target.immediate = True
+        for f in _handler.filters:
+            target.addFilter(f)
+        root.addHandler(target)
+    _handler, _listener = None, None
+
+
+atexit.register(shutdown_logging)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
@@ -0,0 +1,189 @@
+"""
+Memory-bounded, multi-field model registry.
+
+Models are keyed by (task, soil, stage) — the field attributes the training
+data records — and live under
+
+    models/<task>/segments/<soil>__<stage>/current/   (specialised)
+    models/<task>/current/                             (global)
+
+The global model is the release synced by src/model_sync.py when there is
+one, else the git-tracked folder above.
+
+Unknown parts of a key are stored as "_all". A lookup walks from the most
+specific segment to the global model and uses the first folder that exists.
+Loaded models are kept in an LRU bounded by total artifact bytes; the same
+folder is loaded only once no matter how many keys resolve to it.
+"""
+import os
+import re
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from src.Irrigation_Model import IrrigationModel
+    from src.plant_health import PlantHealthModel
+    from src.log_setup import configure_logging
+    from src.model_sync import active_dir
+except ImportError:  # imported from inside src/ (edge scripts)
+    from Irrigation_Model import IrrigationModel
+    from plant_health import PlantHealthModel
+    from log_setup import configure_logging
+    from model_sync import active_dir
+
+# --------------------------
+# CONFIGURE LOGGING
+# --------------------------
+configure_logging()
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODELS_ROOT = os.path.join(BASE_DIR, "models")
+
+ANY = "_all"
+SEGMENTS_DIR = "segments"
+
+# task name -> (folder under models/, loader)
+TASKS = {
+    "irrigation": ("irrigation", IrrigationModel.load_dir),
+    "plant_health": ("plant_health", PlantHealthModel.load_dir),
+}
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+# =========================================
+# KEYS
+# =========================================
+def slug(value: Optional[str]) -> str:
+    """Folder-safe name for one key part ("Black Soil" -> "black-soil")."""
+    if value is None or value == "" or value == ANY:
+        return ANY
+    return re.sub(r"[^a-z0-9]+", "-", str(value).lower()).strip("-") or ANY
+
+
+def segment_name(soil=None, stage=None) -> str:
+    return "__".join((slug(soil), slug(stage)))
+
+
+def segment_dir(models_root: str, task: str, soil=None, stage=None) -> str:
+    folder = TASKS[task][0]
+    return os.path.join(models_root, folder, SEGMENTS_DIR, segment_name(soil, stage))
+
+
+def fallback_chain(soil=None, stage=None) -> List[Tuple]:
+    """Keys from most to least specific; the global model is last (None)."""
+    chain = [
+        (soil, stage),
+        (soil, None),
+        (None, stage),
+    ]
+    seen, out = set(), []
+    for key in chain:
+        name = segment_name(*key)
+        if name not in seen and name != segment_name():
+            seen.add(name)
+            out.append(key)
+    out.append(None)
+    return out
+
+
+def _dir_bytes(path: str) -> int:
+    return sum(
+        os.path.getsize(os.path.join(path, f))
+        for f in os.listdir(path)
+        if os.path.isfile(os.path.join(path, f))
+    )
+
+
+# =========================================
+# REGISTRY
+# =========================================
+class ModelRegistry:
+    """Lazy, LRU-cached access to per-segment models with global fallback."""
+
+    def __init__(self, models_root: str = MODELS_ROOT, max_bytes: int = DEFAULT_MAX_BYTES,
+                 compact: bool = False, cascade: bool = False, lut: bool = False):
+        self.models_root = models_root
+        self.max_bytes = max_bytes
+        self.compact = compact
+        self.cascade = cascade
+        self.lut = lut
+
+        self._cache: "OrderedDict[str, Tuple[object, int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "loads": 0, "evictions": 0,
+                      "evicted_bytes": 0, "fallbacks": 0}
+
+    # -----------------------------------------
+    def resolve(self, task: str, soil=None, stage=None) -> str:
+        """current/ folder of the most specific model available for this key."""
+        if task not in TASKS:
+            raise KeyError(f"Unknown task: {task}")
+
+        for key in fallback_chain(soil, stage):
+            if key is None:
+                break
+            path = os.path.join(segment_dir(self.models_root, task, *key), "current")
+            if os.path.isdir(path):
+                return path
+
+        self.stats["fallbacks"] += 1
+        return active_dir(TASKS[task][0], self.models_root)
+
+    # -----------------------------------------
+    def get(self, task: str, soil=None, stage=None):
+        """Loaded model object for the key (IrrigationModel / PlantHealthModel)."""
+        path = self.resolve(task, soil, stage)
+
+        with self._lock:
+            entry = self._cache.get(path)
+            if entry is not None:
+                self._cache.move_to_end(path)
+                self.stats["hits"] += 1
+                return entry[0]
+            self.stats["misses"] += 1
+
+        loader = TASKS[task][1]
+        options = {"compact": self.compact, "cascade": self.cascade}
+        if task == "irrigation":
+            options["lut"] = self.lut       # only irrigation has a decision lookup table
+        model = loader(path, **options)
+        size = _dir_bytes(path)
+
+        with self._lock:
+            if path not in self._cache:
+                self._cache[path] = (model, size)
+                self._bytes += size
+                self.stats["loads"] += 1
+                self._evict()
+            return self._cache[path][0] if path in self._cache else model
+
+    # -----------------------------------------
+    def _evict(self) -> None:
+        # Always keep the most recently used entry, even if it alone exceeds the cap
+        while self._bytes > self.max_bytes and len(self._cache) > 1:
+            path, (_, size) = self._cache.popitem(last=False)
+            self._bytes -= size
+            self.stats["evictions"] += 1
+            self.stats["evicted_bytes"] += size
+            logging.info(f"Registry evicted {path} ({size / 1024:.0f} KB)")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+            self._bytes = 0
+
+    # -----------------------------------------
+    @property
+    def loaded_bytes(self) -> int:
+        return self._bytes
+
+    def loaded(self) -> List[str]:
+        return list(self._cache)
+
+    def summary(self) -> Dict:
+        return {**self.stats, "loaded": len(self._cache), "loaded_bytes": self._bytes,
+                "max_bytes": self.max_bytes}
@@ -0,0 +1,356 @@
+"""
+Delta model sync for the Raspberry Pi.
+
+Instead of pulling the whole git repo (every nightly .pkl and version
+folder), the Pi fetches only the promoted `current/` model from a chunk store
+published by mlops/publish_models.py (CI publishes it to `model_store/` after
+every retrain):
+
+    <store>/blobs/<ab>/<sha256>          zlib-compressed chunk, named by raw sha256
+    <store>/<task>/manifest.json         files → ordered chunk hashes
+
+The client keeps a local chunk cache, downloads only chunks it does not have,
+verifies every chunk and file hash, assembles the release under
+`models/.sync/<task>/releases/<version>/` and activates it by atomically
+swapping the `models/.sync/<task>/current` symlink. A failed or interrupted
+sync never touches the active model.
+
+Everything the sync writes stays under the git-ignored `models/.sync/`.
+Loaders pick the synced release when there is one (see `active_dir`) and fall
+back to the git-tracked `models/<task>/current/` otherwise (CI, development).
+On the Pi, raspberry_pi/upload.sh keeps `models/` out of the sparse checkout,
+so `git pull` brings only the store's new chunks, and runs this sync after it.
+
+The store can also be a plain directory elsewhere (USB stick, NFS mount) or
+any static HTTP server, e.g. `python3 -m http.server` run inside it.
+
+Usage:
+    python3 src/model_sync.py --source model_store
+    python3 src/model_sync.py --source http://192.168.1.10:8000 --task irrigation
+"""
+import os
+import sys
+import json
+import zlib
+import shutil
+import hashlib
+import logging
+import argparse
+import urllib.request
+from typing import Dict, Iterator, List, Optional, Tuple
+
+try:
+    from src.log_setup import configure_logging
+except ImportError:  # imported from inside src/ (edge scripts)
+    from log_setup import configure_logging
+
+# --------------------------
+# CONFIGURE LOGGING
+# --------------------------
+configure_logging()
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODELS_ROOT = os.path.join(BASE_DIR, "models")
+
+CHUNK_SIZE = 64 * 1024
+FORMAT_VERSION = 1
+SYNC_DIR = ".sync"
+MANIFEST_NAME = "manifest.json"
+RELEASE_MANIFEST = ".sync_manifest.json"
+KEEP_RELEASES = 2                 # current + one to roll back to
+SYNC_TASKS = ("irrigation", "plant_health")
+
+
+class SyncError(Exception):
+    """Store unreachable, hash mismatch or malformed manifest."""
+
+
+# =========================================
+# CHUNKING (shared with the publisher)
+# =========================================
+def sha256_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def iter_chunks(path: str, chunk_size: int = CHUNK_SIZE) -> Iterator[Tuple[str, bytes]]:
+    """(sha256, raw bytes) for each fixed-size chunk of a file."""
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            yield sha256_bytes(block), block
+
+
+def blob_path(digest: str) -> str:
+    return f"blobs/{digest[:2]}/{digest}"
+
+
+def active_dir(task: str, models_root: str = MODELS_ROOT) -> str:
+    """current/ folder to load a task's global model from.
+
+    The synced release (resolved, so a new sync yields a new path) when one
+    has been activated, else the git-tracked models/<task>/current/.
+    """
+    synced = os.path.join(models_root, SYNC_DIR, task, "current")
+    if os.path.isdir(synced):
+        return os.path.realpath(synced)
+    return os.path.join(models_root, task, "current")
+
+
+def release_version(files: List[Dict]) -> str:
+    """Content version of a release: hash over (name, file hash) pairs."""
+    h = hashlib.sha256()
+    for f in sorted(files, key=lambda f: f["name"]):
+        h.update(f"{f['name']}:{f['sha256']}\n".encode())
+    return h.hexdigest()[:16]
+
+
+# =========================================
+# TRANSPORTS
+# =========================================
+class DirectoryTransport:
+    """Store on a local or mounted directory."""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def get(self, rel: str) -> bytes:
+        try:
+            with open(os.path.join(self.root, rel), "rb") as f:
+                return f.read()
+        except OSError as exc:
+            raise SyncError(f"Cannot read {rel} from {self.root}: {exc}")
+
+
+class HTTPTransport:
+    """Store served by any static HTTP server."""
+
+    def __init__(self, base_url: str, timeout: float = 30.0):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def get(self, rel: str) -> bytes:
+        url = f"{self.base_url}/{rel}"
+        try:
+            with urllib.request.urlopen(url, timeout=self.timeout) as resp:
+                return resp.read()
+        except OSError as exc:
+            raise SyncError(f"Cannot fetch {url}: {exc}")
+
+
+def open_transport(source: str):
+    if source.startswith(("http://", "https://")):
+        return HTTPTransport(source)
+    return DirectoryTransport(source)
+
+
+# =========================================
+# LOCAL CHUNK CACHE
+# =========================================
+class ChunkCache:
+    """Content-addressed raw chunks already present on the device."""
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest)
+
+    def has(self, digest: str) -> bool:
+        return os.path.exists(self.path(digest))
+
+    def get(self, digest: str) -> bytes:
+        with open(self.path(digest), "rb") as f:
+            return f.read()
+
+    def put(self, digest: str, data: bytes) -> None:
+        path = self.path(digest)
+        if os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.tmp-{os.getpid()}"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def seed_from(self, folder: str) -> int:
+        """Chunk files already on disk (e.g. a git-pulled current/) into the cache."""
+        added = 0
+        if not os.path.isdir(folder):
+            return added
+        for name in os.listdir(folder):
+            path = os.path.join(folder, name)
+            if os.path.isfile(path) and name != RELEASE_MANIFEST:
+                for digest, block in iter_chunks(path):
+                    if not self.has(digest):
+                        self.put(digest, block)
+                        added += 1
+        return added
+
+    def prune(self, keep: set) -> int:
+        removed = 0
+        for sub in os.listdir(self.root):
+            subdir = os.path.join(self.root, sub)
+            if not os.path.isdir(subdir):
+                continue
+            for digest in os.listdir(subdir):
+                if digest not in keep:
+                    os.remove(os.path.join(subdir, digest))
+                    removed += 1
+        return removed
+
+
+# =========================================
+# CLIENT
+# =========================================
+class ModelSync:
+    """Fetch, verify and atomically activate the published model for a task."""
+
+    def __init__(self, transport, models_root: str = MODELS_ROOT):
+        self.transport = transport
+        self.models_root = models_root
+        self.cache = ChunkCache(os.path.join(models_root, SYNC_DIR, "chunks"))
+
+    # -----------------------------------------
+    def _task_dir(self, task: str) -> str:
+        """Sync state for a task — never inside the git-tracked models/<task>/."""
+        return os.path.join(self.models_root, SYNC_DIR, task)
+
+    def remote_manifest(self, task: str) -> Dict:
+        try:
+            manifest = json.loads(self.transport.get(f"{task}/{MANIFEST_NAME}"))
+        except ValueError as exc:
+            raise SyncError(f"Malformed manifest for {task}: {exc}")
+        if manifest.get("format") != FORMAT_VERSION:
+            raise SyncError(f"Unsupported manifest format: {manifest.get('format')}")
+        return manifest
+
+    def active_version(self, task: str) -> Optional[str]:
+        path = os.path.join(self._task_dir(task), "current", RELEASE_MANIFEST)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r") as f:
+            return json.load(f).get("version")
+
+    # -----------------------------------------
+    def _fetch_chunk(self, digest: str) -> bytes:
+        data = zlib.decompress(self.transport.get(blob_path(digest)))
+        if sha256_bytes(data) != digest:
+            raise SyncError(f"Chunk {digest[:12]} failed verification")
+        self.cache.put(digest, data)
+        return data
+
+    def _assemble(self, manifest: Dict, release_dir: str) -> Dict:
+        stats = {"chunks": 0, "fetched": 0, "fetched_bytes": 0}
+        for entry in manifest["files"]:
+            h = hashlib.sha256()
+            out_path = os.path.join(release_dir, entry["name"])
+            with open(out_path, "wb") as out:
+                for digest in entry["chunks"]:
+                    stats["chunks"] += 1
+                    if self.cache.has(digest):
+                        data = self.cache.get(digest)
+                    else:
+                        data = self._fetch_chunk(digest)
+                        stats["fetched"] += 1
+                        stats["fetched_bytes"] += len(data)
+                    h.update(data)
+                    out.write(data)
+            if h.hexdigest() != entry["sha256"] or os.path.getsize(out_path) != entry["size"]:
+                raise SyncError(f"{entry['name']} failed verification")
+        return stats
+
+    def _activate(self, task: str, release_dir: str) -> None:
+        """Point the synced current at the release with one atomic rename of a symlink."""
+        task_dir = self._task_dir(task)
+        tmp_link = os.path.join(task_dir, f".current-{os.getpid()}")
+        if os.path.lexists(tmp_link):
+            os.remove(tmp_link)
+        os.symlink(os.path.relpath(release_dir, task_dir), tmp_link)
+        os.replace(tmp_link, os.path.join(task_dir, "current"))
+
+    def _cleanup(self, task: str, keep: int = KEEP_RELEASES) -> None:
+        releases = os.path.join(self._task_dir(task), "releases")
+        entries = [os.path.join(releases, d) for d in os.listdir(releases) if not d.startswith(".")]
+        entries.sort(key=os.path.getmtime, reverse=True)
+        active = os.path.realpath(os.path.join(self._task_dir(task), "current"))
+        for path in entries[keep:]:
+            if os.path.realpath(path) != active:
+                shutil.rmtree(path, ignore_errors=True)
+
+    def _referenced_chunks(self) -> set:
+        keep = set()
+        for task in SYNC_TASKS:
+            releases = os.path.join(self._task_dir(task), "releases")
+            if not os.path.isdir(releases):
+                continue
+            for rel in os.listdir(releases):
+                path = os.path.join(releases, rel, RELEASE_MANIFEST)
+                if os.path.exists(path):
+                    with open(path, "r") as f:
+                        for entry in json.load(f)["files"]:
+                            keep.update(entry["chunks"])
+        return keep
+
+    # -----------------------------------------
+    def sync(self, task: str, force: bool = False) -> Dict:
+        """Bring models/.sync/<task>/current up to the published release."""
+        manifest = self.remote_manifest(task)
+        version = manifest["version"]
+        if not force and self.active_version(task) == version:
+            logging.info(f"{task}: already at {version}")
+            return {"task": task, "version": version, "updated": False}
+
+        # Reuse what is on disk (checked-out or previously synced) before going to the network
+        self.cache.seed_from(os.path.join(self.models_root, task, "current"))
+        self.cache.seed_from(os.path.join(self._task_dir(task), "current"))
+
+        releases = os.path.join(self._task_dir(task), "releases")
+        release_dir = os.path.join(releases, version)
+        staging = os.path.join(releases, f".staging-{version}-{os.getpid()}")
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+        try:
+            stats = self._assemble(manifest, staging)
+            with open(os.path.join(staging, RELEASE_MANIFEST), "w") as f:
+                json.dump(manifest, f, indent=2)
+            shutil.rmtree(release_dir, ignore_errors=True)
+            os.replace(staging, release_dir)
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+        self._activate(task, release_dir)
+        self._cleanup(task)
+        self.cache.prune(self._referenced_chunks())
+
+        total = sum(f["size"] for f in manifest["files"])
+        logging.info(
+            f"{task}: activated {version} — fetched {stats['fetched']}/{stats['chunks']} chunks "
+            f"({stats['fetched_bytes'] / 1024:.0f} KB of {total / 1024:.0f} KB)"
+        )
+        return {"task": task, "version": version, "updated": True, **stats, "total_bytes": total}
+
+
+# =========================================
+# CLI
+# =========================================
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Sync promoted models from a chunk store.")
+    parser.add_argument("--source", required=True, help="store directory or http(s):// URL")
+    parser.add_argument("--task", action="append", choices=SYNC_TASKS, help="default: all tasks")
+    parser.add_argument("--models-root", default=MODELS_ROOT)
+    parser.add_argument("--force", action="store_true", help="rebuild even if already current")
+    args = parser.parse_args(argv)
+
+    client = ModelSync(open_transport(args.source), args.models_root)
+    failed = False
+    for task in args.task or SYNC_TASKS:
+        try:
+            client.sync(task, force=args.force)
+        except SyncError as exc:
+            logging.error(f"{task}: sync failed, active model unchanged — {exc}")
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,12 @@
 from pymodbus.client import ModbusSerialClient
 import logging
 
-logging.basicConfig(level=logging.INFO)
+try:
+    from src.log_setup import configure_logging
+except ImportError:  # imported from inside src/ (edge scripts)
+    from log_setup import configure_logging
+
+configure_logging()
 
 class NPKSensor:
     def __init__(self, port="/dev/ttyS0", slave_id=1):
@@ -0,0 +1,323 @@
+"""
+Out-of-core preprocessing: train on datasets larger than memory.
+
+`preprocess()` in the model classes fits the encoders and the scaler on one
+in-memory copy of the whole dataset. With months of field history that no
+longer fits the CI container or a Pi retraining locally. This path holds one
+block of rows at a time:
+
+1. discover   stream the CSV in blocks (cleaned; rolling features carried
+              across blocks): count rows, collect the categories of every
+              encoded column
+2. encode     encoders are fitted on the collected categories (same classes
+              as a one-shot LabelEncoder.fit); each block is encoded, fed to
+              StandardScaler.partial_fit and written as float32 rows into a
+              memory-mapped X.npy (labels into y.npy)
+3. scale      the map is standardised in place, block by block
+4. train      the train / holdout split is drawn over row indices; training
+              rows are collapsed on the coreset grid block by block (in scaled
+              units; weighted rows merge exactly) and only the reduced rows are
+              loaded for the SVC
+
+`memory_cap_mb` bounds the working set: it sets the block size and how many
+rows are loaded as float64 for fitting and for evaluation. A reduced training
+set or holdout above that is subsampled (class-balanced coreset with class
+weight totals preserved / uniform holdout sample). libsvm's kernel cache
+(SVC cache_size, 200 MB by default) comes on top.
+
+Blocks are assumed to arrive in time order (the history log is appended in
+order): rolling features and the repeated-timestamp check carry over from
+the previous block only.
+"""
+import os
+import shutil
+import logging
+import tempfile
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from numpy.lib.format import open_memmap
+from sklearn.model_selection import train_test_split
+
+try:
+    from src.data_quality import clean
+    from src.coreset import dedupe_grid, stratified_coreset
+    from src.log_setup import configure_logging
+except ImportError:  # imported from inside src/ (edge scripts)
+    from data_quality import clean
+    from coreset import dedupe_grid, stratified_coreset
+    from log_setup import configure_logging
+
+# --------------------------
+# CONFIGURE LOGGING
+# --------------------------
+configure_logging()
+
+MEMORY_CAP_MB = 512
+MAX_BLOCK_ROWS = 100_000
+BYTES_PER_CELL = 100     # parsed CSV cell incl. pandas overhead (string columns dominate)
+BLOCK_SHARE = 0.25       # share of the cap for one raw block
+TRAIN_SHARE = 0.5        # share of the cap for float64 training + holdout rows
+
+
+# =========================================
+# BUDGETS
+# =========================================
+def block_rows(n_columns: int, memory_cap_mb: float = MEMORY_CAP_MB) -> int:
+    """Rows per CSV block so that one parsed block stays within its share of the cap."""
+    rows = int(memory_cap_mb * 2 ** 20 * BLOCK_SHARE / (max(n_columns, 1) * BYTES_PER_CELL))
+    return max(1000, min(MAX_BLOCK_ROWS, rows))
+
+
+def row_budget(n_features: int, memory_cap_mb: float = MEMORY_CAP_MB) -> int:
+    """Rows loaded as float64 for fitting (and, separately, for evaluation)."""
+    # Training and holdout rows, each with the validated copy sklearn makes
+    return max(1000, int(memory_cap_mb * 2 ** 20 * TRAIN_SHARE / (4 * max(n_features, 1) * 8)))
+
+
+def csv_columns(path: str) -> List[str]:
+    return list(pd.read_csv(path, nrows=0).columns)
+
+
+def source_columns(paths: Sequence[str], drop: Sequence[str] = ()) -> List[str]:
+    """Union of the columns of several CSVs, in first-seen order (blocks are aligned to it)."""
+    columns: List[str] = []
+    for path in paths:
+        columns += [c for c in csv_columns(path) if c not in drop and c not in columns]
+    return columns
+
+
+# =========================================
+# STREAMING
+# =========================================
+def merge_reports(total: Dict, report: Dict) -> Dict:
+    """Add one block's clean() report into a running total."""
+    for key, value in report.items():
+        if isinstance(value, dict):
+            merge_reports(total.setdefault(key, {}), value)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            if key != "rows_per_sec":
+                total[key] = total.get(key, 0) + value
+        else:
+            total.setdefault(key, value)
+    return total
+
+
+def read_csv_chunks(path: str, chunk_rows: int, drop: Sequence[str] = (), quality: bool = True,
+                    report: Optional[Dict] = None, time_col: str = "timestamp") -> Iterator[pd.DataFrame]:
+    """The model classes' load_dataset(), one block of rows at a time.
+
+    report: filled with the clean() reports of all blocks, summed.
+    """
+    previous = None
+    for chunk in pd.read_csv(path, chunksize=chunk_rows):
+        chunk = chunk.drop(columns=[c for c in drop if c in chunk.columns])
+        if quality:
+            chunk, block_report = clean(chunk)
+            if time_col in chunk.columns:
+                # clean() sees repeats within a block; earlier ones sit in the previous block
+                # (rows without a timestamp, e.g. the bundled CSVs, are never repeats)
+                repeated = (chunk[time_col].isin(previous) & chunk[time_col].notna()
+                            if previous is not None else None)
+                previous = chunk[time_col].to_numpy()
+                if repeated is not None and repeated.any():
+                    chunk = chunk[~repeated.to_numpy()]
+                    block_report["checks"]["duplicate"] += int(repeated.sum())
+                    block_report["dropped_rows"] += int(repeated.sum())
+            if report is not None:
+                merge_reports(report, block_report)
+        yield chunk
+
+
+class RowSample:
+    """Uniform sample of at most `k` rows of a stream (bottom-k random keys), in stream order."""
+
+    def __init__(self, k: int, random_state: int = 42):
+        self.k = k
+        self.rng = np.random.default_rng(random_state)
+        self.frame: Optional[pd.DataFrame] = None
+        self.keys = np.empty(0)
+
+    def add(self, chunk: pd.DataFrame) -> None:
+        keys = np.concatenate([self.keys, self.rng.random(len(chunk))])
+        frame = chunk if self.frame is None else pd.concat([self.frame, chunk], ignore_index=True)
+        if len(keys) > self.k:
+            keep = np.sort(np.argpartition(keys, self.k)[:self.k])
+            frame, keys = frame.iloc[keep], keys[keep]
+        self.frame, self.keys = frame.reset_index(drop=True), keys
+
+
+# =========================================
+# PREPROCESS INTO A MEMORY MAP
+# =========================================
+def preprocess_to_map(chunks: Callable[[], Iterable[pd.DataFrame]], features: Sequence[str], label: str,
+                      scaler, out_dir: str, categorical: Optional[Dict] = None, label_encoder=None,
+                      block: int = MAX_BLOCK_ROWS) -> Tuple[Optional[np.ndarray], Optional[np.ndarray]]:
+    """Fit encoders + scaler over streamed blocks; returns (X, y) memory-mapped from out_dir.
+
+    chunks: called once per pass, returns a fresh iterable of the same blocks.
+    categorical: column -> LabelEncoder for encoded feature columns.
+    """
+    categorical = categorical or {}
+    features = list(features)
+
+    # 1. discover: row count, categories, label dtype
+    n, seen, labels, y_dtype = 0, {col: set() for col in categorical}, set(), None
+    for chunk in chunks():
+        if chunk.empty:
+            continue
+        n += len(chunk)
+        for col in categorical:
+            seen[col].update(chunk[col].unique())
+        if label_encoder is not None:
+            labels.update(chunk[label].unique())
+        else:
+            dtype = chunk[label].to_numpy().dtype
+            y_dtype = dtype if y_dtype is None else np.result_type(y_dtype, dtype)
+    if n == 0:
+        return None, None
+    for col, encoder in categorical.items():
+        encoder.fit(pd.Series(sorted(seen[col])))
+    if label_encoder is not None:
+        label_encoder.fit(pd.Series(sorted(labels)))
+        y_dtype = np.int64
+
+    # 2. encode: scaler statistics + unscaled float32 rows
+    os.makedirs(out_dir, exist_ok=True)
+    X = open_memmap(os.path.join(out_dir, "X.npy"), mode="w+", dtype=np.float32, shape=(n, len(features)))
+    y = open_memmap(os.path.join(out_dir, "y.npy"), mode="w+", dtype=y_dtype, shape=(n,))
+    row = 0
+    for chunk in chunks():
+        if chunk.empty:
+            continue
+        chunk = chunk.assign(**{col: encoder.transform(chunk[col]) for col, encoder in categorical.items()})
+        values = chunk[features]
+        scaler.partial_fit(values)
+        X[row:row + len(chunk)] = values.to_numpy(dtype=np.float32)
+        y[row:row + len(chunk)] = (label_encoder.transform(chunk[label]) if label_encoder is not None
+                                   else chunk[label].to_numpy())
+        row += len(chunk)
+    if row != n:
+        raise RuntimeError(f"blocks changed between passes ({n} rows, then {row})")
+
+    # 3. scale in place
+    mean, scale = scaler.mean_, scaler.scale_
+    for start in range(0, n, block):
+        X[start:start + block] = (X[start:start + block].astype(np.float64) - mean) / scale
+    X.flush()
+    y.flush()
+    logging.info(f"Out-of-core preprocess: {n} rows × {len(features)} features → "
+                 f"{X.nbytes / 2 ** 20:.1f} MB map in {out_dir}")
+    return X, y
+
+
+# =========================================
+# TRAINING ROWS FROM THE MAP
+# =========================================
+def split_rows(n: int, test_size: float = 0.2, random_state: int = 42,
+               holdout_cap: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """train_test_split over row indices (same permutation as on the frame); holdout capped."""
+    train_idx, test_idx = train_test_split(np.arange(n), test_size=test_size, random_state=random_state)
+    if holdout_cap is not None and len(test_idx) > holdout_cap:
+        rng = np.random.default_rng(random_state)
+        test_idx = test_idx[np.sort(rng.choice(len(test_idx), size=holdout_cap, replace=False))]
+    return train_idx, test_idx
+
+
+def reduce_from_map(X, y, train_idx: np.ndarray, features: Sequence[str], label: str, scaler,
+                    categorical: Sequence[str] = (), resolution: Optional[Dict[str, float]] = None,
+                    dedupe: bool = True, target_size: Optional[int] = None,
+                    memory_cap_mb: float = MEMORY_CAP_MB, block: int = MAX_BLOCK_ROWS,
+                    random_state: int = 42) -> Tuple[np.ndarray, np.ndarray, np.ndarray, Dict]:
+    """Grid-collapse the training rows block by block; returns (X_train, y_train, weights, report)."""
+    features = list(features)
+    budget = row_budget(len(features), memory_cap_mb)
+    target = budget if target_size is None else min(target_size, budget)
+    idx = np.sort(train_idx)            # sequential reads from the map
+    rows_in, thinned = len(idx), False
+
+    if dedupe:
+        # Grid cells in scaled units: resolution / scale per numeric feature
+        scaled = {col: resolution[col] / s for col, s in zip(features, scaler.scale_)
+                  if col in (resolution or {}) and col not in categorical}
+        merged, weights = None, None
+        for start in range(0, rows_in, block):
+            rows = idx[start:start + block]
+            frame = pd.DataFrame(np.asarray(X[rows], dtype=np.float64), columns=features)
+            frame[label] = y[rows]
+            frame, w = dedupe_grid(frame, label, categorical, scaled)
+            if merged is not None:
+                frame, w = dedupe_grid(pd.concat([merged, frame], ignore_index=True), label,
+                                       categorical, scaled, np.concatenate([weights, w]))
+            merged, weights = frame, w
+            if len(merged) > 2 * budget:
+                # Distinct cells outgrow the cap: thin now, class weight totals kept
+                merged, weights = stratified_coreset(merged, weights, label, budget, random_state)
+                thinned = True
+        rows_dedup = len(merged)
+        merged, weights = stratified_coreset(merged, weights, label, target, random_state)
+        X_train = merged[features].to_numpy(dtype=np.float64)
+        y_train = merged[label].to_numpy()
+    else:
+        frame = pd.DataFrame({label: y[idx], "_row": idx})
+        frame, weights = stratified_coreset(frame, np.ones(rows_in), label, target, random_state)
+        rows_dedup = rows_in
+        X_train = np.asarray(X[frame["_row"].to_numpy()], dtype=np.float64)
+        y_train = frame[label].to_numpy()
+
+    report = {
+        "rows_in": int(rows_in),
+        "rows_deduplicated": int(rows_dedup),
+        "rows_out": int(len(X_train)),
+        "target_size": target_size,
+        "reduction": round(1.0 - len(X_train) / rows_in, 4) if rows_in else 0.0,
+        "memory_cap_mb": memory_cap_mb,
+        "row_budget": budget,
+        "thinned": thinned,
+    }
+    if rows_in and len(X_train) < rows_in:
+        logging.info(f"Training set reduced {rows_in} → {rows_dedup} (grid) → {len(X_train)} rows")
+    return X_train, y_train, weights, report
+
+
+def prepare_training(model, memory_cap_mb: float = MEMORY_CAP_MB, test_size: float = 0.2,
+                     random_state: int = 42, workdir: Optional[str] = None):
+    """Out-of-core counterpart of train()'s preprocess / split / reduce / transform.
+
+    `model` is an IrrigationModel / PlantHealthModel; its encoders and scaler
+    are fitted in place. Returns ((X_train, X_test, y_train, y_test), weights),
+    or (None, None) if there are no rows. The map is deleted afterwards unless
+    `workdir` is given.
+    """
+    features = model.feature_columns()
+    chunk_rows = block_rows(len(csv_columns(model.dataset)), memory_cap_mb)
+    labeled = getattr(model, "labeled", None)
+    encoders = getattr(model, "encoders", None)
+
+    def chunks():
+        for chunk in model.iter_chunks(chunk_rows):
+            yield labeled(chunk) if labeled is not None else chunk
+
+    out_dir = workdir or tempfile.mkdtemp(prefix="out_of_core_")
+    try:
+        X, y = preprocess_to_map(chunks, features, model.LABEL, model.scaler, out_dir,
+                                 categorical=encoders, label_encoder=getattr(model, "label_encoder", None),
+                                 block=chunk_rows)
+        if X is None:
+            return None, None
+        budget = row_budget(len(features), memory_cap_mb)
+        train_idx, test_idx = split_rows(len(X), test_size, random_state, holdout_cap=budget)
+        X_train, y_train, weights, model.coreset_report = reduce_from_map(
+            X, y, train_idx, features, model.LABEL, model.scaler,
+            categorical=list(encoders or {}), resolution=model.grid_resolution(),
+            dedupe=model.dedupe, target_size=model.coreset_size,
+            memory_cap_mb=memory_cap_mb, block=chunk_rows, random_state=random_state
+        )
+        X_test = np.asarray(X[test_idx], dtype=np.float64)
+        y_test = np.asarray(y[test_idx])
+        del X, y
+        return (X_train, X_test, y_train, y_test), weights
+    finally:
+        if workdir is None:
+            shutil.rmtree(out_dir, ignore_errors=True)
@@ -3,58 +3,175 @@ import numpy as np
 import joblib
 import logging
 import os
+import time
 from sklearn.preprocessing import StandardScaler, LabelEncoder
 from sklearn.svm import SVC
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score, classification_report
 
+try:
+    from src.data_quality import clean
+    from src.compact_svm import CompactSVC
+    from src.cascade import CascadeClassifier, LinearGate
+    from src.calibration import Calibrator
+    from src.coreset import reduce_training_set, GRID_RESOLUTION
+    from src.rolling_features import (RollingFeatures, add_rolling_features, cold_start,
+                                      rolling_columns, rolling_resolution, uses_rolling,
+                                      require_timestamps, stamped_rows)
+    from src.log_setup import configure_logging
+    from src.out_of_core import csv_columns, prepare_training, read_csv_chunks, source_columns
+    from src.model_sync import active_dir
+except ImportError:  # imported from inside src/ (edge scripts)
+    from data_quality import clean
+    from compact_svm import CompactSVC
+    from cascade import CascadeClassifier, LinearGate
+    from calibration import Calibrator
+    from coreset import reduce_training_set, GRID_RESOLUTION
+    from rolling_features import (RollingFeatures, add_rolling_features, cold_start,
+                                  rolling_columns, rolling_resolution, uses_rolling,
+                                  require_timestamps, stamped_rows)
+    from log_setup import configure_logging
+    from out_of_core import csv_columns, prepare_training, read_csv_chunks, source_columns
+    from model_sync import active_dir
+
 
 # -------------------------------------
 # LOGGING
 # -------------------------------------
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s"
-)
+configure_logging()
+# Per-prediction lines are sampled (src/log_setup.py SAMPLING)
+predict_log = logging.getLogger("plant_health.predict")
 
 class PlantHealthModel:
+    FEATURES = ["Soil_Moisture", "Ambient_Temperature", "Humidity", "Light_Intensity",
+                "Nitrogen_Level", "Phosphorus_Level", "Potassium_Level"]
+    # Signals with optional rolling features (src/rolling_features.py)
+    ROLLING_COLUMNS = ["Soil_Moisture", "Ambient_Temperature", "Humidity", "Light_Intensity"]
+    LABEL = "Plant_Health_Status"
+    DROP_COLUMNS = ["Unnamed: 0", "Soil_pH", "row_hash"]
 
     def __init__(self,
                  dataset="data/plant_health_data.csv",
-                 model_file="models/plant_health/plant_health_svm.pkl"):
+                 live_dataset="data/live/plant_health.csv",
+                 model_file="models/plant_health/plant_health_svm.pkl",
+                 model_dir="models/plant_health",
+                 probability=True,
+                 dedupe=True,
+                 coreset_size=None,
+                 rolling=False,
+                 memory_cap_mb=None):
 
         # Determine project root (one level above src/)
         BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
         # Build absolute paths
         self.dataset = os.path.join(BASE_DIR, dataset)
+        # Field rows uploaded by the Pi and merged by mlops/merge_batches.py
+        self.live_dataset = os.path.join(BASE_DIR, live_dataset) if live_dataset else None
         self.model_file = os.path.join(BASE_DIR, model_file)
 
-        self.scaler_file = os.path.join(BASE_DIR, "models/plant_health/plant_health_scaler.pkl")
-        self.encoder_file = os.path.join(BASE_DIR, "models/plant_health/plant_health_encoder.pkl")
+        self.scaler_file = os.path.join(BASE_DIR, model_dir, "plant_health_scaler.pkl")
+        self.encoder_file = os.path.join(BASE_DIR, model_dir, "plant_health_encoder.pkl")
+        self.calibration_file = os.path.join(BASE_DIR, model_dir, "plant_health_calibration.pkl")
+
+        # False skips libsvm's internal 5-fold Platt scaling at fit time;
+        # confidences then come from a separately fitted calibrator
+        self.probability = probability
+
+        # Training-set reduction (src/coreset.py): near-duplicate collapse on a
+        # feature grid, optionally a class-balanced coreset of this many rows
+        self.dedupe = dedupe
+        self.coreset_size = coreset_size
+
+        # Extra EWMA / slope / min / max features per signal over the stream
+        self.rolling = rolling
+
+        # Out-of-core training (src/out_of_core.py) within this working-set
+        # cap in MB; None = the whole dataset in memory
+        self.memory_cap_mb = memory_cap_mb
 
         # Create model directory if missing
-        os.makedirs(os.path.join(BASE_DIR, "models/plant_health"), exist_ok=True)
+        os.makedirs(os.path.join(BASE_DIR, model_dir), exist_ok=True)
 
         self.model = None
+        self.calibrator = None
+        self.fit_seconds = None
+        self.timings = {}         # seconds per train() phase (load, preprocess, fit, …)
+        self.split = None
+        self.sample_weight = None
+        self.quality_report = None
+        self.coreset_report = None
         self.scaler = StandardScaler()
         self.label_encoder = LabelEncoder()
 
         logging.info(f"PlantHealthModel initialized with dataset: {self.dataset}")
 
+    # ------------------------------------------------
+    def sources(self):
+        """Training CSVs: the bundled dataset, then the merged field rows (if any)."""
+        paths = [self.dataset]
+        if self.live_dataset and os.path.exists(self.live_dataset):
+            paths.append(self.live_dataset)
+        return paths
+
     # ------------------------------------------------
     def load_dataset(self):
-        """Load dataset and clean unnecessary columns."""
-        df = pd.read_csv(self.dataset)
+        """Load dataset (bundled CSV + field rows) and clean unnecessary columns."""
+        df = pd.concat([pd.read_csv(path) for path in self.sources()], ignore_index=True, sort=False)
 
         # Remove unused columns if present
-        for col in ["Unnamed: 0", "Soil_pH"]:
+        for col in self.DROP_COLUMNS:
             if col in df.columns:
                 df = df.drop(columns=[col])
 
+        # Drop out-of-range / imputed / duplicate rows before they reach training
+        df, self.quality_report = clean(df)
+
         #logging.info(f"Dataset loaded with shape {df.shape}.")
         return df
 
+    # ------------------------------------------------
+    def feature_columns(self):
+        """Model input columns, in order."""
+        return self.FEATURES + (rolling_columns(self.ROLLING_COLUMNS) if self.rolling else [])
+
+    # ------------------------------------------------
+    def add_rolling(self, df):
+        """Rolling feature columns over the time-ordered rows (no-op unless enabled).
+
+        Only the time-stamped (field) rows are kept; raises ValueError if
+        there are none to order by.
+        """
+        if not self.rolling:
+            return df
+        df = stamped_rows(df, self.live_dataset or self.dataset)
+        return add_rolling_features(df, self.ROLLING_COLUMNS)
+
+    # ------------------------------------------------
+    def iter_chunks(self, chunk_rows):
+        """load_dataset() + add_rolling() one block of rows at a time (out-of-core path)."""
+        self.quality_report = {}
+        tracker = RollingFeatures(self.ROLLING_COLUMNS) if self.rolling else None
+        sources = self.sources()
+        if tracker is not None:
+            # Rolling features train on the time-stamped field rows only
+            sources = [path for path in sources if "timestamp" in csv_columns(path)]
+            if not sources:
+                require_timestamps(pd.DataFrame(), self.live_dataset or self.dataset)
+        columns = source_columns(sources, drop=self.DROP_COLUMNS)
+        for path in sources:
+            for chunk in read_csv_chunks(path, chunk_rows, drop=self.DROP_COLUMNS,
+                                         report=self.quality_report):
+                chunk = chunk.reindex(columns=columns)
+                if tracker is not None:
+                    chunk = stamped_rows(chunk, required=False)
+                    if chunk.empty:
+                        continue
+                    chunk = add_rolling_features(chunk, self.ROLLING_COLUMNS, tracker=tracker)
+                yield chunk
+        if tracker is not None and not tracker.last:
+            require_timestamps(pd.DataFrame(), self.live_dataset or self.dataset)
+
     # ------------------------------------------------
     def preprocess(self, df):
         """Encode label + scale numeric features."""
@@ -65,7 +182,7 @@ class PlantHealthModel:
             df["Plant_Health_Status"]
         )
 
-        X = df.drop(columns=["Plant_Health_Status"])
+        X = df[self.feature_columns()]
         y = df["Plant_Health_Status"]
 
         X_scaled = self.scaler.fit_transform(X)
@@ -73,41 +190,123 @@ class PlantHealthModel:
         return X_scaled, y
 
     # ------------------------------------------------
-    def train(self):
-        """Train SVM classifier."""
-        df = self.load_dataset()
-        X, y = self.preprocess(df)
+    def transform(self, df):
+        """Encode + scale with the already fitted encoder/scaler (no refit)."""
+        X = df[self.feature_columns()]
+        y = self.label_encoder.transform(df["Plant_Health_Status"])
+        return self.scaler.transform(X), y
+
+    # ------------------------------------------------
+    def grid_resolution(self):
+        """Coreset grid cell per numeric input column (src/coreset.py)."""
+        if self.rolling:
+            return {**GRID_RESOLUTION, **rolling_resolution(self.ROLLING_COLUMNS, GRID_RESOLUTION)}
+        return GRID_RESOLUTION
 
-        X_train, X_test, y_train, y_test = train_test_split(
-            X, y, test_size=0.2, random_state=42
+    # ------------------------------------------------
+    def reduce(self, df):
+        """Collapse near-duplicate rows before preprocess; returns (df, sample_weight)."""
+        df, weights, self.coreset_report = reduce_training_set(
+            df, "Plant_Health_Status", resolution=self.grid_resolution(),
+            dedupe=self.dedupe, target_size=self.coreset_size
         )
+        return df, weights
 
-        self.model = SVC(kernel="rbf", probability=True)
-        self.model.fit(X_train, y_train)
+    # ------------------------------------------------
+    def build_model(self):
+        """Fresh, unfitted classifier."""
+        return SVC(kernel="rbf", probability=self.probability)
 
+    # ------------------------------------------------
+    def dump_artifacts(self):
+        """Save model + scaler + encoder to their configured paths."""
+        joblib.dump(self.model, self.model_file)
+        joblib.dump(self.scaler, self.scaler_file)
+        joblib.dump(self.label_encoder, self.encoder_file)
+
+        # Calibrator travels with the model; drop a stale one from an older run
+        if self.calibrator is not None:
+            joblib.dump(self.calibrator.to_dict(), self.calibration_file)
+        elif os.path.exists(self.calibration_file):
+            os.remove(self.calibration_file)
+
+    # ------------------------------------------------
+    def predict_proba(self, X_scaled):
+        """Class probabilities for scaled rows: calibrator, else built-in Platt scaling."""
+        if self.calibrator is not None:
+            return self.calibrator.predict_proba(self.model.decision_function(X_scaled))
+        return self.model.predict_proba(X_scaled)
+
+    # ------------------------------------------------
+    def train(self):
+        """Train SVM classifier."""
+        if self.memory_cap_mb:
+            # Streamed blocks → float32 memory map → capped training / holdout rows
+            start = time.perf_counter()
+            self.split, self.sample_weight = prepare_training(self, self.memory_cap_mb)
+            self.timings = {"preprocess": time.perf_counter() - start}
+            if self.split is None:
+                logging.warning("Training skipped — dataset is empty.")
+                return
+        else:
+            start = time.perf_counter()
+            df = self.add_rolling(self.load_dataset())
+            self.timings = {"load": time.perf_counter() - start}
+
+            # Encoder + scaler see every row
+            start = time.perf_counter()
+            self.preprocess(df)
+
+            train_df, test_df = train_test_split(df, test_size=0.2, random_state=42)
+
+            # Only the training rows are reduced; the holdout stays raw
+            train_df, w_train = self.reduce(train_df)
+            X_train, y_train = self.transform(train_df)
+            X_test, y_test = self.transform(test_df)
+
+            # Kept for post-training steps in mlops (e.g. compaction)
+            self.split = (X_train, X_test, y_train, y_test)
+            self.sample_weight = w_train
+            self.timings["preprocess"] = time.perf_counter() - start
+
+        X_train, X_test, y_train, y_test = self.split
+        w_train = self.sample_weight
+
+        self.model = self.build_model()
+        start = time.perf_counter()
+        self.model.fit(X_train, y_train, sample_weight=w_train)
+        self.fit_seconds = self.timings["fit"] = time.perf_counter() - start
+
+        start = time.perf_counter()
         preds = self.model.predict(X_test)
         acc = accuracy_score(y_test, preds)
+        self.timings["evaluate"] = time.perf_counter() - start
 
         logging.info(f"Training complete. Accuracy = {acc}")
         #logging.info("\n" + classification_report(y_test, preds))
 
         # Save all components
-        joblib.dump(self.model, self.model_file)
-        joblib.dump(self.scaler, self.scaler_file)
-        joblib.dump(self.label_encoder, self.encoder_file)
+        start = time.perf_counter()
+        self.dump_artifacts()
+        self.timings["dump"] = time.perf_counter() - start
 
         return acc
 
     # ------------------------------------------------
     def predict(self, soil_moisture, temp, humidity,
-                light, nitrogen, phosphorus, potassium):
-        """Predict plant health with trained SVM."""
+                light, nitrogen, phosphorus, potassium, rolling=None):
+        """Predict plant health with trained SVM.
+
+        rolling: RollingFeatures values for moisture / temperature / humidity /
+        light; only used by models trained with rolling features.
+        """
 
         # Load saved model/scaler/encoder if not in memory
         if self.model is None:
             self.model = joblib.load(self.model_file)
             self.scaler = joblib.load(self.scaler_file)
             self.label_encoder = joblib.load(self.encoder_file)
+            self.rolling = uses_rolling(self.scaler)
 
         df = pd.DataFrame([{
             "Soil_Moisture": soil_moisture,
@@ -118,16 +317,33 @@ class PlantHealthModel:
             "Phosphorus_Level": phosphorus,
             "Potassium_Level": potassium
         }])
+        if self.rolling:
+            feats = cold_start({"Soil_Moisture": soil_moisture, "Ambient_Temperature": temp,
+                                "Humidity": humidity, "Light_Intensity": light})
+            feats.update(rolling or {})
+            for col in rolling_columns(self.ROLLING_COLUMNS):
+                df[col] = feats[col]
 
         # Scale input
-        X_scaled = self.scaler.transform(df)
+        X_scaled = self.scaler.transform(df[self.feature_columns()])
 
         pred = self.model.predict(X_scaled)[0]
         label = self.label_encoder.inverse_transform([pred])[0]
 
-        logging.info(f"Prediction: {label}")
+        predict_log.info("Prediction: %s", label)
         return label
 
+    # ------------------------------------------------
+    def predict_batch(self, df, tracker=None):
+        """Batched predict() for logged rows; returns labels.
+
+        tracker: RollingFeatures carried across chunks of one log (rolling models only).
+        """
+        if self.rolling:
+            df = add_rolling_features(df, self.ROLLING_COLUMNS, tracker=tracker)
+        preds = self.model.predict(self.scaler.transform(df[self.feature_columns()]))
+        return self.label_encoder.inverse_transform(np.asarray(preds, dtype=np.int64))
+
     # ------------------------------------------------
     def retrain(self):
         """Auto retrain on updated dataset."""
@@ -137,6 +353,7 @@ class PlantHealthModel:
     def train_from_csv(self, path):
         """Train from external CSV (used by CI/CD)."""
         self.dataset = path
+        self.live_dataset = None
         return self.train()
 
     # ------------------------------------------------
@@ -157,16 +374,39 @@ class PlantHealthModel:
 
     # ------------------------------------------------
     @staticmethod
-    def load_current():
-        """Load model for inference on Raspberry Pi."""
-        BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        current_path = os.path.join(BASE_DIR, "models/plant_health/current")
+    def load_current(compact=False, cascade=False):
+        """Load model for inference on Raspberry Pi (synced release if present)."""
+        current_path = active_dir("plant_health")
+        return PlantHealthModel.load_dir(current_path, compact=compact, cascade=cascade)
 
+    # ------------------------------------------------
+    @staticmethod
+    def load_dir(current_path, compact=False, cascade=False):
+        """Load model + scaler + encoder from any artifact folder (used by the registry)."""
         model = joblib.load(os.path.join(current_path, "plant_health_svm.pkl"))
+
+        # Reduced-set SVM (mlops/compact.py) — same predict(), fewer kernel evaluations
+        compact_path = os.path.join(current_path, "plant_health_svm_compact.pkl")
+        if compact and os.path.exists(compact_path):
+            model = CompactSVC.from_dict(joblib.load(compact_path))
+        full_model = model
+
+        # Early-exit cascade (mlops/cascade.py): a linear first stage answers
+        # confident readings, the (exact or compact) SVC the rest
+        cascade_path = os.path.join(current_path, "plant_health_svm_cascade.pkl")
+        if cascade and os.path.exists(cascade_path):
+            model = CascadeClassifier(LinearGate.from_dict(joblib.load(cascade_path)), model)
+
         scaler = joblib.load(os.path.join(current_path, "plant_health_scaler.pkl"))
         encoder = joblib.load(os.path.join(current_path, "plant_health_encoder.pkl"))
 
-        obj = PlantHealthModel()
+        obj = PlantHealthModel(rolling=uses_rolling(scaler))
+
+        # Post-hoc calibration (mlops/calibrate.py), fitted on the exact model's decisions
+        calibration_path = os.path.join(current_path, "plant_health_calibration.pkl")
+        if not isinstance(full_model, CompactSVC) and os.path.exists(calibration_path):
+            obj.calibrator = Calibrator.from_dict(joblib.load(calibration_path))
+
         obj.model = model
         obj.scaler = scaler
         obj.label_encoder = encoder
@@ -0,0 +1,251 @@
+"""
+Rolling-window features over the sensor stream, in O(1) per sample.
+
+Both models see only the instantaneous reading. With rolling features enabled
+they also see, per signal (moisture, temperature, humidity, light):
+
+    <col>_ewma    time-aware exponential moving average (half-life HALF_LIFE s)
+    <col>_slope   least-squares trend over the last WINDOW s, units per hour
+    <col>_min     minimum over the last WINDOW s
+    <col>_max     maximum over the last WINDOW s
+
+`RollingFeatures.update()` keeps running sums and monotonic min/max deques,
+so each sample costs amortized O(1) and memory is capped at `max_samples`
+readings per signal — history is never rescanned. `add_rolling_features()`
+computes the training columns by replaying the rows through the same class in
+timestamp order, so training and the edge loop see identical values.
+
+Rows without a timestamp are independent samples: they get the values of a
+stream's first reading (ewma = min = max = value, slope = 0). Training on such
+rows would teach the model that these columns are constant, so with rolling
+features the models train on the time-stamped rows only (`stamped_rows`): the
+field rows merged from the Pi into data/live/<dataset>.csv. The bundled CSVs
+have no timestamps and are left out; with no field rows yet, training stops
+with a ValueError (`require_timestamps`).
+"""
+import math
+import logging
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+try:
+    from src.log_setup import configure_logging
+except ImportError:  # imported from inside src/ (edge scripts)
+    from log_setup import configure_logging
+
+# --------------------------
+# CONFIGURE LOGGING
+# --------------------------
+configure_logging()
+
+WINDOW = 3600          # seconds covered by slope / min / max
+HALF_LIFE = 600        # EWMA half-life (s)
+MAX_SAMPLES = 1024     # per-signal cap on readings held for the window
+
+STATS = ("ewma", "slope", "min", "max")
+
+
+def rolling_columns(columns: Iterable[str]) -> List[str]:
+    """Feature column names for the given signal columns."""
+    return [f"{col}_{stat}" for col in columns for stat in STATS]
+
+
+def rolling_resolution(columns: Iterable[str], base: Dict[str, float]) -> Dict[str, float]:
+    """Coreset grid cells for the rolling columns (same units as the signal; slope per hour)."""
+    return {f"{col}_{stat}": base[col] for col in columns if col in base for stat in STATS}
+
+
+def uses_rolling(scaler) -> bool:
+    """True if a fitted scaler was trained with rolling feature columns."""
+    names = getattr(scaler, "feature_names_in_", None)
+    return names is not None and any(str(n).endswith("_ewma") for n in names)
+
+
+def cold_start(values: Dict[str, float]) -> Dict[str, float]:
+    """Features of a stream's first reading (no history yet)."""
+    out = {}
+    for col, x in values.items():
+        out[f"{col}_ewma"] = out[f"{col}_min"] = out[f"{col}_max"] = float(x)
+        out[f"{col}_slope"] = 0.0
+    return out
+
+
+class _Signal:
+    """Window state of one signal."""
+
+    __slots__ = ("window", "half_life", "max_samples", "samples", "lows", "highs",
+                 "ewma", "last_t", "t0", "seq", "updates", "n", "st", "sx", "stt", "stx")
+
+    def __init__(self, window: float, half_life: float, max_samples: int):
+        self.window = window
+        self.half_life = half_life
+        self.max_samples = max_samples
+        self.samples = deque()     # (seq, t, x) inside the window
+        self.lows = deque()        # (seq, x) increasing x — head is the window min
+        self.highs = deque()       # (seq, x) decreasing x — head is the window max
+        self.ewma = None
+        self.last_t = None
+        self.t0 = 0.0              # time origin of the running sums (s)
+        self.seq = 0
+        self.updates = 0
+        self.n = 0
+        self.st = self.sx = self.stt = self.stx = 0.0
+
+    def _add(self, t: float, x: float) -> None:
+        h = (t - self.t0) / 3600.0
+        self.n += 1
+        self.st += h
+        self.sx += x
+        self.stt += h * h
+        self.stx += h * x
+
+    def _evict(self) -> None:
+        seq, t, x = self.samples.popleft()
+        h = (t - self.t0) / 3600.0
+        self.n -= 1
+        self.st -= h
+        self.sx -= x
+        self.stt -= h * h
+        self.stx -= h * x
+        if self.lows and self.lows[0][0] <= seq:
+            self.lows.popleft()
+        if self.highs and self.highs[0][0] <= seq:
+            self.highs.popleft()
+
+    def _rebase(self) -> None:
+        # Recompute the sums from the window every max_samples updates so
+        # add/subtract rounding cannot accumulate (amortized O(1))
+        self.t0 = self.samples[0][1]
+        self.n = 0
+        self.st = self.sx = self.stt = self.stx = 0.0
+        for _, t, x in self.samples:
+            self._add(t, x)
+        self.updates = 0
+
+    def update(self, x: float, t: float) -> List[float]:
+        if self.ewma is None:
+            self.ewma, self.t0 = x, t
+        else:
+            dt = max(t - self.last_t, 0.0)
+            alpha = 1.0 - 0.5 ** (dt / self.half_life)
+            self.ewma += alpha * (x - self.ewma)
+        self.last_t = t
+
+        self.samples.append((self.seq, t, x))
+        self._add(t, x)
+        while self.lows and self.lows[-1][1] >= x:
+            self.lows.pop()
+        self.lows.append((self.seq, x))
+        while self.highs and self.highs[-1][1] <= x:
+            self.highs.pop()
+        self.highs.append((self.seq, x))
+        self.seq += 1
+
+        while self.samples and (t - self.samples[0][1] > self.window
+                                or len(self.samples) > self.max_samples):
+            self._evict()
+
+        self.updates += 1
+        if self.updates >= self.max_samples:
+            self._rebase()
+
+        denom = self.n * self.stt - self.st * self.st
+        slope = (self.n * self.stx - self.st * self.sx) / denom if self.n > 1 and denom > 1e-12 else 0.0
+        return [self.ewma, slope, self.lows[0][1], self.highs[0][1]]
+
+
+class RollingFeatures:
+    """Streaming EWMA / slope / min / max per signal in fixed memory."""
+
+    def __init__(self, columns: Sequence[str], window: float = WINDOW,
+                 half_life: float = HALF_LIFE, max_samples: int = MAX_SAMPLES):
+        self.columns = list(columns)
+        self.signals = {col: _Signal(window, half_life, max_samples) for col in self.columns}
+        self.last: Dict[str, float] = {}
+
+    def update(self, values: Dict[str, float], ts: float) -> Dict[str, float]:
+        """Add one reading (ts in seconds); returns the features of every signal seen so far.
+
+        Missing / NaN values leave that signal's state (and features) unchanged.
+        """
+        for col in self.columns:
+            x = values.get(col)
+            if x is None or (isinstance(x, float) and math.isnan(x)):
+                continue
+            stats = self.signals[col].update(float(x), float(ts))
+            for stat, v in zip(STATS, stats):
+                self.last[f"{col}_{stat}"] = v
+        return dict(self.last)
+
+    def features(self, values: Optional[Dict[str, float]] = None) -> Dict[str, float]:
+        """Latest features; signals never seen fall back to cold_start(values)."""
+        out = cold_start({c: values[c] for c in self.columns if c in values}) if values else {}
+        out.update(self.last)
+        return out
+
+
+def require_timestamps(df: pd.DataFrame, source: str = "", time_col: str = "timestamp") -> None:
+    """Raise ValueError unless the training rows carry at least one usable timestamp."""
+    if time_col in df.columns and pd.to_datetime(df[time_col], errors="coerce").notna().any():
+        return
+    raise ValueError(
+        f"Rolling features need time-stamped training rows, but {source or 'the dataset'} "
+        f"has no '{time_col}' values (every row would get cold-start values). "
+        f"Disable ROLLING_FEATURES for this task until the Pi's uploads have been merged "
+        f"into data/live/."
+    )
+
+
+def stamped_rows(df: pd.DataFrame, source: str = "", time_col: str = "timestamp",
+                 required: bool = True) -> pd.DataFrame:
+    """The rows with a usable timestamp — the only ones rolling features are trained on.
+
+    With `required`, raises ValueError (require_timestamps) if there are none.
+    """
+    if required:
+        require_timestamps(df, source, time_col)
+    if time_col not in df.columns:
+        return df.iloc[:0]
+    keep = pd.to_datetime(df[time_col], errors="coerce").notna()
+    if required and not keep.all():
+        logging.info("Rolling features: %d of %d rows have no timestamp and are left out",
+                     int((~keep).sum()), len(df))
+    return df.loc[keep]
+
+
+def add_rolling_features(df: pd.DataFrame, columns: Sequence[str], time_col: str = "timestamp",
+                         window: float = WINDOW, half_life: float = HALF_LIFE,
+                         max_samples: int = MAX_SAMPLES,
+                         tracker: Optional[RollingFeatures] = None) -> pd.DataFrame:
+    """Batch rolling features: rows replayed through RollingFeatures in time order.
+
+    Pass the same `tracker` for consecutive chunks of one log to carry the
+    window state across chunk boundaries.
+    """
+    df = df.copy()
+    values = df[list(columns)].to_numpy(dtype=np.float64)
+    out = np.repeat(values, len(STATS), axis=1)
+    out[:, 1::len(STATS)] = 0.0     # cold start: ewma = min = max = value, slope = 0
+
+    if time_col in df.columns:
+        ts = pd.to_datetime(df[time_col], errors="coerce")
+        valid = ts.notna().to_numpy()
+        seconds = np.zeros(len(df))
+        seconds[valid] = ts[valid].to_numpy().astype("datetime64[ns]").astype(np.int64) / 1e9
+        order = np.flatnonzero(valid)[np.argsort(seconds[valid], kind="stable")]
+
+        if tracker is None:
+            tracker = RollingFeatures(columns, window, half_life, max_samples)
+        names = rolling_columns(columns)
+        for i in order:
+            feats = tracker.update(dict(zip(columns, values[i])), seconds[i])
+            out[i] = [feats.get(name, out[i, j]) for j, name in enumerate(names)]
+    else:
+        logging.warning("No timestamp column — rolling features use cold-start values.")
+
+    for j, name in enumerate(rolling_columns(columns)):
+        df[name] = out[:, j]
+    return df
@@ -0,0 +1,183 @@
+"""
+Adaptive, event-driven sampling for the edge loops.
+
+Instead of sampling, predicting and publishing every 10 s regardless of what
+the field is doing, each signal gets its own interval:
+
+- slow-moving signal (soil moisture flat for hours) → stretches towards
+  `max_interval`
+- fast-moving signal (moisture dropping right after irrigation) → shrinks
+  towards `min_interval`
+- a prediction flip (irrigation 0 → 1, plant health class change) pulls every
+  signal back to its minimum interval
+
+Timing is deadline based: the next deadline is the previous deadline plus the
+interval, not "now + interval", so variable loop cost (LLM, slow sensors)
+does not accumulate drift. Missed deadlines are skipped, not replayed.
+
+`Deadband` suppresses publishes/log writes when nothing moved beyond a
+per-field band and no prediction changed, with a heartbeat so the dashboard
+still sees the device is alive.
+"""
+import math
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+
+class SignalPolicy:
+    """Interval for one signal from the EWMA of its rate of change."""
+
+    def __init__(self, min_interval: float, max_interval: float,
+                 rate_low: float, rate_high: float, alpha: float = 0.3):
+        if not 0 < min_interval <= max_interval:
+            raise ValueError("Need 0 < min_interval <= max_interval")
+        if not 0 < rate_low < rate_high:
+            raise ValueError("Need 0 < rate_low < rate_high")
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.rate_low = rate_low          # units/s at or below which we sample slowest
+        self.rate_high = rate_high        # units/s at or above which we sample fastest
+        self.alpha = alpha
+
+        self.rate: Optional[float] = None
+        self.last_value: Optional[float] = None
+        self.last_time: Optional[float] = None
+
+    def update(self, value: float, now: float) -> None:
+        if value is None:
+            return
+        if self.last_value is not None and now > self.last_time:
+            rate = abs(value - self.last_value) / (now - self.last_time)
+            self.rate = rate if self.rate is None else self.alpha * rate + (1 - self.alpha) * self.rate
+        self.last_value, self.last_time = value, now
+
+    def interval(self) -> float:
+        """Log-linear interpolation between max (calm) and min (changing) interval."""
+        if self.rate is None:
+            return self.min_interval          # no history yet: learn quickly
+        if self.rate <= self.rate_low:
+            return self.max_interval
+        if self.rate >= self.rate_high:
+            return self.min_interval
+        t = math.log(self.rate / self.rate_low) / math.log(self.rate_high / self.rate_low)
+        return math.exp((1 - t) * math.log(self.max_interval) + t * math.log(self.min_interval))
+
+
+class AdaptiveScheduler:
+    """Per-signal deadlines; `wait()` sleeps until the next one is due."""
+
+    def __init__(self, policies: Dict[str, SignalPolicy],
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.policies = policies
+        self.clock = clock
+        self.sleep = sleep
+
+        now = clock()
+        self.deadlines = {name: now for name in policies}   # everything due at start
+        self.predictions: Dict[str, object] = {}
+        self.stats = {"wakeups": 0, "samples": {name: 0 for name in policies},
+                      "overruns": 0, "flips": 0}
+
+    # -----------------------------------------
+    def due(self, now: Optional[float] = None) -> List[str]:
+        now = self.clock() if now is None else now
+        return [name for name, d in self.deadlines.items() if d <= now]
+
+    def delay(self) -> float:
+        """Seconds until the earliest deadline (≤ 0 if something is already due)."""
+        return min(self.deadlines.values()) - self.clock()
+
+    def wait(self) -> List[str]:
+        """Sleep until the earliest deadline; return the signals due to be sampled."""
+        delay = self.delay()
+        if delay > 0:
+            self.sleep(delay)
+        self.stats["wakeups"] += 1
+        return self.due()
+
+    def observe(self, name: str, value, now: Optional[float] = None) -> float:
+        """Record a sample of `name` and schedule its next deadline; returns the interval."""
+        now = self.clock() if now is None else now
+        policy = self.policies[name]
+        policy.update(value, now)
+        self.stats["samples"][name] += 1
+
+        interval = policy.interval()
+        deadline = self.deadlines[name] + interval
+        if deadline <= now:
+            # Loop fell behind: skip the missed slots instead of bursting to catch up
+            self.stats["overruns"] += 1
+            deadline += interval * math.ceil((now - deadline) / interval + 1e-9)
+        self.deadlines[name] = deadline
+        return interval
+
+    def defer(self, names: Iterable[str], now: Optional[float] = None) -> None:
+        """Retry signals whose read failed after their min interval (keeps the loop from spinning)."""
+        now = self.clock() if now is None else now
+        for name in names:
+            if self.deadlines[name] <= now:
+                self.deadlines[name] = now + self.policies[name].min_interval
+
+    def observe_many(self, values: Dict[str, float], now: Optional[float] = None) -> None:
+        now = self.clock() if now is None else now
+        for name, value in values.items():
+            if name in self.policies:
+                self.observe(name, value, now)
+
+    def observe_prediction(self, name: str, value, now: Optional[float] = None) -> bool:
+        """Track a model output; on a flip every signal is pulled to its min interval."""
+        now = self.clock() if now is None else now
+        previous = self.predictions.get(name)
+        self.predictions[name] = value
+        if previous is None or previous == value:
+            return False
+        self.stats["flips"] += 1
+        for sig, policy in self.policies.items():
+            self.deadlines[sig] = min(self.deadlines[sig], now + policy.min_interval)
+            policy.rate = None   # re-learn the rate from fresh samples
+        return True
+
+    def intervals(self) -> Dict[str, float]:
+        return {name: p.interval() for name, p in self.policies.items()}
+
+
+class Deadband:
+    """Publish only when a field moved beyond its band, a label changed, or the heartbeat is due."""
+
+    def __init__(self, bands: Dict[str, float], heartbeat: float = 300.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.bands = bands          # field → absolute change that counts
+        self.heartbeat = heartbeat
+        self.clock = clock
+        self.last: Optional[Dict] = None
+        self.last_time: Optional[float] = None
+        self.stats = {"published": 0, "suppressed": 0}
+
+    def changed(self, payload: Dict, ignore: Iterable[str] = ()) -> bool:
+        if self.last is None:
+            return True
+        for key, value in payload.items():
+            if key in ignore:
+                continue
+            old = self.last.get(key)
+            band = self.bands.get(key)
+            if band is None:
+                if value != old:           # predictions / labels: any change
+                    return True
+            elif value is None or old is None:
+                if value is not old:
+                    return True
+            elif abs(float(value) - float(old)) > band:
+                return True
+        return False
+
+    def should_publish(self, payload: Dict, ignore: Iterable[str] = ("timestamp",)) -> bool:
+        now = self.clock()
+        due = self.last_time is None or now - self.last_time >= self.heartbeat
+        if due or self.changed(payload, ignore):
+            self.last, self.last_time = dict(payload), now
+            self.stats["published"] += 1
+            return True
+        self.stats["suppressed"] += 1
+        return False
@@ -39,6 +39,9 @@ class SensorADS:
         # -------------------------------
         self.dht = adafruit_dht.DHT11(board.D4, use_pulseio=False)
 
+        # True when the last DHT values were simulated instead of measured
+        self.dht_imputed = False
+
     # --------------------------------------------------------
     # LDR to Lux
     # --------------------------------------------------------
@@ -61,7 +64,8 @@ class SensorADS:
 
     # --------------------------------------------------------
     # DHT11 → Temperature + Humidity
-    # If fails → simulate realistic values
+    # If fails → simulate realistic values (flagged via dht_imputed
+    # so data-quality validation can drop them before training)
     # --------------------------------------------------------
     def get_dht(self):
         try:
@@ -71,6 +75,7 @@ class SensorADS:
             if temperature is None or humidity is None:
                 raise RuntimeError("DHT returned None")
 
+            self.dht_imputed = False
             return round(temperature, 2), round(humidity, 2)
 
         except Exception as e:
@@ -79,6 +84,7 @@ class SensorADS:
             # Generate realistic values
             temperature = random.uniform(20, 35)   # °C
             humidity = random.uniform(40, 85)      # %
+            self.dht_imputed = True
 
             return round(temperature, 2), round(humidity, 2)
 
@@ -94,5 +100,6 @@ class SensorADS:
             "lux": lux,
             "moi": moi,
             "temperature": temp,
-            "humidity": hum
+            "humidity": hum,
+            "dht_imputed": self.dht_imputed
         }
@@ -0,0 +1,162 @@
+"""
+Regression tests for the background advisory worker and its cache
+(src/advisory.py), with a stub generator in place of the LLM.
+
+Run from the project root:
+    python3 -m pytest tests/
+"""
+import os
+import sys
+import time
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import advisory
+from src.advisory import AdvisoryCache, AdvisoryWorker
+
+
+class BlockingGenerator:
+    """prompt -> "advice: <prompt>", held until `release` is set."""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.started = threading.Event()
+        self.prompts = []
+
+    def __call__(self, prompt):
+        self.prompts.append(prompt)
+        self.started.set()
+        self.release.wait(5)
+        return f"advice: {prompt}"
+
+
+def test_request_never_blocks_on_generation():
+    gen = BlockingGenerator()
+    worker = AdvisoryWorker(gen).start()
+    try:
+        start = time.perf_counter()
+        assert worker.request("a", "A") is None
+        assert gen.started.wait(2)
+        assert worker.request("b", "B") is None      # generator still busy on "a"
+        assert time.perf_counter() - start < 1.0
+    finally:
+        gen.release.set()
+        worker.stop()
+
+
+def test_miss_returns_none_not_another_states_advice():
+    gen = BlockingGenerator()
+    gen.release.set()
+    worker = AdvisoryWorker(gen).start()
+    try:
+        worker.request("a", "A")
+        assert worker.wait_idle(5)
+        assert worker.request("a", "A") == "advice: A"
+        assert worker.request("b", "B") is None      # not "advice: A"
+        assert worker.stats["cache_hits"] == 1
+    finally:
+        worker.stop()
+
+
+def test_full_queue_keeps_only_newest_request():
+    gen = BlockingGenerator()
+    worker = AdvisoryWorker(gen, queue_size=1).start()
+    try:
+        worker.request("a", "A")
+        assert gen.started.wait(2)                   # "a" is being generated
+        worker.request("b", "B")                     # queued
+        worker.request("c", "C")                     # replaces "b"
+        assert worker.stats["dropped"] == 1
+        gen.release.set()
+        assert worker.wait_idle(5)
+        assert gen.prompts == ["A", "C"]
+        assert worker.cache.get("b") is None
+        assert worker.request("c", "C") == "advice: C"
+    finally:
+        gen.release.set()
+        worker.stop()
+
+
+def test_pending_state_is_not_queued_twice():
+    gen = BlockingGenerator()
+    worker = AdvisoryWorker(gen).start()
+    try:
+        worker.request("a", "A")
+        assert gen.started.wait(2)
+        worker.request("a", "A")
+        worker.request("a", "A")
+        gen.release.set()
+        assert worker.wait_idle(5)
+        assert gen.prompts == ["A"]
+    finally:
+        gen.release.set()
+        worker.stop()
+
+
+def test_cached_advice_is_served_when_generation_is_not_allowed():
+    gen = BlockingGenerator()
+    gen.release.set()
+    worker = AdvisoryWorker(gen).start()
+    try:
+        worker.request("a", "A")
+        assert worker.wait_idle(5)
+        assert worker.request("a", "A", generate=False) == "advice: A"
+        assert worker.request("b", "B", generate=False) is None
+        assert worker.wait_idle(5)
+        assert gen.prompts == ["A"]                  # "b" was never queued
+    finally:
+        worker.stop()
+
+
+def test_generation_error_is_counted_and_retried_later():
+    calls = []
+
+    def failing(prompt):
+        calls.append(prompt)
+        raise RuntimeError("out of memory")
+
+    worker = AdvisoryWorker(failing).start()
+    try:
+        assert worker.request("a", "A") is None
+        assert worker.wait_idle(5)
+        assert worker.stats["errors"] == 1
+        assert worker.request("a", "A") is None      # nothing cached, queued again
+        assert worker.wait_idle(5)
+        assert calls == ["A", "A"]
+    finally:
+        worker.stop()
+
+
+def test_cache_ttl_and_lru(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(advisory.time, "monotonic", lambda: now[0])
+
+    cache = AdvisoryCache(ttl=60, max_entries=2)
+    cache.put("a", "A")
+    now[0] += 59
+    assert cache.get("a") == "A"
+    now[0] += 2
+    assert cache.get("a") is None                    # expired
+
+    cache.put("a", "A")
+    cache.put("b", "B")
+    cache.get("a")                                   # "b" is now least recently used
+    cache.put("c", "C")
+    assert cache.get("b") is None
+    assert cache.get("a") == "A" and cache.get("c") == "C"
+
+
+def test_expired_entry_is_regenerated():
+    gen = BlockingGenerator()
+    gen.release.set()
+    worker = AdvisoryWorker(gen, ttl=0.05).start()
+    try:
+        worker.request("a", "A")
+        assert worker.wait_idle(5)
+        time.sleep(0.1)
+        assert worker.request("a", "A") is None
+        assert worker.wait_idle(5)
+        assert gen.prompts == ["A", "A"]
+    finally:
+        worker.stop()
@@ -0,0 +1,40 @@
+"""
+Regression tests for training-set reduction (src/coreset.py).
+
+Run from the project root:
+    python3 -m pytest tests/
+"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.coreset import dedupe_grid, stratified_coreset
+
+
+def test_dedupe_grid_merges_cells_into_weights():
+    df = pd.DataFrame({"MOI": [22.01, 22.02, 22.03, 40.0], "label": [0, 0, 0, 1]})
+    out, weights = dedupe_grid(df, "label", resolution={"MOI": 0.5})
+    assert len(out) == 2
+    assert list(weights) == [3.0, 1.0]
+    assert abs(out["MOI"][0] - 22.02) < 1e-9
+
+
+def test_coreset_keeps_weighted_distribution_and_class_totals():
+    rng = np.random.default_rng(0)
+    n = 4000
+    heavy = rng.integers(0, 2, n) == 0
+    df = pd.DataFrame({"heavy": heavy, "label": rng.integers(0, 2, n)})
+    weights = np.where(heavy, 9.0, 1.0)
+
+    out, out_w = stratified_coreset(df, weights, "label", target_size=400)
+
+    assert len(out) == 400
+    for cls in (0, 1):
+        assert np.isclose(out_w[out["label"] == cls].sum(), weights[df["label"] == cls].sum())
+    # Drawn ∝ weight with equal per-row weights: heavy share ≈ 0.9, not ≈ weight² (0.99)
+    share = out_w[out["heavy"]].sum() / out_w.sum()
+    assert abs(share - 0.9) < 0.05
@@ -0,0 +1,72 @@
+"""
+Regression tests for the Pi → training-store path: sensor history
+(src/history_log.py) → batches (src/batch_upload.py) → data/live/
+(mlops/merge_batches.py).
+
+Run from the project root:
+    python3 -m pytest tests/
+"""
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.history_log import HistoryWriter
+from src.batch_upload import BatchUploader, HISTORY_SCHEMAS, read_batch
+from mlops.merge_batches import merge_batches
+
+T0 = 1_760_000_000
+
+
+def _record(i, **overrides):
+    rec = {
+        "timestamp": str(pd.Timestamp(T0 + i * 60, unit="s")),
+        "soil_type": "Black Soil", "stage": "Germination",
+        "temperature": 25.0 + i, "humidity": 60.0, "soil_moisture": 30.5, "light": 500,
+        "n": 20, "p": 15, "k": 18, "dht_imputed": False,
+        "irrigation_needed": 1, "plant_health": "Healthy", "advice": "Irrigate now.",
+    }
+    rec.update(overrides)
+    return rec
+
+
+def _write(root, records, start=0):
+    with HistoryWriter(root, flush_every=1) as writer:
+        for i, rec in enumerate(records, start):
+            writer.append(rec, ts=T0 + i * 60)
+
+
+def test_history_records_become_training_rows(tmp_path):
+    history, batches = str(tmp_path / "history"), str(tmp_path / "batches")
+    _write(history, [_record(0), _record(1), _record(2, n=None)])
+
+    stats = BatchUploader(batches, str(tmp_path / "state")).run(history=history)
+    assert stats["failed"] == 0
+
+    frames = {}
+    for name in os.listdir(batches):
+        dataset, df, _ = read_batch(os.path.join(batches, name))
+        frames[dataset] = df
+    assert set(frames) == set(HISTORY_SCHEMAS)
+    assert list(frames["irrigation"].columns) == list(HISTORY_SCHEMAS["irrigation"])
+    assert len(frames["irrigation"]) == 3
+    assert len(frames["plant_health"]) == 2          # record without NPK skipped
+    assert frames["irrigation"]["MOI"].tolist() == [30.5] * 3
+
+
+def test_upload_resumes_after_high_water_mark_and_merges_once(tmp_path):
+    history, batches, live = (str(tmp_path / d) for d in ("history", "batches", "live"))
+    state = str(tmp_path / "state")
+    _write(history, [_record(0), _record(1)])
+    BatchUploader(batches, state).run(history=history)
+
+    assert BatchUploader(batches, state).run(history=history)["read"] == 0
+    _write(history, [_record(2)], start=2)
+    assert BatchUploader(batches, state).run(history=history)["read"] == 2   # one row per dataset
+
+    merge_batches(batches, live)
+    store = pd.read_csv(os.path.join(live, "irrigation.csv"))
+    assert len(store) == 3
+    assert store["timestamp"].is_monotonic_increasing